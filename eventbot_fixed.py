@@ -21,8 +21,11 @@ sys.path.append(str(Path(__file__).parent / 'services'))
 PROJECT_DIR = Path(__file__).parent.absolute()
 os.chdir(PROJECT_DIR)
 
-# Путь к папке menu_files
-MENU_FILES_DIR = PROJECT_DIR / "menu_files"
+# Путь к папке menu_files (или к файлу-каталогу, например data/menu.json)
+MENU_FILES_DIR = Path(os.getenv('MENU_FILES_DIR', PROJECT_DIR / "menu_files"))
+# Филиалы со своими прайсами: "центр=menu_files/center;север=menu_files/north"
+# (пусто - один филиал с MENU_FILES_DIR)
+MENU_BRANCHES = os.getenv('MENU_BRANCHES', '')
 
 # Настройка логирования
 def setup_logging():
@@ -96,6 +99,8 @@ try:
     except ImportError:
         from services.menu_service_table_format import MenuService  # Табличный формат в services
     
+    from services.menu_registry import MenuRegistry, parse_branches, DEFAULT_BRANCH, DEFAULT_REGISTRY_MAX_MB
+    from services.session_store import SessionStore, DEFAULT_SESSION_TTL, DEFAULT_MAX_SESSIONS, DEFAULT_SESSIONS_MAX_MB
     from services.claude_api_service import EnhancedClaudeAPIService, create_enhanced_claude_service
     from services.excel_estimate_generator import ExcelEstimateGenerator
     from services.catering_rules_service import CateringRulesService
@@ -169,14 +174,58 @@ class EventBotAI:
         try:
             logger.info("🔧 Инициализация сервисов EventBot...")
             
-            # ИСПРАВЛЕНО: MenuService с menu_files
-            logger.info(f"📁 Инициализация MenuService с папкой: {MENU_FILES_DIR}")
-            self.menu_service = MenuService(str(MENU_FILES_DIR))
+            # Каталоги филиалов: загружаются при первом обращении, лишние выгружаются по LRU
+            branches = parse_branches(MENU_BRANCHES) or {DEFAULT_BRANCH: MENU_FILES_DIR}
+            logger.info(f"🏢 Филиалы меню: {', '.join(f'{name} ({path})' for name, path in branches.items())}")
+            self.menu_registry = MenuRegistry(
+                branches,
+                MenuService,
+                default_branch=os.getenv('MENU_DEFAULT_BRANCH') or None,
+                # MENU_REGISTRY_MAX_MB: лимит памяти каталогов всех филиалов
+                max_bytes=int(os.getenv('MENU_REGISTRY_MAX_MB', DEFAULT_REGISTRY_MAX_MB) or DEFAULT_REGISTRY_MAX_MB) << 20,
+                # Автоматическое применение правок в menu_files (MENU_WATCH_INTERVAL, секунды)
+                watch_interval=float(os.getenv('MENU_WATCH_INTERVAL', '0') or 0),
+                # MENU_PARSE_WORKERS: процессов для разбора прайсов (0 - авто, 1 - без пула)
+                parse_workers=int(os.getenv('MENU_PARSE_WORKERS', '0') or 0)
+            )
+            # Сервисы работают с каталогом филиала текущего чата
+            self.menu_service = self.menu_registry.service
+            self.menu_registry.get()
+
+            # Сессии диалогов по пользователям: SESSION_TTL (секунды), SESSIONS_MAX,
+            # SESSIONS_MAX_MB; SESSIONS_SNAPSHOT=true - сохранять в data/sessions.json
+            self.sessions = SessionStore(
+                ttl=float(os.getenv('SESSION_TTL', DEFAULT_SESSION_TTL) or DEFAULT_SESSION_TTL),
+                max_sessions=int(os.getenv('SESSIONS_MAX', DEFAULT_MAX_SESSIONS) or DEFAULT_MAX_SESSIONS),
+                max_bytes=int(os.getenv('SESSIONS_MAX_MB', DEFAULT_SESSIONS_MAX_MB) or DEFAULT_SESSIONS_MAX_MB) << 20,
+                snapshot_path=Path("data/sessions.json") if os.getenv('SESSIONS_SNAPSHOT', 'false').lower() == 'true' else None
+            )
             
             # Claude API
             claude_api_key = os.getenv("CLAUDE_API_KEY")
             if claude_api_key:
-                self.claude_service = create_enhanced_claude_service(claude_api_key, "data")
+                self.claude_service = create_enhanced_claude_service(
+                    claude_api_key, "data", self.menu_service,
+                    # CLAUDE_BASE_URL: другой адрес API (прокси, локальная заглушка для тестов)
+                    base_url=os.getenv('CLAUDE_BASE_URL') or None,
+                    # CLAUDE_MAX_CONCURRENCY: одновременных запросов к API, остальные ждут очереди
+                    max_concurrency=int(os.getenv('CLAUDE_MAX_CONCURRENCY', '16') or 16),
+                    max_connections=int(os.getenv('CLAUDE_MAX_CONNECTIONS', '32') or 32),
+                    # CLAUDE_TIMEOUT: таймаут одного вызова, секунды
+                    timeout=float(os.getenv('CLAUDE_TIMEOUT', '60') or 60),
+                    # Кэш ответов: CLAUDE_CACHE_SIZE (0 - выключен), CLAUDE_CACHE_TTL (секунды),
+                    # CLAUDE_CACHE_PERSIST=true - хранить в data/cache между перезапусками
+                    cache_size=int(os.getenv('CLAUDE_CACHE_SIZE', '1024') or 0),
+                    cache_ttl=float(os.getenv('CLAUDE_CACHE_TTL', '86400') or 86400),
+                    cache_persist=os.getenv('CLAUDE_CACHE_PERSIST', 'false').lower() == 'true',
+                    # CLAUDE_MENU_PROMPT_TOKENS: бюджет токенов на срез меню в промпте сметы
+                    menu_prompt_tokens=int(os.getenv('CLAUDE_MENU_PROMPT_TOKENS', '1200') or 1200),
+                    # CLAUDE_MENU_TOOLS=false - срез меню в промпте вместо инструментов каталога;
+                    # CLAUDE_MAX_TOOL_ROUNDS - лимит раундов вызовов инструментов на смету
+                    menu_tools=os.getenv('CLAUDE_MENU_TOOLS', 'true').lower() == 'true',
+                    max_tool_rounds=int(os.getenv('CLAUDE_MAX_TOOL_ROUNDS', '4') or 4),
+                    sessions=self.sessions
+                )
                 self.claude_service.load_menu_data()
                 logger.info("✅ Claude API инициализирован")
             else:
@@ -269,6 +318,7 @@ class EventBotAI:
         
         logger.info(f"👤 Команда /start от {username} ({first_name}, ID: {user_id})")
         
+        await self._use_chat_branch(update)
         if not self._check_access(user_id):
             await update.message.reply_text(
                 "❌ **Доступ запрещен**\n\n"
@@ -290,7 +340,7 @@ class EventBotAI:
 ✨ *Интеллектуальная система создания банкетных смет*
 
 📊 **Статус системы:**
-• 📁 Папка меню: **{MENU_FILES_DIR.name}**
+• 📁 Папка меню: **{self.menu_service.menu_files_dir.name}**
 • 📄 TXT файлов: **{menu_stats.get('txt_files_count', 0)}**
 • 📊 Позиций меню: **{menu_stats['total_items']}**
 • 📂 Категорий: **{menu_stats['categories']}**  
@@ -335,6 +385,7 @@ class EventBotAI:
         """Обработчик кнопок"""
         query = update.callback_query
         await query.answer()
+        await self._use_chat_branch(update)
         
         user_id = query.from_user.id
         if not self._check_access(user_id):
@@ -380,7 +431,7 @@ class EventBotAI:
 ✅ **Меню успешно перезагружено!**
 
 📊 **Новая статистика:**
-• 📁 Папка: {MENU_FILES_DIR}
+• 📁 Папка: {self.menu_service.menu_files_dir}
 • 📄 TXT файлов: {menu_stats.get('txt_files_count', 0)}
 • 📋 Позиций: {menu_stats['total_items']}
 • 📂 Категорий: {menu_stats['categories']}
@@ -505,7 +556,7 @@ class EventBotAI:
 ✅ **Меню успешно перезагружено!**
 
 📊 **Новая статистика:**
-• 📁 Папка: {MENU_FILES_DIR}
+• 📁 Папка: {self.menu_service.menu_files_dir}
 • 📄 TXT файлов: {menu_stats.get('txt_files_count', 0)}
 • 📋 Позиций: {menu_stats['total_items']}
 • 📂 Категорий: {menu_stats['categories']}
@@ -544,7 +595,7 @@ class EventBotAI:
 📋 **Каталог меню РестДеливери**
 
 📊 **Загружено из TXT файлов (табличный формат):**
-• 📁 Папка: **{MENU_FILES_DIR.name}**
+• 📁 Папка: **{self.menu_service.menu_files_dir.name}**
 • 📄 TXT файлов: **{menu_stats.get('txt_files_count', 0)}**
 • 🍽️ Всего позиций: **{menu_stats['total_items']}**
 • 📂 Категорий: **{len(categories)}**
@@ -554,8 +605,13 @@ class EventBotAI:
 """
             
             category_details = menu_stats.get('categories_detail', {})
+            category_stats = menu_stats.get('categories_stats', {})
             for i, (category, count) in enumerate(category_details.items(), 1):
-                catalog_text += f"{i}. **{category}**: {count} позиций\n"
+                stats = category_stats.get(category, {})
+                price_info = ""
+                if stats.get('count'):
+                    price_info = f" ({stats['min_price']:,.0f}–{stats['max_price']:,.0f}₽, медиана {stats['price_quantiles']['p50']:,.0f}₽)"
+                catalog_text += f"{i}. **{category}**: {count} позиций{price_info}\n"
             
             catalog_text += f"""
 
@@ -563,7 +619,8 @@ class EventBotAI:
 Отправьте описание мероприятия, и я автоматически подберу оптимальное меню из каталога.
 
 🔍 **Поиск по меню:**
-Напишите "Найти [название блюда]" или "Найти [артикул]" для поиска.
+Напишите "Найти [название блюда]" или "Найти [артикул]" для поиска,
+"Похожие [название блюда]" - для альтернатив блюду.
 
 🔄 **Обновление меню:**
 Меню загружается из TXT файлов в табличном формате:
@@ -596,6 +653,7 @@ class EventBotAI:
         """Показ статистики"""
         try:
             menu_stats = self.menu_service.get_menu_stats()
+            claude_cache = (self.claude_service.get_cache_stats() if self.claude_service else None) or {}
             
             client_stats = {}
             try:
@@ -607,13 +665,20 @@ class EventBotAI:
 📊 **Статистика EventBot AI v2.1**
 
 📁 **Система меню (TXT файлы):**
-• 📂 Папка: **{MENU_FILES_DIR}**
+• 🏢 Филиал: **{self.menu_registry.current_branch}** (загружено {len(self.menu_registry.loaded_branches())} из {len(self.menu_registry.branches)})
+• 📂 Папка: **{self.menu_service.menu_files_dir}**
 • 📄 TXT файлов: **{menu_stats.get('txt_files_count', 0)}**
 • 🍽️ Позиций в меню: **{menu_stats['total_items']}**
 • 📂 Категорий: **{menu_stats['categories']}**
+• 💰 Средняя цена позиции: **{menu_stats.get('price_stats', {}).get('avg_price', 0):,.0f}₽** ({menu_stats.get('price_stats', {}).get('price_per_gram') or 0:.2f}₽/г)
+• ⚡ Кэш подбора: **{menu_stats.get('selection_cache', {}).get('hits', 0)}** попаданий / **{menu_stats.get('selection_cache', {}).get('misses', 0)}** промахов
 
 🤖 **Системные сервисы:**
 • 🧠 Claude AI: **{"✅ Работает" if self.claude_service and self.claude_service.is_available() else "❌ Недоступен"}**
+• ⚡ Кэш ответов Claude: **{claude_cache.get('hits', 0)}** попаданий / **{claude_cache.get('misses', 0)}** промахов ({claude_cache.get('hit_rate', 0):.0%})
+• 🔗 Объединено одинаковых запросов: **{claude_cache.get('coalesced', 0)}**
+• 🔧 Запросов Claude к меню: **{claude_cache.get('tool_calls', 0)}** (из кэша **{claude_cache.get('tool_cache_hits', 0)}**)
+• 💬 Активных сессий: **{len(self.sessions)}**
 • 🎯 SuperAI: **{"✅ Работает" if self.super_ai_agent else "❌ Недоступен"}**
 • 📊 Excel: **✅ Готов**
 • 💾 База данных: **✅ Активна**
@@ -699,7 +764,7 @@ class EventBotAI:
 ❓ **Справка EventBot AI v2.1**
 
 🆕 **Что нового в v2.1:**
-• 📁 Меню загружается из папки **{MENU_FILES_DIR.name}**
+• 📁 Меню загружается из папки **{self.menu_service.menu_files_dir.name}**
 • 📄 Поддержка табличного формата TXT (TSV)
 • 🏷️ Автоматическое создание ID из артикулов  
 • 📝 Поддержка описаний блюд
@@ -733,6 +798,8 @@ K001	Канапе с лососем	Изысканное канапе	30	180
 • `/help` - Эта справка
 • `Найти [блюдо]` - Поиск в меню
 • `Найти [артикул]` - Поиск по артикулу
+• `Похожие [блюдо]` - Альтернативы блюду
+• `Филиал [название]` - Меню другой кухни для этого чата
 
 🏢 **РестДеливери** - Ваш надежный партнер!
         """
@@ -761,12 +828,22 @@ K001	Канапе с лососем	Изысканное канапе	30	180
         
         request_text = update.message.text
         logger.info(f"📝 Сообщение от {username} ({first_name}): {request_text[:100]}...")
+        await self._use_chat_branch(update)
+        
+        branch = self._parse_branch_command(request_text)
+        if branch is not None:
+            await self.select_branch(update, branch)
+            return
         
         # Обработка команд поиска
         if request_text.lower().startswith("найти "):
             await self.search_menu(update, request_text[6:])
             return
         
+        if request_text.lower().startswith("похожие "):
+            await self.similar_menu(update, request_text[8:])
+            return
+        
         # Индикатор обработки
         await context.bot.send_chat_action(
             chat_id=update.effective_chat.id, 
@@ -888,6 +965,77 @@ K001	Канапе с лососем	Изысканное канапе	30	180
             logger.error(f"❌ Ошибка поиска: {e}")
             await update.message.reply_text("❌ Ошибка поиска по меню")
     
+    async def select_branch(self, update: Update, branch: str):
+        """Выбор филиала (кухни) для чата: "Филиал <название>", без названия - список"""
+        chat_id = update.effective_chat.id
+        branch = branch.strip()
+        
+        if branch and self.menu_registry.select_branch(chat_id, branch):
+            await self.menu_registry.preload()
+            menu_stats = self.menu_service.get_menu_stats()
+            response = (f"🏢 Филиал **{self.menu_registry.current_branch}** выбран\n"
+                        f"📊 Позиций меню: **{menu_stats['total_items']}**, категорий: **{menu_stats['categories']}**")
+        else:
+            current = self.menu_registry.branch_for_chat(chat_id)
+            response = f"❌ Филиал '{branch}' не найден\n\n" if branch else ""
+            response += "🏢 **Филиалы:**\n"
+            for name in self.menu_registry.branches:
+                response += f"• {name}{' ✅' if name == current else ''}\n"
+            response += "\nВыбор: `Филиал <название>`"
+        
+        await update.message.reply_text(response, parse_mode='Markdown')
+    
+    def _parse_branch_command(self, text: str) -> Optional[str]:
+        """Название филиала из команды "Филиал <название>" (None - это не команда)
+        
+        Бриф, начинающийся со слова "филиал" ("Филиал на Тверской, фуршет
+        50 человек"), командой не считается: после слова должно идти
+        известное название филиала или короткая строка без цифр.
+        """
+        first_word, _, rest = text.strip().partition(' ')
+        if first_word.lower() != "филиал":
+            return None
+        rest = rest.strip()
+        if not rest or rest.lower() in self.menu_registry.branches:
+            return rest
+        if '\n' in rest or any(char.isdigit() for char in rest) or len(rest.split()) > 3:
+            return None
+        return rest
+    
+    async def _use_chat_branch(self, update: Update):
+        """Каталог филиала чата для обработки этого обновления
+        
+        Незагруженный каталог филиала разбирается в потоке, не задерживая
+        обработку сообщений других чатов.
+        """
+        if update.effective_chat:
+            await self.menu_registry.preload(self.menu_registry.use_chat(update.effective_chat.id))
+    
+    async def similar_menu(self, update: Update, dish_query: str):
+        """Похожие блюда (альтернативы позиции)"""
+        try:
+            found = self.menu_service.search_items(dish_query, 1)
+            if not found:
+                await update.message.reply_text(f"❌ Блюдо '{dish_query}' не найдено", parse_mode='Markdown')
+                return
+            
+            dish = found[0]
+            similar = self.menu_service.get_similar_items(dish['id'], 8)
+            if similar:
+                response = f"🔁 **Похожие на «{dish['name']}»** ({dish['price']}₽)\n\n"
+                for i, item in enumerate(similar, 1):
+                    response += f"{i}. **{item['name']}**\n"
+                    response += f"   Категория: {item['category']}\n"
+                    response += f"   Цена: {item['price']}₽, вес: {item['weight']}г\n\n"
+            else:
+                response = f"🤔 Для «{dish['name']}» похожих блюд в каталоге нет"
+            
+            await update.message.reply_text(response, parse_mode='Markdown')
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка подбора похожих блюд: {e}")
+            await update.message.reply_text("❌ Ошибка подбора похожих блюд")
+    
     async def send_excel_file(self, update: Update, file_path: str):
         """Отправка Excel файла"""
         try:
@@ -944,6 +1092,7 @@ K001	Канапе с лососем	Изысканное канапе	30	180
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /help"""
+        await self._use_chat_branch(update)
         fake_query = type('obj', (object,), {
             'edit_message_text': update.message.reply_text
         })()
@@ -951,6 +1100,7 @@ K001	Канапе с лососем	Изысканное канапе	30	180
     
     async def menu_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /menu"""
+        await self._use_chat_branch(update)
         fake_query = type('obj', (object,), {
             'edit_message_text': update.message.reply_text
         })()
@@ -964,6 +1114,9 @@ K001	Канапе с лососем	Изысканное канапе	30	180
                 .token(self.token)
                 .connect_timeout(30.0)
                 .read_timeout(30.0)
+                # Обновления разных чатов обрабатываются параллельно (BOT_CONCURRENT_UPDATES)
+                .concurrent_updates(int(os.getenv('BOT_CONCURRENT_UPDATES', '64') or 64))
+                .post_shutdown(self._shutdown)
                 .build()
             )
             
@@ -988,6 +1141,13 @@ K001	Канапе с лососем	Изысканное канапе	30	180
             logger.error(traceback.format_exc())
             raise
 
+    async def _shutdown(self, application: Application):
+        """Освобождение ресурсов при остановке бота"""
+        if self.claude_service:
+            await self.claude_service.aclose()
+        self.sessions.save()
+        self.menu_registry.stop_watchers()
+
 def signal_handler(signum, frame):
     """Обработчик сигналов завершения"""
     logger.info("🛑 Получен сигнал завершения работы...")
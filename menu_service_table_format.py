@@ -5,23 +5,81 @@ Menu Service - АДАПТИРОВАННАЯ версия для таблично
 Формат: Артикул	Наименование	Описание	Вес (г)	Цена (₽)
 """
 
+import itertools
 import json
 import logging
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-import re
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+try:
+    from services.menu_index import MenuIndex, item_id_key, stable_item_id
+    from services.menu_search import MenuSearchIndex, FuzzyMenuIndex
+    from services.menu_snapshot import MenuSnapshot, MenuFileState, MenuFileWatcher, menu_content_digest
+    from services.menu_cache import MenuCatalogCache
+    from services.menu_item import MenuItem, MenuItemPool, is_serving_set, set_units
+    from services.menu_selection_cache import MenuSelectionCache
+    from services.menu_parser import scan_menu_file
+    from services.menu_sources import find_menu_files, get_menu_source, load_menu_sources
+    from services.menu_attributes import attribute_labels, diet_restrictions
+    from services.menu_prompt import DEFAULT_PROMPT_MENU_TOKENS, build_menu_context
+except ImportError:
+    from menu_index import MenuIndex, item_id_key, stable_item_id
+    from menu_search import MenuSearchIndex, FuzzyMenuIndex
+    from menu_snapshot import MenuSnapshot, MenuFileState, MenuFileWatcher, menu_content_digest
+    from menu_cache import MenuCatalogCache
+    from menu_item import MenuItem, MenuItemPool, is_serving_set, set_units
+    from menu_selection_cache import MenuSelectionCache
+    from menu_parser import scan_menu_file
+    from menu_sources import find_menu_files, get_menu_source, load_menu_sources
+    from menu_attributes import attribute_labels, diet_restrictions
+    from menu_prompt import DEFAULT_PROMPT_MENU_TOKENS, build_menu_context
 
 logger = logging.getLogger(__name__)
 
+# Шаг корзины бюджета на человека для кэша подбора, ₽
+SELECTION_BUDGET_STEP = 100
+# С этого числа гостей меню может собираться из сетов на компанию
+SET_MENU_MIN_GUESTS = 40
+
 
 class MenuService:
     """Сервис для работы с меню - ВЕРСИЯ ДЛЯ ТАБЛИЧНОГО ФОРМАТА"""
     
-    def __init__(self, menu_files_dir: str = "menu_files"):
+    def __init__(self, menu_files_dir: str = "menu_files", cache_dir: Optional[str] = "data/cache",
+                 parse_workers: int = 0, item_pool: Optional[MenuItemPool] = None,
+                 versions: Optional[Iterator[int]] = None):
         self.menu_files_dir = Path(menu_files_dir)
-        self.menu_items = []
-        self.categories = {}
-        self.txt_files = []
+        # Процессов для разбора: 0 - по числу ядер для больших выгрузок, 1 - без пула
+        self.parse_workers = parse_workers
+        # Общий пул одинаковых позиций (несколько филиалов в одном процессе)
+        self._item_pool = item_pool
+        
+        # Каталог живет в неизменяемом снимке, перезагрузка подменяет его целиком.
+        # Общий счетчик versions делает версии уникальными между каталогами филиалов
+        self._snapshot = MenuSnapshot.empty()
+        self._versions = versions or itertools.count(1)
+        # Снимок, закрепленный за текущим запросом (pin), и счетчики закреплений по версиям
+        self._pinned: ContextVar[Optional[MenuSnapshot]] = ContextVar(f"menu_snapshot_{id(self)}", default=None)
+        self._pins: Dict[int, int] = {}
+        self._pins_lock = threading.Lock()
+        self._live_snapshots: 'weakref.WeakValueDictionary[int, MenuSnapshot]' = weakref.WeakValueDictionary()
+        
+        # Разобранные файлы из кэша на диске: неизменившиеся файлы не парсятся при старте
+        self._catalog_cache = MenuCatalogCache(self.menu_files_dir, cache_dir) if cache_dir else None
+        self._file_states: Dict[Path, MenuFileState] = {
+            path: replace(state, items=self._share_items(state.items))
+            for path, state in (self._catalog_cache.load() if self._catalog_cache else {}).items()
+        }
+        self._reload_lock = threading.RLock()
+        self._watcher: Optional[MenuFileWatcher] = None
+        
+        # Кэш подбора меню по параметрам мероприятия и версии меню
+        self._selection_cache = MenuSelectionCache()
         
         # Правила подбора по типам мероприятий
         self.event_rules = {
@@ -83,291 +141,262 @@ class MenuService:
         
         self.load_menu_from_txt_files()
     
-    def load_menu_from_txt_files(self):
-        """Загрузка меню из txt файлов табличного формата"""
-        try:
-            logger.info(f"🔍 Поиск txt файлов в папке: {self.menu_files_dir}")
-            logger.info(f"📁 Абсолютный путь: {self.menu_files_dir.absolute()}")
-            
-            if not self.menu_files_dir.exists():
-                logger.warning(f"⚠️ Папка {self.menu_files_dir} не найдена")
-                self._create_menu_files_directory()
-                return
-            
-            # Ищем все txt файлы
-            txt_files = list(self.menu_files_dir.glob("*.txt"))
-            
-            logger.info(f"📂 Содержимое папки {self.menu_files_dir}:")
-            for item in self.menu_files_dir.iterdir():
-                logger.info(f"  - {item.name} ({'файл' if item.is_file() else 'папка'})")
-            
-            if not txt_files:
-                logger.warning(f"⚠️ Txt файлы не найдены в {self.menu_files_dir}")
-                self._create_sample_txt_files()
-                txt_files = list(self.menu_files_dir.glob("*.txt"))
-            
-            self.txt_files = txt_files
-            logger.info(f"📁 Найдено txt файлов: {len(txt_files)}")
-            for txt_file in txt_files:
-                logger.info(f"  - {txt_file.name}")
-            
-            # Загружаем данные из каждого файла
-            total_items = 0
-            for txt_file in txt_files:
-                logger.info(f"📄 Обрабатываем файл: {txt_file.name}")
-                items_count = self._load_menu_from_txt_file(txt_file)
-                total_items += items_count
-                logger.info(f"📄 {txt_file.name}: загружено {items_count} позиций")
-            
-            # Группируем по категориям
-            self._categorize_items()
-            
-            # ДОБАВЛЯЕМ ОТЛАДОЧНУЮ ИНФОРМАЦИЮ О КАТЕГОРИЯХ
-            logger.info(f"📂 Созданные категории:")
-            for category, items in self.categories.items():
-                logger.info(f"  - {category}: {len(items)} позиций")
-            
-            logger.info(f"✅ Всего загружено {total_items} позиций из {len(txt_files)} файлов")
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка загрузки txt файлов: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            self._create_default_menu()
-    
-    def _load_menu_from_txt_file(self, txt_file: Path) -> int:
-        """Загрузка меню из одного txt файла табличного формата"""
-        try:
-            logger.info(f"📖 Читаем файл: {txt_file}")
-            with open(txt_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            if not lines:
-                logger.warning(f"⚠️ Файл {txt_file.name} пустой")
-                return 0
-            
-            logger.info(f"📄 В файле {txt_file.name} строк: {len(lines)}")
-            
-            # Определяем категорию по имени файла
-            category = self._determine_category_from_filename(txt_file.name)
-            logger.info(f"📂 Категория для {txt_file.name}: {category}")
-            
-            # Парсим содержимое (пропускаем заголовок)
-            items = self._parse_table_content(lines, category, txt_file.name)
-            
-            logger.info(f"✅ Из файла {txt_file.name} извлечено {len(items)} позиций")
-            for item in items[:3]:  # Показываем первые 3 для отладки
-                logger.info(f"   - {item['article']}: {item['name']} ({item['price']}₽)")
-            
-            # Добавляем к общему списку
-            self.menu_items.extend(items)
-            
-            return len(items)
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка чтения файла {txt_file}: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return 0
-    
-    def _determine_category_from_filename(self, filename: str) -> str:
-        """Определение категории по имени файла"""
-        filename_lower = filename.lower()
-        
-        category_mapping = {
-            'канапе': 'Канапе',
-            'брускетт': 'Брускетты',
-            'салат': 'Салаты',
-            'банкет': 'Банкетные блюда',
-            'горячие': 'Горячие закуски',
-            'холодные': 'Холодные закуски',
-            'десерт': 'Десерты',
-            'сэндвич': 'Сэндвичи',
-            'выпечка': 'Выпечка',
-            'напитки': 'Напитки',
-            'гарнир': 'Гарниры',
-            'сет': 'Готовые сеты',
-            'меню': 'Основное меню'
-        }
-        
-        for keyword, category in category_mapping.items():
-            if keyword in filename_lower:
-                return category
-        
-        # Если не определили, используем имя файла как категорию
-        return filename.replace('.txt', '').replace('_', ' ').title()
-    
-    def _parse_table_content(self, lines: List[str], category: str, filename: str) -> List[Dict[str, Any]]:
-        """Парсинг табличного содержимого"""
-        items = []
-        
-        logger.info(f"🔍 Парсинг файла {filename}, строк: {len(lines)}")
-        
-        # Проверяем заголовок (первая строка)
-        if lines and lines[0].strip():
-            header = lines[0].strip()
-            logger.info(f"📋 Заголовок файла {filename}: {header}")
-            
-            # Проверяем что это табличный формат
-            if '\t' in header or 'Артикул' in header:
-                logger.info(f"✅ Обнаружен табличный формат в {filename}")
-                # Пропускаем заголовок
-                data_lines = lines[1:]
-            else:
-                logger.warning(f"⚠️ Заголовок не найден в {filename}, обрабатываем все строки")
-                # Если заголовка нет, обрабатываем все строки
-                data_lines = lines
-        else:
-            data_lines = lines
-        
-        logger.info(f"📄 Строк данных для обработки: {len(data_lines)}")
-        
-        # Обрабатываем строки данных
-        processed_count = 0
-        for line_num, line in enumerate(data_lines, 2):  # Начинаем с 2, так как 1 - заголовок
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            logger.debug(f"🔍 Обрабатываем строку {line_num}: {line[:100]}...")
-            
-            try:
-                item = self._parse_table_line(line, category, line_num, filename)
-                if item:
-                    items.append(item)
-                    processed_count += 1
-                    logger.debug(f"✅ Строка {line_num} обработана: {item['name']}")
-                else:
-                    logger.warning(f"⚠️ Строка {line_num} не обработана")
-            except Exception as e:
-                logger.warning(f"⚠️ Ошибка парсинга строки {line_num} в {filename}: {e}")
-                logger.warning(f"Строка: {line}")
-        
-        logger.info(f"✅ Из {filename} успешно обработано {processed_count} из {len(data_lines)} строк")
-        
-        return items
-    
-    def _parse_table_line(self, line: str, category: str, line_num: int, filename: str) -> Optional[Dict[str, Any]]:
-        """Парсинг одной строки табличного формата"""
-        
-        # Разделяем по табуляции
-        parts = line.split('\t')
-        
-        logger.debug(f"🔍 Строка {line_num}: найдено {len(parts)} колонок")
-        logger.debug(f"    Колонки: {[p[:30] + '...' if len(p) > 30 else p for p in parts]}")
-        
-        if len(parts) >= 5:
-            # Полный формат: Артикул	Наименование	Описание	Вес (г)	Цена (₽)
+    def load_menu_from_txt_files(self, force: bool = False) -> bool:
+        """Загрузка меню из файлов каталога (txt табличного формата, json, csv, xlsx)
+        
+        Перечитываются только изменившиеся файлы (mtime + хеш содержимого),
+        новый снимок каталога подменяется целиком. Возвращает True, если
+        снимок обновлен; ошибка перезагрузки оставляет текущий снимок.
+        """
+        with self._reload_lock:
             try:
-                article = parts[0].strip()
-                name = parts[1].strip()
-                description = parts[2].strip()
-                weight_str = parts[3].strip()
-                price_str = parts[4].strip()
-                
-                logger.debug(f"    Артикул: {article}")
-                logger.debug(f"    Название: {name}")
-                logger.debug(f"    Вес: {weight_str}")
-                logger.debug(f"    Цена: {price_str}")
+                logger.info(f"🔍 Поиск файлов меню в: {self.menu_files_dir}")
+                logger.info(f"📁 Абсолютный путь: {self.menu_files_dir.absolute()}")
                 
-                # Извлекаем числовые значения
-                weight = self._extract_number(weight_str)
-                price = self._extract_number(price_str)
+                if not self.menu_files_dir.exists():
+                    logger.warning(f"⚠️ Папка {self.menu_files_dir} не найдена")
+                    self._create_menu_files_directory()
+                    return False
                 
-                logger.debug(f"    Извлечено - Вес: {weight}г, Цена: {price}₽")
+                # Ищем все файлы меню поддерживаемых форматов
+                txt_files = self._find_txt_files()
                 
-                if not name:
-                    logger.warning(f"⚠️ Пустое название в строке {line_num}")
-                    return None
+                if self.menu_files_dir.is_dir():
+                    logger.info(f"📂 Содержимое папки {self.menu_files_dir}:")
+                    for item in self.menu_files_dir.iterdir():
+                        logger.info(f"  - {item.name} ({'файл' if item.is_file() else 'папка'})")
                 
-                # Создаем ID на основе артикула
-                item_id = self._create_id_from_article(article, line_num)
+                if not txt_files:
+                    logger.warning(f"⚠️ Файлы меню не найдены в {self.menu_files_dir}")
+                    self._create_sample_txt_files()
+                    txt_files = self._find_txt_files()
                 
-                logger.debug(f"    Создан ID: {item_id}")
+                logger.info(f"📁 Найдено файлов меню: {len(txt_files)}")
                 
-                item = {
-                    'id': item_id,
-                    'article': article,
-                    'name': name,
-                    'description': description,
-                    'category': category,
-                    'price': max(1, price),
-                    'weight': max(1, weight),
-                    'unit': 'шт',
-                    'source_file': filename
-                }
+                # Перечитываем только изменившиеся файлы: сначала stat и хеш,
+                # затем одним пакетом (при больших объемах - в пуле процессов)
+                file_states = {}
+                pending = {}
+                changed = force or set(txt_files) != set(self._file_states)
+                for txt_file in txt_files:
+                    previous_state = None if force else self._file_states.get(txt_file)
+                    state, scan = self._scan_file_state(txt_file, previous_state)
+                    file_states[txt_file] = state
+                    if scan:
+                        pending[txt_file] = scan
                 
-                logger.debug(f"    ✅ Создан элемент: {item['name']} (ID: {item['id']})")
-                return item
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка обработки полного формата в строке {line_num}: {e}")
-                logger.error(f"    Строка: {line}")
-                return None
-        
-        elif len(parts) >= 3:
-            # Сокращенный формат: может быть без описания
-            try:
-                article = parts[0].strip()
-                name = parts[1].strip()
-                weight_str = parts[2].strip() if len(parts) > 2 else "100"
-                price_str = parts[3].strip() if len(parts) > 3 else "500"
+                if pending:
+                    parsed = load_menu_sources(
+                        [(txt_file, ranges) for txt_file, (_, _, ranges) in pending.items()],
+                        self.parse_workers
+                    )
+                    for txt_file, (stat, digest, _) in pending.items():
+                        if txt_file not in parsed:
+                            # Недописанный файл не должен обнулять уже загруженные позиции
+                            if not file_states[txt_file].digest:
+                                changed = True
+                            continue
+                        items = self._share_items(parsed[txt_file])
+                        file_states[txt_file] = MenuFileState(stat.st_mtime_ns, stat.st_size, digest, items)
+                        changed = True
+                        logger.info(f"📄 {txt_file.name}: загружено {len(items)} позиций")
                 
-                weight = self._extract_number(weight_str)
-                price = self._extract_number(price_str)
+                if not changed and self._snapshot.version:
+                    logger.info("✅ Файлы меню не изменились")
+                    return False
                 
-                item_id = self._create_id_from_article(article, line_num)
+                self._file_states = file_states
+                if changed and self._catalog_cache:
+                    self._catalog_cache.save(file_states)
+                self._swap_snapshot(
+                    {path.name: state.items for path, state in file_states.items()},
+                    txt_files,
+                    menu_content_digest(
+                        (path.name, state.digest) for path, state in file_states.items()
+                    )
+                )
                 
-                logger.debug(f"    ✅ Сокращенный формат: {name} (ID: {item_id})")
+                # ДОБАВЛЯЕМ ОТЛАДОЧНУЮ ИНФОРМАЦИЮ О КАТЕГОРИЯХ
+                logger.info(f"📂 Созданные категории:")
+                for category, items in self.categories.items():
+                    logger.info(f"  - {category}: {len(items)} позиций")
                 
-                return {
-                    'id': item_id,
-                    'article': article,
-                    'name': name,
-                    'description': '',
-                    'category': category,
-                    'price': max(1, price),
-                    'weight': max(1, weight),
-                    'unit': 'шт',
-                    'source_file': filename
-                }
+                logger.info(f"✅ Всего загружено {len(self.menu_items)} позиций из {len(txt_files)} файлов "
+                            f"(версия меню {self.menu_version})")
+                return True
                 
             except Exception as e:
-                logger.error(f"❌ Ошибка обработки сокращенного формата в строке {line_num}: {e}")
-                return None
+                logger.error(f"❌ Ошибка загрузки файлов меню: {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+                if self._snapshot.version:
+                    # Ошибка при перезагрузке: рабочий каталог остается как есть
+                    logger.warning(f"⚠️ Оставлено текущее меню (версия {self.menu_version})")
+                    return False
+                # Демо-меню - только если при первой загрузке каталога нет вовсе
+                self._create_default_menu()
+                return True
+    
+    def _share_items(self, items: tuple) -> tuple:
+        """Позиции из общего пула: одинаковые позиции филиалов хранятся один раз"""
+        return self._item_pool.share(items) if self._item_pool is not None else items
+    
+    def _find_txt_files(self) -> List[Path]:
+        """Файлы меню в стабильном порядке: txt, json, csv, xlsx
         
-        else:
-            logger.warning(f"⚠️ Недостаточно данных в строке {line_num}: {len(parts)} колонок (нужно минимум 3)")
-            logger.warning(f"    Содержимое: {parts}")
-            return None
+        menu_files_dir может указывать и на один файл-каталог (например data/menu.json).
+        """
+        return find_menu_files(self.menu_files_dir)
     
-    def _create_id_from_article(self, article: str, line_num: int) -> int:
-        """Создание ID на основе артикула"""
-        if article:
-            # Извлекаем числовую часть из артикула
-            numbers = re.findall(r'\d+', article)
-            if numbers:
-                # Используем первое число из артикула
-                base_id = int(numbers[0])
-                # Добавляем смещение чтобы избежать конфликтов
-                return base_id + (hash(article) % 1000)
-            else:
-                # Если нет чисел в артикуле, генерируем на основе хеша
-                return abs(hash(article)) % 10000 + 1000
-        else:
-            # Если артикул пустой, используем номер строки
-            return line_num + 10000
+    def _scan_file_state(self, txt_file: Path, state: Optional[MenuFileState]):
+        """Состояние файла без разбора: (состояние, None) если файл не изменился,
+        иначе (прежнее или пустое состояние, (stat, хеш, диапазоны для разбора))"""
+        empty_state = MenuFileState(0, 0, '', ())
+        try:
+            stat = txt_file.stat()
+            if state and state.mtime_ns == stat.st_mtime_ns and state.size == stat.st_size:
+                return state, None
+            
+            digest, ranges = scan_menu_file(txt_file, get_menu_source(txt_file).chunk_bytes)
+            if state and state.digest == digest:
+                # Файл "тронули", но содержимое прежнее
+                return MenuFileState(stat.st_mtime_ns, stat.st_size, digest, state.items), None
+            
+            return state or empty_state, (stat, digest, ranges)
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка чтения файла {txt_file}: {e}")
+            return state or empty_state, None
+    
+    def _swap_snapshot(self, file_items: Dict[str, tuple], txt_files: List[Path], content_digest: str = ''):
+        """Атомарная подмена снимка каталога"""
+        snapshot = MenuSnapshot(next(self._versions), file_items, txt_files, previous=self._snapshot,
+                                content_digest=content_digest)
+        self._snapshot = snapshot
+        self._live_snapshots[snapshot.version] = snapshot
+        # Записи прежней версии больше не совпадут по ключу - освобождаем память
+        self._selection_cache.clear()
+    
+    def has_file_changes(self) -> bool:
+        """Быстрая проверка изменений в папке меню (только stat)"""
+        if not self.menu_files_dir.exists():
+            return False
+        
+        txt_files = self._find_txt_files()
+        if set(txt_files) != set(self._file_states):
+            return True
+        
+        for txt_file in txt_files:
+            stat = txt_file.stat()
+            state = self._file_states[txt_file]
+            if state.mtime_ns != stat.st_mtime_ns or state.size != stat.st_size:
+                return True
+        return False
+    
+    def start_watcher(self, interval: float = 5.0) -> MenuFileWatcher:
+        """Запуск фонового наблюдения за папкой меню"""
+        if self._watcher and self._watcher.is_alive():
+            return self._watcher
+        
+        self._watcher = MenuFileWatcher(self, interval)
+        self._watcher.start()
+        return self._watcher
+    
+    def stop_watcher(self):
+        """Остановка фонового наблюдения"""
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
+    
+    @property
+    def snapshot(self) -> MenuSnapshot:
+        """Снимок каталога: закрепленный за текущим запросом (pin), иначе текущий"""
+        return self._pinned.get() or self._snapshot
+    
+    @property
+    def menu_version(self) -> int:
+        """Версия снимка меню, с которым работает текущий запрос"""
+        return self.snapshot.version
+    
+    @property
+    def menu_fingerprint(self) -> str:
+        """Версия содержимого меню для ключей долгоживущих кэшей
+        
+        Хеш исходных файлов снимка: не меняется при перезапуске и совпадает
+        у филиалов с одинаковыми прайсами. Без файлов - номер версии.
+        """
+        snapshot = self.snapshot
+        return snapshot.content_digest or f"v{snapshot.version}"
     
-    def _extract_number(self, text: str) -> int:
-        """Извлечение числа из текста"""
-        if not text:
-            return 0
+    @contextmanager
+    def pin(self) -> Iterator[MenuSnapshot]:
+        """Закрепление снимка на время запроса
+        
+        Внутри блока все методы сервиса читают одну версию каталога, даже
+        если горячая перезагрузка уже подменила снимок. Закрепление видно
+        только текущей задаче asyncio (ContextVar); вложенный pin()
+        возвращает уже закрепленный снимок. Старый снимок освобождается
+        сборщиком мусора, когда его не держит ни один запрос.
+        """
+        pinned = self._pinned.get()
+        if pinned is not None:
+            yield pinned
+            return
+        
+        snapshot = self._snapshot
+        token = self._pinned.set(snapshot)
+        with self._pins_lock:
+            self._pins[snapshot.version] = self._pins.get(snapshot.version, 0) + 1
+        try:
+            yield snapshot
+        finally:
+            self._pinned.reset(token)
+            with self._pins_lock:
+                self._pins[snapshot.version] -= 1
+                if not self._pins[snapshot.version]:
+                    del self._pins[snapshot.version]
+    
+    def get_snapshot_stats(self) -> Dict[str, Any]:
+        """Версии в памяти: текущая, закрепленные запросами и еще не собранные"""
+        with self._pins_lock:
+            pins = dict(self._pins)
+        return {
+            'current_version': self._snapshot.version,
+            'pinned': pins,
+            'live_versions': sorted(self._live_snapshots.keys())
+        }
+    
+    @property
+    def menu_items(self):
+        return self.snapshot.menu_items
+    
+    @property
+    def categories(self):
+        return self.snapshot.categories
+    
+    @property
+    def txt_files(self):
+        return self.snapshot.txt_files
+    
+    @property
+    def index(self) -> MenuIndex:
+        return self.snapshot.index
+    
+    @property
+    def search_index(self) -> MenuSearchIndex:
+        return self.snapshot.search_index
+    
+    @property
+    def fuzzy_index(self) -> FuzzyMenuIndex:
+        return self.snapshot.fuzzy_index
+    
+    def _create_id_from_article(self, article: str, name: str = '') -> int:
+        """Создание стабильного ID на основе артикула
         
-        # Убираем все кроме цифр
-        numbers = re.findall(r'\d+', text)
-        if numbers:
-            return int(numbers[0])
-        return 0
+        ID детерминирован (blake2b от артикула, без артикула - от названия),
+        поэтому совпадает между перезапусками и процессами.
+        """
+        return stable_item_id(item_id_key(article, name))
     
     def _create_menu_files_directory(self):
         """Создание папки menu_files"""
@@ -426,18 +455,9 @@ D005	Тирамису порционный	Классический италья
         except Exception as e:
             logger.error(f"❌ Ошибка создания примеров: {e}")
     
-    def _categorize_items(self):
-        """Группировка блюд по категориям"""
-        self.categories = {}
-        for item in self.menu_items:
-            category = item.get('category', 'Другое')
-            if category not in self.categories:
-                self.categories[category] = []
-            self.categories[category].append(item)
-    
     def _create_default_menu(self):
         """Создание меню по умолчанию если txt файлы недоступны"""
-        self.menu_items = [
+        default_items = [
             {"id": 1001, "article": "B001", "name": "Говяжий бок на подушке из картофельно-тыквенного пюре", "category": "Банкетные блюда", "price": 1150, "weight": 250, "description": "Нежная говядина на воздушном пюре", "unit": "шт"},
             {"id": 1002, "article": "K001", "name": "Канапе с лососем и сливочным сыром", "category": "Канапе", "price": 180, "weight": 30, "description": "Изысканное канапе с копченым лососем", "unit": "шт"},
             {"id": 1003, "article": "S001", "name": "Салат Цезарь с курицей", "category": "Салаты", "price": 450, "weight": 200, "description": "Классический салат с куриной грудкой", "unit": "порция"},
@@ -445,18 +465,12 @@ D005	Тирамису порционный	Классический италья
             {"id": 1005, "article": "D001", "name": "Мини-чизкейк", "category": "Десерты", "price": 180, "weight": 80, "description": "Нежный чизкейк с ягодным топпингом", "unit": "шт"}
         ]
         
-        self._categorize_items()
+        self._swap_snapshot({'default': tuple(MenuItem.from_dict(item) for item in default_items)}, [])
         logger.info(f"✅ Создано меню по умолчанию: {len(self.menu_items)} позиций")
     
-    def get_items_for_event_type(self, event_type: str, guest_count: int, budget_per_person: Optional[float] = None) -> List[Dict[str, Any]]:
-        """Подбор блюд для типа мероприятия с исправленной обработкой ID"""
-        logger.info(f"🔍 Подбор меню: {event_type}, {guest_count} гостей, бюджет/чел: {budget_per_person}")
-        
-        # ОТЛАДОЧНАЯ ИНФОРМАЦИЯ
-        logger.info(f"📂 Доступные категории в меню: {list(self.categories.keys())}")
-        logger.info(f"📊 Всего позиций в меню: {len(self.menu_items)}")
-        
-        event_type = event_type.lower()
+    def _normalize_event_type(self, event_type: str) -> str:
+        """Приведение типа мероприятия к ключу event_rules"""
+        event_type = (event_type or '').lower()
         
         # Упрощаем тип мероприятия
         if 'банкет' in event_type:
@@ -472,25 +486,102 @@ D005	Тирамису порционный	Классический италья
             logger.warning(f"⚠️ Неизвестный тип мероприятия: {event_type}, используем фуршет")
             event_type = 'фуршет'
         
+        return event_type
+    
+    def _budget_bucket(self, budget_per_person: Optional[float]) -> Optional[int]:
+        """Корзина бюджета на человека (шаг SELECTION_BUDGET_STEP)"""
+        if not budget_per_person:
+            return None
+        return max(1, int(budget_per_person // SELECTION_BUDGET_STEP))
+    
+    def _target_weight(self, rules: Dict[str, Any], budget_per_person: Optional[float]) -> float:
+        """Целевая граммовка на человека: чем больше бюджет, тем ближе к верхней границе"""
+        min_weight, max_weight = rules['граммовка']
+        if not budget_per_person:
+            return (min_weight + max_weight) / 2
+        if budget_per_person < 2000:
+            return min_weight
+        if budget_per_person > 5000:
+            return max_weight
+        ratio = (budget_per_person - 2000) / 3000
+        return min_weight + (max_weight - min_weight) * ratio
+    
+    def compose_menu(self, event_type: str, guest_count: int, budget_per_person: Optional[float] = None,
+                     special_requests: Optional[List[str]] = None,
+                     use_sets: Optional[bool] = None) -> Dict[str, Any]:
+        """Состав меню с количествами под граммовку, доли категорий и бюджет
+        
+        В отличие от get_items_for_event_type количества считаются решателем
+        (MenuComposer), а не фиксированной долей от числа гостей.
+        special_requests - особые пожелания ('вегетарианское меню', ...).
+        use_sets - меню из целых сетов на компанию: True - если сетами
+        можно уложиться, None - для больших мероприятий, если сетами дешевле.
+        Результат кэшируется по параметрам и версии меню.
+        """
+        snapshot = self.snapshot
+        event_type = self._normalize_event_type(event_type)
+        rules = self.event_rules[event_type]
+        forbidden = diet_restrictions(special_requests)
+        
+        budget_bucket = self._budget_bucket(budget_per_person)
+        cache_key = ('compose', event_type, guest_count, budget_bucket, forbidden, use_sets, snapshot.version)
+        composition = self._selection_cache.get(cache_key)
+        if composition is None:
+            bucket_budget = budget_bucket * SELECTION_BUDGET_STEP if budget_bucket else None
+            target_weight = self._target_weight(rules, bucket_budget)
+            allowed_rows = snapshot.attributes.allowed_rows(forbidden) if forbidden else None
+            composition = snapshot.composer.compose(
+                rules,
+                guest_count,
+                bucket_budget,
+                target_weight=target_weight,
+                allowed_rows=allowed_rows
+            )
+            composition['mode'] = 'dishes'
+            
+            if use_sets or (use_sets is None and guest_count >= SET_MENU_MIN_GUESTS):
+                set_composition = snapshot.composer.compose_sets(
+                    event_type, rules, guest_count, bucket_budget,
+                    target_weight=target_weight,
+                    allowed_rows=allowed_rows
+                )
+                if set_composition and (use_sets or not composition['items']
+                                        or set_composition['cost_per_person'] < composition['cost_per_person']):
+                    composition = set_composition
+                    composition['mode'] = 'sets'
+            
+            composition['event_type'] = event_type
+            composition['diet'] = attribute_labels(forbidden)
+            composition['menu_version'] = snapshot.version
+            self._selection_cache.put(cache_key, composition)
+        
+        # Копии строк: вызывающий код может менять количества
+        result = dict(composition)
+        result['items'] = [dict(line) for line in composition['items']]
+        return result
+    
+    def get_items_for_event_type(self, event_type: str, guest_count: int, budget_per_person: Optional[float] = None,
+                                 special_requests: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Подбор блюд для типа мероприятия с исправленной обработкой ID
+        
+        Работает только на чтение с одним снимком каталога. Набор позиций
+        кэшируется по типу мероприятия, числу позиций, корзине бюджета, диете
+        и версии меню; количества считаются для конкретного числа гостей.
+        Диета из special_requests - маска запрещенных атрибутов позиций.
+        """
+        snapshot = self.snapshot
+        
+        logger.info(f"🔍 Подбор меню: {event_type}, {guest_count} гостей, бюджет/чел: {budget_per_person}")
+        
+        event_type = self._normalize_event_type(event_type)
         rules = self.event_rules[event_type]
-        selected_items = []
         
         # Определяем целевую граммовку
-        min_weight, max_weight = rules['граммовка']
-        if budget_per_person:
-            if budget_per_person < 2000:
-                target_weight = min_weight
-            elif budget_per_person > 5000:
-                target_weight = max_weight
-            else:
-                ratio = (budget_per_person - 2000) / 3000
-                target_weight = min_weight + (max_weight - min_weight) * ratio
-        else:
-            target_weight = (min_weight + max_weight) / 2
+        target_weight = self._target_weight(rules, budget_per_person)
         
         logger.info(f"📊 Целевая граммовка: {target_weight}г/человека")
         
-        # Определяем количество позиций
+        # Определяем количество позиций (это и есть корзина по числу гостей)
         positions_count = max(
             rules['мин_позиций'],
             min(
@@ -499,15 +590,59 @@ D005	Тирамису порционный	Классический италья
             )
         )
         
+        forbidden = diet_restrictions(special_requests)
+        if forbidden:
+            logger.info(f"🥗 Исключаем: {', '.join(attribute_labels(forbidden))}")
+        
+        budget_bucket = self._budget_bucket(budget_per_person)
+        cache_key = (event_type, positions_count, budget_bucket, forbidden, snapshot.version)
+        selection = self._selection_cache.get(cache_key)
+        if selection is None:
+            bucket_budget = budget_bucket * SELECTION_BUDGET_STEP if budget_bucket else None
+            allowed_rows = snapshot.attributes.allowed_rows(forbidden) if forbidden else None
+            selection = self._select_items(snapshot, positions_count, bucket_budget, allowed_rows)
+            self._selection_cache.put(cache_key, selection)
+        else:
+            logger.info(f"⚡ Подбор из кэша: {cache_key}")
+        
+        selected_items = []
+        for item in selection:
+            item_with_quantity = item.copy()
+            if not item_with_quantity.get('id'):
+                logger.error(f"❌ Отсутствует ID у блюда: {item.get('name', 'Unknown')}")
+                # Стабильный ID как резерв
+                item_with_quantity['id'] = self._create_id_from_article(item.get('article', ''), item.get('name', ''))
+            if is_serving_set(item):
+                # Сет - целыми единицами на ту же долю гостей, что и порционная позиция
+                item_with_quantity['quantity'] = set_units(item, guest_count / 10)
+            else:
+                item_with_quantity['quantity'] = max(1, guest_count // 10)
+            item_with_quantity['total_weight'] = item_with_quantity['quantity'] * item.get('weight', 0)
+            selected_items.append(item_with_quantity)
+        
+        logger.info(f"✅ Подобрано {len(selected_items)} позиций")
+        return selected_items
+    
+    def _select_items(self, snapshot: MenuSnapshot, positions_count: int,
+                      budget_per_person: Optional[float],
+                      allowed_rows: Optional[int] = None) -> Tuple[MenuItem, ...]:
+        """Набор позиций каталога без количеств: дешевые позиции каждой категории
+        берутся бинарным поиском по заранее отсортированным ценам,
+        allowed_rows - битовое множество строк, подходящих по диете"""
+        columns = snapshot.index.columns
+        
+        # ОТЛАДОЧНАЯ ИНФОРМАЦИЯ
+        logger.info(f"📂 Доступные категории в меню: {list(snapshot.categories.keys())}")
+        logger.info(f"📊 Всего позиций в меню: {len(snapshot.menu_items)}")
         logger.info(f"📋 Целевое количество позиций: {positions_count}")
         
         # ИСПРАВЛЕННАЯ ЛОГИКА: работаем с реальными категориями
-        available_categories = list(self.categories.keys())
+        available_categories = list(snapshot.categories.keys())
         logger.info(f"🔍 Реальные категории: {available_categories}")
         
         if not available_categories:
             logger.error("❌ Нет доступных категорий в меню!")
-            return []
+            return ()
         
         # Подбираем блюда из доступных категорий
         items_per_category = max(1, positions_count // len(available_categories))
@@ -515,6 +650,7 @@ D005	Тирамису порционный	Классический италья
         
         logger.info(f"📋 Позиций на категорию: {items_per_category}, остаток: {remainder}")
         
+        selected_items = []
         for i, category in enumerate(available_categories):
             # Количество позиций для этой категории
             category_positions = items_per_category
@@ -523,109 +659,193 @@ D005	Тирамису порционный	Классический италья
             
             logger.info(f"📂 Обрабатываем категорию: {category} ({category_positions} позиций)")
             
-            # Фильтруем по бюджету если указан
-            available_items = self.categories[category]
-            if budget_per_person:
-                max_item_price = budget_per_person * 2  # Простое ограничение
-                available_items = [
-                    item for item in available_items 
-                    if item.get('price', 0) <= max_item_price
-                ]
-                logger.info(f"   После фильтрации по бюджету: {len(available_items)} позиций")
+            # Фильтруем по бюджету если указан: бинарный поиск по отсортированным ценам
+            max_item_price = budget_per_person * 2 if budget_per_person else None  # Простое ограничение
+            if max_item_price is not None:
+                logger.info(f"   После фильтрации по бюджету: {columns.count_up_to_price(category, max_item_price)} позиций")
             
+            # Самые дешевые позиции (категории уже отсортированы по цене)
+            available_items = columns.cheapest(category, category_positions, max_item_price, allowed_rows)
             if not available_items:
                 logger.warning(f"⚠️ Нет доступных блюд в категории {category}")
                 continue
             
-            # Сортируем по цене (сначала дешевые)
-            available_items.sort(key=lambda x: x.get('price', 0))
-            
-            # Выбираем позиции
-            for item in available_items[:category_positions]:
-                # Проверяем ID - теперь должен быть всегда
-                if 'id' not in item or not item['id']:
-                    logger.error(f"❌ Отсутствует ID у блюда: {item.get('name', 'Unknown')}")
-                    # Генерируем ID как резерв
-                    item['id'] = len(selected_items) + 1000 + hash(item.get('name', '')) % 1000
-                
-                # Добавляем количество
-                item_with_quantity = item.copy()
-                item_with_quantity['quantity'] = max(1, guest_count // 10)
-                item_with_quantity['total_weight'] = item_with_quantity['quantity'] * item.get('weight', 0)
-                selected_items.append(item_with_quantity)
-                
-                logger.info(f"✅ Добавлено: {item['name']} (ID: {item['id']}) x{item_with_quantity['quantity']}")
-        
-        logger.info(f"✅ Подобрано {len(selected_items)} позиций")
+            for item in available_items:
+                selected_items.append(item)
+                logger.info(f"✅ Добавлено: {item['name']} (ID: {item['id']})")
         
         # Проверяем если ничего не подобрано
         if not selected_items:
             logger.warning("⚠️ Не удалось подобрать блюда, добавляем из всего меню")
-            # Берем просто первые позиции из всего меню
-            for item in self.menu_items[:min(positions_count, len(self.menu_items))]:
-                if 'id' not in item or not item['id']:
-                    item['id'] = len(selected_items) + 1000 + hash(item.get('name', '')) % 1000
-                
-                item_with_quantity = item.copy()
-                item_with_quantity['quantity'] = max(1, guest_count // 10)
-                item_with_quantity['total_weight'] = item_with_quantity['quantity'] * item.get('weight', 0)
-                selected_items.append(item_with_quantity)
-                
+            # Берем просто первые позиции из всего меню (с учетом диеты)
+            fallback_items = (
+                item for row, item in enumerate(snapshot.menu_items)
+                if allowed_rows is None or allowed_rows >> row & 1
+            )
+            for item in itertools.islice(fallback_items, positions_count):
+                selected_items.append(item)
                 logger.info(f"🔄 Добавлено из общего меню: {item['name']} (ID: {item['id']})")
         
-        return selected_items
+        return tuple(selected_items)
+    
+    def get_prompt_context(self, event_type: Optional[str] = None, budget_per_person: Optional[float] = None,
+                           special_requests: Optional[List[str]] = None,
+                           max_tokens: int = DEFAULT_PROMPT_MENU_TOKENS) -> Dict[str, Any]:
+        """Срез каталога для промпта Claude под бюджет токенов
+        
+        Категории и их доли - из правил типа мероприятия, позиции - по диете
+        и в пределах бюджета на человека. Кэшируется по параметрам и версии меню.
+        """
+        snapshot = self.snapshot
+        event_type = self._normalize_event_type(event_type)
+        forbidden = diet_restrictions(special_requests)
+        budget_bucket = self._budget_bucket(budget_per_person)
+        cache_key = ('prompt', event_type, budget_bucket, forbidden, max_tokens, snapshot.version)
+        context = self._selection_cache.get(cache_key)
+        if context is None:
+            context = build_menu_context(
+                snapshot.index.columns,
+                self.event_rules[event_type]['категории'],
+                budget_bucket * SELECTION_BUDGET_STEP if budget_bucket else None,
+                snapshot.attributes.allowed_rows(forbidden) if forbidden else None,
+                max_tokens
+            )
+            context['event_type'] = event_type
+            context['diet'] = attribute_labels(forbidden)
+            context['menu_version'] = snapshot.version
+            self._selection_cache.put(cache_key, context)
+        return dict(context)
+    
+    def get_selection_cache_stats(self) -> Dict[str, Any]:
+        """Счетчики кэша подбора меню"""
+        return self._selection_cache.stats()
     
     def get_menu_stats(self) -> Dict[str, Any]:
-        """Получение статистики меню"""
+        """Получение статистики меню (готовые агрегаты снимка, без обхода позиций)"""
+        snapshot = self.snapshot
         return {
-            'total_items': len(self.menu_items),
-            'categories': len(self.categories),
-            'categories_detail': {
-                cat: len(items) for cat, items in self.categories.items()
-            },
-            'txt_files_count': len(self.txt_files),
-            'files_list': [f.name for f in self.txt_files],
+            'total_items': len(snapshot.menu_items),
+            'categories': len(snapshot.categories),
+            'categories_detail': dict(snapshot.stats.counts),
+            'categories_stats': snapshot.stats.categories,
+            'price_stats': snapshot.stats.totals,
+            'food_price_stats': snapshot.stats.food_totals,
+            'txt_files_count': len(snapshot.txt_files),
+            'files_list': [f.name for f in snapshot.txt_files],
             'new_items': 0,
-            'popular_items': 10
+            'popular_items': 10,
+            'menu_version': snapshot.version,
+            'selection_cache': self.get_selection_cache_stats()
         }
     
+    def get_category_stats(self, category: str) -> Optional[Dict[str, Any]]:
+        """Цены категории: count, avg/min/max, квантили, ₽ за грамм"""
+        return self.snapshot.stats.category(category)
+    
+    def get_diet_items(self, special_requests: List[str], category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Позиции, подходящие под особые пожелания (фильтр по маске атрибутов)"""
+        snapshot = self.snapshot
+        allowed_rows = snapshot.attributes.allowed_rows(diet_restrictions(special_requests))
+        return [
+            item for row, item in enumerate(snapshot.menu_items)
+            if allowed_rows >> row & 1 and (category is None or item.get('category') == category)
+        ]
+    
+    def get_item_attributes(self, item_id: int) -> List[str]:
+        """Атрибуты позиции: мясо, рыба, глютен, орехи, ..."""
+        return attribute_labels(self.snapshot.attributes.mask_by_id(item_id))
+    
+    def apply_correction(self, lines: List[Dict[str, Any]], command_type: str,
+                         special_requests: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str]]]:
+        """Коррекция строк сметы по графу замен ('make_cheaper', 'reduce_meat', ...)
+        
+        Замены посчитаны при загрузке каталога, поэтому коррекция - один
+        проход по строкам; замены не нарушают диету из special_requests.
+        Возвращает новые строки и список замен (было, стало).
+        """
+        corrected, changes = self.snapshot.substitutions.apply_correction(
+            lines, command_type, diet_restrictions(special_requests)
+        )
+        logger.info(f"🔁 Коррекция {command_type}: {len(changes)} изменений из {len(lines)} строк")
+        return corrected, changes
+    
+    def reprice_lines(self, lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Строки сметы по ценам и весу текущего снимка (количества сохраняются)
+        
+        Нужна, когда смета собрана на прежней версии меню или цены пришли
+        от Claude. Позиция ищется по ID, иначе по артикулу; позиции, которых
+        в каталоге больше нет, остаются как есть.
+        """
+        snapshot = self.snapshot
+        repriced = []
+        for line in lines:
+            line = dict(line)
+            item = snapshot.index.get_by_id(line.get('id'))
+            if item is None and line.get('article'):
+                item = snapshot.index.get_by_article(str(line['article']))
+            if item is not None:
+                line['price'] = item.get('price', 0)
+                line['weight'] = item.get('weight', 0)
+                quantity = line.get('quantity') or 0
+                if 'total_cost' in line:
+                    line['total_cost'] = quantity * line['price']
+                if 'total_weight' in line:
+                    line['total_weight'] = quantity * line['weight']
+            repriced.append(line)
+        return repriced
+    
     def get_available_categories(self) -> List[str]:
         """Получение списка доступных категорий"""
         return list(self.categories.keys())
     
-    def search_items(self, query: str) -> List[Dict[str, Any]]:
-        """Поиск блюд по названию"""
+    def search_items(self, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Поиск блюд с ранжированием по релевантности"""
+        limit = limit or len(self.menu_items)
+        ranked = self.search_index.search(query, limit)
+        if ranked:
+            return [item for item, score in ranked]
+        
+        # Запасной вариант - подстрока (например, середина слова)
         query_lower = query.lower()
-        results = []
-        
-        for item in self.menu_items:
-            if (query_lower in item.get('name', '').lower() or 
-                query_lower in item.get('description', '').lower() or
-                query_lower in item.get('article', '').lower()):
-                results.append(item)
-        
-        return results
+        results = [
+            item for item, name, description, article in self.index.search_rows
+            if query_lower in name or query_lower in description or query_lower in article
+        ][:limit]
+        if results:
+            return results
+        
+        # Последний шанс - поиск с опечатками
+        return self.search_items_fuzzy(query, limit)
+    
+    def search_items_fuzzy(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Поиск с опечатками и смешанной кириллицей/латиницей"""
+        return [item for item, score in self.fuzzy_index.search(query, limit)]
+    
+    def get_similar_items(self, item_id: int, limit: int = 5) -> List[Dict[str, Any]]:
+        """Похожие блюда (готовые соседи по TF-IDF), с оценкой сходства similarity"""
+        similar_items = []
+        for item, score in self.snapshot.similarity.similar(item_id, limit):
+            similar_item = item.copy()
+            similar_item['similarity'] = score
+            similar_items.append(similar_item)
+        return similar_items
     
     def get_item_by_id(self, item_id: int) -> Optional[Dict[str, Any]]:
         """Получение блюда по ID"""
-        for item in self.menu_items:
-            if item.get('id') == item_id:
-                return item
-        return None
+        return self.index.get_by_id(item_id)
     
     def get_item_by_article(self, article: str) -> Optional[Dict[str, Any]]:
         """Получение блюда по артикулу"""
-        for item in self.menu_items:
-            if item.get('article', '').upper() == article.upper():
-                return item
-        return None
+        return self.index.get_by_article(article)
+    
+    def get_category_items_by_price(self, category: str) -> List[Dict[str, Any]]:
+        """Позиции категории, отсортированные по цене (из индекса)"""
+        return list(self.index.get_category_by_price(category))
     
     def reload_menu(self):
-        """Перезагрузка меню из txt файлов"""
-        self.menu_items = []
-        self.categories = {}
-        self.load_menu_from_txt_files()
-        logger.info("🔄 Меню перезагружено из txt файлов")
+        """Перезагрузка меню из txt файлов (только изменившиеся файлы)"""
+        if self.load_menu_from_txt_files():
+            logger.info(f"🔄 Меню перезагружено из txt файлов (версия {self.menu_version})")
     
     def get_debug_info(self) -> str:
         """Получение отладочной информации о состоянии меню"""
@@ -679,13 +899,8 @@ D005	Тирамису порционный	Классический италья
         """Принудительная перезагрузка с отладкой"""
         logger.info("🔄 ПРИНУДИТЕЛЬНАЯ ПЕРЕЗАГРУЗКА С ОТЛАДКОЙ")
         
-        # Очищаем текущие данные
-        self.menu_items = []
-        self.categories = {}
-        self.txt_files = []
-        
-        # Перезагружаем с подробным логированием
-        self.load_menu_from_txt_files()
+        # Перечитываем все файлы; текущий снимок остается доступным до подмены
+        self.load_menu_from_txt_files(force=True)
         
         # Выводим итоговую информацию
         logger.info("📊 ИТОГОВАЯ СТАТИСТИКА:")
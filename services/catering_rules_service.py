@@ -9,8 +9,18 @@ import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+try:
+    from services.menu_item import is_serving_set, set_units
+except ImportError:
+    from menu_item import is_serving_set, set_units
+
 logger = logging.getLogger(__name__)
 
+# Доля меню в общей стоимости, остальное - услуги (персонал, логистика)
+MENU_COST_SHARE = 0.7
+# Услуги к стоимости меню: 30/70 = 0.43 (общий для всех расчетов смет)
+SERVICE_COST_RATE = 0.43
+
 # ПРИНУДИТЕЛЬНОЕ ЛОГИРОВАНИЕ
 print("🔥 ЗАГРУЖАЕТСЯ ИСПРАВЛЕННЫЙ CateringRulesService v2.1!")
 logger.critical("🔥 ПРИНУДИТЕЛЬНАЯ ПЕРЕЗАГРУЗКА CateringRulesService!")
@@ -54,9 +64,14 @@ class CateringRulesService:
                          menu_items: List[Dict[str, Any]], 
                          guest_count: int, 
                          event_type: str = 'фуршет',
-                         target_budget: Optional[float] = None) -> Dict[str, Any]:
+                         target_budget: Optional[float] = None,
+                         use_item_quantities: bool = False) -> Dict[str, Any]:
         """
         🔧 ИСПРАВЛЕННЫЙ расчет сметы - ПРИНУДИТЕЛЬНАЯ ВЕРСИЯ
+        
+        use_item_quantities=True - позиции уже подобраны MenuService.compose_menu
+        под граммовку и бюджет: их quantity и цены берутся как есть, без
+        ограничения числа блюд и без последующих корректировок.
         """
         print(f"🔧 ИСПРАВЛЕННЫЙ РАСЧЕТ ЗАПУЩЕН! Гостей: {guest_count}, Тип: {event_type}")
         logger.critical(f"🔧 ИСПРАВЛЕННЫЙ РАСЧЕТ! Гостей: {guest_count}, Тип: {event_type}")
@@ -73,6 +88,9 @@ class CateringRulesService:
             target_cost_per_guest = (standards['цена_мин'] + standards['цена_макс']) / 2
             target_weight_per_guest = (standards['граммовка_мин'] + standards['граммовка_макс']) / 2
             
+            if use_item_quantities:
+                return self._estimate_from_quantities(menu_items, guest_count, event_type, standards)
+            
             # Ограничиваем количество блюд
             limited_items = menu_items[:8]  # Максимум 8 блюд
             
@@ -82,11 +100,16 @@ class CateringRulesService:
             total_weight_per_guest = 0
             
             for i, item in enumerate(limited_items):
-                # Простое количество - 1-2 порции на человека
-                quantity = guest_count + (guest_count // 3)  # +33% запас
-                
-                # Ограничиваем цену за порцию
-                item_price = min(item.get('price', 200), 1000)  # Максимум 1000₽ за порцию
+                if is_serving_set(item):
+                    # Сет на компанию - целыми единицами на всех гостей, по своей цене
+                    quantity = set_units(item, guest_count)
+                    item_price = item.get('price', 0)
+                else:
+                    # Простое количество - 1-2 порции на человека
+                    quantity = guest_count + (guest_count // 3)  # +33% запас
+                    
+                    # Ограничиваем цену за порцию
+                    item_price = min(item.get('price', 200), 1000)  # Максимум 1000₽ за порцию
                 item_weight = item.get('weight', 100)
                 
                 item_total_cost = quantity * item_price
@@ -96,6 +119,7 @@ class CateringRulesService:
                     'id': item.get('id', i+1),
                     'name': item.get('name', f'Блюдо {i+1}'),
                     'quantity': quantity,
+                    'unit': item.get('unit', 'шт'),
                     'price': item_price,
                     'total_cost': item_total_cost,
                     'weight_per_person': item_weight_per_guest
@@ -105,7 +129,7 @@ class CateringRulesService:
                 total_weight_per_guest += item_weight_per_guest
             
             # ЗАЩИТА от безумных цен
-            max_reasonable_menu_cost = guest_count * target_cost_per_guest * 0.7  # 70% на меню
+            max_reasonable_menu_cost = guest_count * target_cost_per_guest * MENU_COST_SHARE
             if menu_cost > max_reasonable_menu_cost:
                 print(f"⚠️ КОРРЕКТИРУЕМ ЦЕНУ! Было: {menu_cost}, станет: {max_reasonable_menu_cost}")
                 correction_factor = max_reasonable_menu_cost / menu_cost
@@ -119,7 +143,7 @@ class CateringRulesService:
                 total_weight_per_guest = standards['граммовка_макс']
             
             # Простой расчет услуг (30% от общей стоимости)
-            service_cost = menu_cost * 0.43  # 30/70 = 0.43
+            service_cost = menu_cost * SERVICE_COST_RATE
             total_cost = menu_cost + service_cost
             cost_per_guest = total_cost / guest_count
             
@@ -158,6 +182,63 @@ class CateringRulesService:
             print(traceback.format_exc())
             return self._create_emergency_estimate(guest_count, event_type)
     
+    def _estimate_from_quantities(self, menu_items: List[Dict[str, Any]], guest_count: int,
+                                  event_type: str, standards: Dict[str, Any]) -> Dict[str, Any]:
+        """Смета по готовым количествам составителя меню"""
+        processed_items = []
+        menu_cost = 0
+        total_weight = 0
+        
+        for i, item in enumerate(menu_items):
+            quantity = item.get('quantity', 0)
+            item_price = item.get('price', 0)
+            item_total_cost = quantity * item_price
+            item_total_weight = quantity * item.get('weight', 0)
+            
+            processed_items.append({
+                'id': item.get('id', i+1),
+                'name': item.get('name', f'Блюдо {i+1}'),
+                'quantity': quantity,
+                'unit': item.get('unit', 'шт'),
+                'price': item_price,
+                'total_cost': item_total_cost,
+                'weight_per_person': item_total_weight / guest_count
+            })
+            
+            menu_cost += item_total_cost
+            total_weight += item_total_weight
+        
+        total_weight_per_guest = total_weight / guest_count
+        warnings = []
+        if total_weight_per_guest < standards['граммовка_мин']:
+            warnings.append(f"⚠️ Граммовка {total_weight_per_guest:.0f}г ниже нормы {standards['граммовка_мин']}г")
+        elif total_weight_per_guest > standards['граммовка_макс']:
+            warnings.append(f"⚠️ Граммовка {total_weight_per_guest:.0f}г выше нормы {standards['граммовка_макс']}г")
+        
+        # Услуги в той же пропорции, что и в основном расчете
+        service_cost = menu_cost * SERVICE_COST_RATE
+        total_cost = menu_cost + service_cost
+        cost_per_guest = total_cost / guest_count
+        
+        logger.info(f"💰 Смета по составу: {total_cost:,.0f}₽ ({cost_per_guest:,.0f}₽/чел), {total_weight_per_guest:.0f}г/чел")
+        
+        return {
+            'id': f"COMPOSED-{datetime.now().strftime('%Y%m%d-%H%M%S')}",
+            'event_type': event_type.title(),
+            'guest_count': guest_count,
+            'menu_items': processed_items,
+            'menu_cost': menu_cost,
+            'menu_items_count': len(processed_items),
+            'weight_per_person': total_weight_per_guest,
+            'service_cost': service_cost,
+            'total_cost': total_cost,
+            'cost_per_guest': cost_per_guest,
+            'standards': standards,
+            'warnings': warnings,
+            'created_at': datetime.now().isoformat(),
+            'version': 'COMPOSED-v2.1'
+        }
+    
     def _normalize_event_type(self, event_type: str) -> str:
         """Нормализация типа мероприятия"""
         event_type = event_type.lower()
@@ -186,8 +267,8 @@ class CateringRulesService:
             'event_type': event_type.title(),
             'guest_count': guest_count,
             'menu_items': [{'name': 'Стандартный набор', 'quantity': guest_count, 'price': cost_per_guest}],
-            'menu_cost': total_cost * 0.7,
-            'service_cost': total_cost * 0.3,
+            'menu_cost': total_cost * MENU_COST_SHARE,
+            'service_cost': total_cost * (1 - MENU_COST_SHARE),
             'total_cost': total_cost,
             'cost_per_guest': cost_per_guest,
             'weight_per_person': (standards['граммовка_мин'] + standards['граммовка_макс']) / 2,
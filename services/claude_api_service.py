@@ -6,6 +6,7 @@ Enhanced Claude API Service v2.0 для EventBot AI
 """
 
 import asyncio
+import contextlib
 import json
 import re
 import logging
@@ -14,11 +15,37 @@ from datetime import datetime
 import anthropic
 from dataclasses import dataclass
 import os
+from contextvars import ContextVar
 from pathlib import Path
 
+try:
+    from services.menu_substitutions import CORRECTION_EXPLANATIONS
+    from services.claude_transport import AsyncClaudeTransport
+    from services.session_store import ChatSession, SessionStore
+    from services.event_params import extract_event_params, has_event_params
+    from services.menu_prompt import DEFAULT_PROMPT_MENU_TOKENS
+    from services.claude_menu_tools import MenuToolExecutor, run_tool_loop, DEFAULT_MAX_TOOL_ROUNDS
+    from services.claude_response_cache import (
+        ClaudeResponseCache, SingleFlight, DEFAULT_RESPONSE_TTL, DEFAULT_RESPONSE_CACHE_SIZE
+    )
+except ImportError:
+    from menu_substitutions import CORRECTION_EXPLANATIONS
+    from claude_transport import AsyncClaudeTransport
+    from session_store import ChatSession, SessionStore
+    from event_params import extract_event_params, has_event_params
+    from menu_prompt import DEFAULT_PROMPT_MENU_TOKENS
+    from claude_menu_tools import MenuToolExecutor, run_tool_loop, DEFAULT_MAX_TOOL_ROUNDS
+    from claude_response_cache import ClaudeResponseCache, SingleFlight, DEFAULT_RESPONSE_TTL, DEFAULT_RESPONSE_CACHE_SIZE
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Версия шаблона промпта сметы: меняется вместе с текстом промпта,
+# чтобы кэш не возвращал ответы на старый промпт
+ESTIMATE_PROMPT_VERSION = "estimate-v2"
+# Промпт сметы с инструментами каталога (позиции Claude запрашивает сам)
+ESTIMATE_TOOLS_PROMPT_VERSION = "estimate-tools-v1"
+
 @dataclass
 class EstimateCorrection:
     timestamp: str
@@ -30,13 +57,18 @@ class EstimateCorrection:
     operator_feedback: Optional[str] = None
 
 class ContextManager:
-    def __init__(self, data_dir: str = "data"):
+    """Контекст диалогов: сессия (текущая смета, память, коррекции) на каждый чат
+
+    Сессия текущего запроса выбирается start_session(client_id) и видна
+    только задаче asyncio этого запроса, поэтому параллельные диалоги
+    менеджеров не перезаписывают сметы друг друга.
+    """
+    
+    def __init__(self, data_dir: str = "data", sessions: Optional[SessionStore] = None):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
-        self.session_memory = {}
-        self.current_client_id = None
-        self.current_estimate = None
-        self.correction_history = []
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self._client_id: ContextVar[Optional[str]] = ContextVar(f"claude_client_{id(self)}", default=None)
         self.global_patterns = self._load_global_patterns()
         
     def _load_global_patterns(self) -> Dict:
@@ -50,39 +82,107 @@ class ContextManager:
         return {"correction_patterns": {}, "successful_combinations": {}}
     
     def start_session(self, client_id: str = None):
-        self.current_client_id = client_id
-        self.session_memory = {
-            "start_time": datetime.now().isoformat(),
-            "client_id": client_id,
-            "estimates_created": []
-        }
+        """Сессия клиента для текущего запроса (существующая продолжается)"""
+        self._client_id.set(client_id)
+        session = self.sessions.get(client_id)
+        if not session.memory:
+            session.memory.update({
+                "start_time": datetime.now().isoformat(),
+                "client_id": client_id
+            })
+            self.sessions.update(session)
+    
+    @property
+    def session(self) -> ChatSession:
+        return self.sessions.get(self._client_id.get())
+    
+    @property
+    def current_client_id(self) -> Optional[str]:
+        return self._client_id.get()
+    
+    @property
+    def session_memory(self) -> Dict[str, Any]:
+        return self.session.memory
+    
+    @property
+    def correction_history(self):
+        return self.session.correction_history
+    
+    @property
+    def current_estimate(self) -> Optional[Dict]:
+        return self.session.current_estimate
+    
+    @current_estimate.setter
+    def current_estimate(self, estimate: Optional[Dict]):
+        session = self.session
+        session.current_estimate = estimate
+        if estimate and estimate.get('id') and estimate['id'] not in session.estimates_created:
+            session.estimates_created.append(estimate['id'])
+        self.sessions.update(session)
+    
+    def add_correction(self, correction: EstimateCorrection):
+        """Запись коррекции в историю сессии (хранятся последние MAX_CORRECTION_HISTORY)"""
+        session = self.session
+        session.correction_history.append(correction)
+        self.sessions.update(session)
 
 class CommandParser:
+    # Команда - сообщение целиком (вокруг допускаются только COMMAND_FILLERS):
+    # "не дороже 1500 на человека" или "премиум фуршет на 50 гостей" - не команды
     COMMAND_PATTERNS = {
-        'reduce_meat': [r'меньше\s+мяса', r'убрать\s+мясо'],
-        'increase_vegetables': [r'больше\s+овощей', r'добавить\s+овощи'],
+        'reduce_meat': [r'меньше\s+мяса', r'убрать\s+мясо', r'убери\s+мясо'],
+        'increase_vegetables': [r'больше\s+овощей', r'добавить\s+овощи', r'добавь\s+овощи'],
         'make_cheaper': [r'подешевле', r'дешевле'],
-        'make_premium': [r'премиум', r'дороже']
+        'make_premium': [r'премиум', r'подороже', r'дороже']
     }
+    COMMAND_FILLERS = (
+        r'(?:пожалуйста|сделай|сделайте|давай|давайте|можно|а|и|чуть|немного|'
+        r'еще|ещё|смету|меню|вариант|хочу|нужно|надо)'
+    )
     
     @classmethod
     def parse_command(cls, command_text: str) -> Tuple[str, float, Dict]:
-        command_text = command_text.lower().strip()
+        # Сообщение с гостями, типом, датой или бюджетом - новый запрос, а не коррекция
+        if has_event_params(command_text):
+            return 'unknown', 0.0, {}
+        command_text = " ".join(re.sub(r'[^\w\s]', ' ', command_text.lower()).split())
         for command_type, patterns in cls.COMMAND_PATTERNS.items():
             for pattern in patterns:
-                if re.search(pattern, command_text):
+                if re.fullmatch(rf'(?:{cls.COMMAND_FILLERS}\s+)*{pattern}(?:\s+{cls.COMMAND_FILLERS})*', command_text):
                     return command_type, 0.8, {}
         return 'unknown', 0.0, {}
 
 class EnhancedClaudeAPIService:
-    def __init__(self, api_key: str, data_dir: str = "data"):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    def __init__(self, api_key: str, data_dir: str = "data", menu_service=None,
+                 cache_ttl: float = DEFAULT_RESPONSE_TTL, cache_size: int = DEFAULT_RESPONSE_CACHE_SIZE,
+                 cache_persist: bool = False, sessions: Optional[SessionStore] = None,
+                 menu_prompt_tokens: int = DEFAULT_PROMPT_MENU_TOKENS, menu_tools: bool = True,
+                 max_tool_rounds: int = DEFAULT_MAX_TOOL_ROUNDS, **transport_options):
+        # Асинхронный клиент с пулом соединений (base_url, max_concurrency, timeout, ...)
+        self.transport = AsyncClaudeTransport(api_key, **transport_options)
+        # Разобранные ответы на запросы смет (cache_size=0 - без кэша)
+        self.response_cache = ClaudeResponseCache(
+            cache_size, cache_ttl,
+            Path(data_dir) / "cache" / "claude_responses.json" if cache_persist else None
+        ) if cache_size > 0 else None
+        # Объединение одинаковых одновременных запросов в один вызов
+        self.in_flight = SingleFlight()
+        self.client = self.transport.client
         self.model = "claude-3-5-sonnet-20241022"
-        self.context_manager = ContextManager(data_dir)
+        # Сессии по чатам (общие с SuperAIAgent, если переданы из бота)
+        self.context_manager = ContextManager(data_dir, sessions)
         self.command_parser = CommandParser()
         self.max_tokens = 4000
         self.temperature = 0.3
-        self.menu_items = []
+        # Бюджет токенов на срез меню в промпте сметы
+        self.menu_prompt_tokens = menu_prompt_tokens
+        # Инструменты каталога вместо текста меню в промпте и лимит раундов вызовов
+        self.menu_tools = menu_tools
+        self.max_tool_rounds = max_tool_rounds
+        self.tool_calls = 0
+        self.tool_cache_hits = 0
+        # Каталог для коррекций смет по графу замен (без повторного запроса к Claude)
+        self.menu_service = menu_service
         
         logger.info(f"Enhanced Claude API Service v2.0 инициализирован")
     
@@ -93,22 +193,24 @@ class EnhancedClaudeAPIService:
         except:
             return False
     
+    @property
+    def menu_items(self) -> List[Dict]:
+        """Позиции текущего меню (снимок филиала чата) - без копии, устаревающей после перезагрузки"""
+        if self.menu_service is None:
+            return []
+        return self.menu_service.menu_items
+    
     def load_menu_data(self):
-        """Загружает реальное меню для Claude"""
+        """Проверка меню подключенного MenuService (позиции читаются из текущего снимка при каждом запросе)"""
+        if self.menu_service is None:
+            logger.warning('MenuService не подключен, меню для Claude не загружено')
+            return []
         try:
-            import sys
-            sys.path.append('.')
-            from menu_service import MenuService
-            
-            menu_service = MenuService()
-            menu_data = menu_service.get_all_items()
-            
-            self.menu_items = menu_data
-            logger.info(f'Загружено {len(menu_data)} позиций меню для Claude')
-            return menu_data
+            menu_items = self.menu_items
+            logger.info(f'Загружено {len(menu_items)} позиций меню для Claude')
+            return menu_items
         except Exception as e:
             logger.error(f'Ошибка загрузки меню: {e}')
-            self.menu_items = []
             return []
     
     async def analyze_request(self, request_text: str, client_id: str = None, context: Dict = None) -> Optional[Dict]:
@@ -116,6 +218,13 @@ class EnhancedClaudeAPIService:
         ОСНОВНОЙ МЕТОД с блокировкой команд коррекции
         """
         try:
+            if client_id and self.context_manager.current_client_id != client_id:
+                self.context_manager.start_session(client_id)
+            
+            # Распознанная коррекция применяется к текущей смете
+            if self._is_correction_command(request_text) and self.context_manager.current_estimate:
+                return await self._handle_correction_command(request_text)
+            
             # КРИТИЧЕСКАЯ БЛОКИРОВКА: НЕ создаем новые сметы для команд коррекции
             correction_words = [
                 'заменить', 'заменить', 'поменять', 'убрать', 'убери', 
@@ -123,7 +232,8 @@ class EnhancedClaudeAPIService:
                 'больше', 'меньше', 'добавить', 'добавь'
             ]
             
-            if any(word in request_text.lower() for word in correction_words):
+            # Запрос с параметрами мероприятия ("премиум фуршет на 50 гостей") - новая смета
+            if not has_event_params(request_text) and any(word in request_text.lower() for word in correction_words):
                 logger.info(f"XXX БЛОКИРОВКА: Команда коррекции заблокирована: {request_text}")
                 return {
                     'success': False,
@@ -132,15 +242,7 @@ class EnhancedClaudeAPIService:
                 }
             
             # Если не команда коррекции - продолжаем обычную логику
-            if client_id and self.context_manager.current_client_id != client_id:
-                self.context_manager.start_session(client_id)
-            
-            is_correction = self._is_correction_command(request_text)
-            
-            if is_correction and self.context_manager.current_estimate:
-                return await self._handle_correction_command(request_text)
-            else:
-                return await self._handle_new_estimate_request(request_text)
+            return await self._handle_new_estimate_request(request_text)
                 
         except Exception as e:
             logger.error(f"Ошибка в analyze_request: {e}")
@@ -155,16 +257,43 @@ class EnhancedClaudeAPIService:
             command_type, confidence, params = self.command_parser.parse_command(command_text)
             
             corrected_estimate = self.context_manager.current_estimate.copy()
+            explanation = CORRECTION_EXPLANATIONS.get(command_type, "Коррекция применена")
             
-            explanations = {
-                'reduce_meat': "Уменьшил количество мясных блюд",
-                'increase_vegetables': "Добавил больше овощных блюд", 
-                'make_cheaper': "Заменил на бюджетные варианты",
-                'make_premium': "Обновил до премиум позиций"
-            }
+            # Замены по графу каталога: один проход по строкам сметы
+            items = corrected_estimate.get('items') or []
+            if self.menu_service and hasattr(self.menu_service, 'apply_correction') and items:
+                old_menu_cost = sum((item.get('quantity') or 0) * (item.get('price') or 0) for item in items)
+                # Цены строк - по текущему каталогу (смета могла быть на прежней версии меню)
+                if hasattr(self.menu_service, 'reprice_lines'):
+                    items = self.menu_service.reprice_lines(items)
+                # Замены не возвращают блюда, исключенные диетой исходного запроса
+                corrected_items, changes = self.menu_service.apply_correction(
+                    items, command_type,
+                    special_requests=self.context_manager.session_memory.get('special_requests')
+                )
+                new_menu_cost = sum((item.get('quantity') or 0) * (item.get('price') or 0) for item in corrected_items)
+                corrected_estimate['items'] = corrected_items
+                corrected_estimate['menu_version'] = getattr(self.menu_service, 'menu_version', None)
+                corrected_estimate['menu_fingerprint'] = getattr(self.menu_service, 'menu_fingerprint', None)
+                if corrected_estimate.get('total_cost') is not None:
+                    corrected_estimate['total_cost'] = corrected_estimate['total_cost'] - old_menu_cost + new_menu_cost
+                if changes:
+                    explanation += ": " + "; ".join(f"{old} → {new}" for old, new in changes)
+                elif new_menu_cost != old_menu_cost:
+                    explanation = "Подходящих замен в меню не нашлось, цены обновлены по текущему меню"
+                else:
+                    explanation = "Подходящих замен в меню не нашлось, смета не изменилась"
             
-            corrected_estimate['explanation'] = explanations.get(command_type, "Коррекция применена")
+            corrected_estimate['explanation'] = explanation
             self.context_manager.current_estimate = corrected_estimate
+            self.context_manager.add_correction(EstimateCorrection(
+                timestamp=datetime.now().isoformat(),
+                original_estimate_id=str(corrected_estimate.get('id', '')),
+                correction_command=command_text,
+                correction_type=command_type,
+                result_estimate={key: corrected_estimate.get(key) for key in ('total_cost', 'menu_fingerprint')},
+                success=True
+            ))
             
             return {
                 'success': True,
@@ -180,83 +309,177 @@ class EnhancedClaudeAPIService:
     
     async def _handle_new_estimate_request(self, request_text: str) -> Dict:
         try:
-            # Создаем промпт с использованием реального меню
-            menu_info = ""
-            if self.menu_items:
-                menu_info = f"Доступное меню ({len(self.menu_items)} позиций): "
-                menu_info += ", ".join([item.get('name', '') for item in self.menu_items[:10]])
-                menu_info += "..."
-            
-            prompt = f"""
-            Вы эксперт по банкетному обслуживанию. Создайте смету для: {request_text}
-            
-            {menu_info}
-
-            Ответьте только в JSON формате:
-            {{
-                "event_type": "тип мероприятия",
-                "guest_count": число_гостей,
-                "items": [
-                    {{"name": "название блюда", "quantity": количество, "price": цена}}
-                ],
-                "total_cost": общая_стоимость,
-                "staff_required": количество_персонала,
-                "explanation": "краткое объяснение сметы"
-            }}
-            """
+            request_key = ClaudeResponseCache.make_key(
+                request_text, self.model,
+                ESTIMATE_TOOLS_PROMPT_VERSION if self._use_menu_tools() else ESTIMATE_PROMPT_VERSION,
+                getattr(self.menu_service, 'menu_fingerprint', None)
+            )
+            if self.response_cache is not None:
+                estimate = self.response_cache.get(request_key)
+                if estimate is not None:
+                    logger.info(f"⚡ Смета из кэша ответов Claude: {request_key[0]}")
+                    return self._new_estimate_result(estimate, request_text)
             
-            response = await self._call_claude_api(prompt)
-            estimate = self._parse_claude_response(response)
-            
-            estimate['id'] = f"EST-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
-            self.context_manager.current_estimate = estimate
-            
-            return {
-                'success': True, 
-                'type': 'new_estimate', 
-                'data': estimate,
-                'estimate': estimate
-            }
+            # Одинаковые одновременные запросы ждут один вызов Claude
+            estimate = await self.in_flight.run(
+                request_key, lambda: self._request_estimate(request_text, request_key)
+            )
+            return self._new_estimate_result(estimate, request_text)
             
         except Exception as e:
             logger.error(f"Ошибка создания сметы: {e}")
             return await self._handle_fallback_analysis(request_text)
     
-    async def _call_claude_api(self, prompt: str) -> str:
-        try:
-            if hasattr(self.client, 'messages'):
-                response = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: self.client.messages.create(
-                        model=self.model,
-                        max_tokens=self.max_tokens,
-                        temperature=self.temperature,
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                )
-                return response.content[0].text
-            else:
-                response = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: self.client.completions.create(
-                        model=self.model,
-                        prompt=f"\n\nHuman: {prompt}\n\nAssistant:",
-                        max_tokens_to_sample=self.max_tokens,
-                        temperature=self.temperature
-                    )
+    async def _request_estimate(self, request_text: str, request_key: Tuple[str, ...]) -> Dict:
+        """Вызов Claude и разбор сметы (успешно разобранный ответ попадает в кэш)"""
+        if self._use_menu_tools():
+            # Позиции меню Claude запрашивает инструментами, каталог в промпт не входит
+            with self._pin_menu():
+                response = await self._call_claude_with_menu_tools(self._estimate_prompt(
+                    request_text,
+                    "Подбирайте блюда только из меню ресторана: найдите их инструментами "
+                    "search_menu, list_categories и find_by_price и берите артикулы и цены из их ответов."
+                ))
+        else:
+            # Срез реального меню под тип мероприятия, бюджет и диету
+            response = await self._call_claude_api(self._estimate_prompt(
+                request_text, self._build_menu_context(request_text)
+            ))
+        estimate = self._extract_json(response)
+        if estimate is None:
+            # Ответ не разобран - стандартная смета, в кэш не попадает
+            return self._parse_claude_response(response)
+        if self.response_cache is not None:
+            self.response_cache.put(request_key, estimate)
+        return estimate
+    
+    def _estimate_prompt(self, request_text: str, menu_info: str) -> str:
+        """Промпт сметы: запрос, сведения о меню и формат ответа"""
+        return f"""
+        Вы эксперт по банкетному обслуживанию. Создайте смету для: {request_text}
+        
+        {menu_info}
+
+        Ответьте только в JSON формате:
+        {{
+            "event_type": "тип мероприятия",
+            "guest_count": число_гостей,
+            "items": [
+                {{"article": "артикул из меню", "name": "название блюда", "quantity": количество, "price": цена}}
+            ],
+            "total_cost": общая_стоимость,
+            "staff_required": количество_персонала,
+            "explanation": "краткое объяснение сметы"
+        }}
+        """
+    
+    def _build_menu_context(self, request_text: str) -> str:
+        """Блюда меню, подходящие запросу, в пределах бюджета токенов промпта"""
+        if self.menu_service is not None and hasattr(self.menu_service, 'get_prompt_context'):
+            try:
+                params = extract_event_params(request_text)
+                context = self.menu_service.get_prompt_context(
+                    params['event_type'],
+                    params['budget_per_person'],
+                    params['special_requests'],
+                    max_tokens=self.menu_prompt_tokens
                 )
-                return response.completion
+                logger.info(f"📋 Меню в промпте: {context['items_count']} позиций, ~{context['tokens']} токенов")
+                return context['text']
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось подобрать меню для промпта: {e}")
+        
+        if not self.menu_items:
+            return ""
+        menu_info = f"Доступное меню ({len(self.menu_items)} позиций): "
+        menu_info += ", ".join([item.get('name', '') for item in self.menu_items[:10]])
+        return menu_info + "..."
+    
+    def _new_estimate_result(self, estimate: Dict, request_text: str = '') -> Dict:
+        estimate['id'] = f"EST-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        # Диета запроса - для последующих коррекций этой сметы
+        self.context_manager.session_memory['special_requests'] = \
+            extract_event_params(request_text)['special_requests']
+        self.context_manager.current_estimate = estimate
+        
+        return {
+            'success': True, 
+            'type': 'new_estimate', 
+            'data': estimate,
+            'estimate': estimate
+        }
+    
+    async def _call_claude_api(self, prompt: str, timeout: Optional[float] = None) -> str:
+        try:
+            return await self.transport.complete(
+                prompt,
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                timeout=timeout
+            )
         except Exception as e:
             logger.error(f"Ошибка Claude API: {e}")
             raise
     
-    def _parse_claude_response(self, response_text: str) -> Dict:
+    def _use_menu_tools(self) -> bool:
+        return self.menu_tools and self.menu_service is not None and hasattr(self.menu_service, 'search_items')
+    
+    def _pin_menu(self):
+        """Закрепление снимка меню на время диалога с инструментами"""
+        pin = getattr(self.menu_service, 'pin', None)
+        return pin() if pin else contextlib.nullcontext()
+    
+    async def _call_claude_with_menu_tools(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Смета с вызовами инструментов каталога (результаты кэшируются в рамках запроса)"""
+        executor = MenuToolExecutor(self.menu_service)
+        try:
+            return await run_tool_loop(
+                self.transport,
+                [{"role": "user", "content": prompt}],
+                executor,
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                max_rounds=self.max_tool_rounds,
+                timeout=timeout
+            )
+        except Exception as e:
+            logger.error(f"Ошибка Claude API: {e}")
+            raise
+        finally:
+            self.tool_calls += executor.calls
+            self.tool_cache_hits += executor.cache_hits
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Счетчики кэша ответов и объединения запросов (coalesced - сэкономлено вызовов)"""
+        stats = self.response_cache.stats() if self.response_cache is not None else {}
+        stats['coalesced'] = self.in_flight.coalesced
+        stats['tool_calls'] = self.tool_calls
+        stats['tool_cache_hits'] = self.tool_cache_hits
+        return stats
+    
+    async def aclose(self):
+        """Закрытие пула соединений Claude API и сохранение кэша ответов"""
+        if self.response_cache is not None:
+            self.response_cache.save()
+        await self.transport.aclose()
+    
+    @staticmethod
+    def _extract_json(response_text: str) -> Optional[Dict]:
+        """JSON-объект из ответа Claude (None - не найден или не разобран)"""
         try:
             json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
             if json_match:
                 return json.loads(json_match.group(0))
         except:
             pass
+        return None
+    
+    def _parse_claude_response(self, response_text: str) -> Dict:
+        parsed = self._extract_json(response_text)
+        if parsed is not None:
+            return parsed
         
         return {
             "event_type": "Банкетное мероприятие",
@@ -336,9 +559,10 @@ class EnhancedClaudeAPIService:
             }
         }
 
-def create_enhanced_claude_service(api_key: str, data_dir: str = "data") -> EnhancedClaudeAPIService:
-    """Создание Enhanced Claude Service"""
-    return EnhancedClaudeAPIService(api_key, data_dir)
+def create_enhanced_claude_service(api_key: str, data_dir: str = "data", menu_service=None,
+                                   **options) -> EnhancedClaudeAPIService:
+    """Создание Enhanced Claude Service (options - параметры кэша ответов и транспорта)"""
+    return EnhancedClaudeAPIService(api_key, data_dir, menu_service, **options)
 
 class ClaudeAPIService(EnhancedClaudeAPIService):
     """Класс совместимости"""
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Инструменты каталога меню для Claude (tool use)
+Вместо текста каталога в промпте Claude сам запрашивает нужные позиции:
+поиск, список категорий и подбор по диапазону цен выполняются локально
+по индексам MenuService. Цикл вызовов ограничен числом раундов, а
+результаты повторных одинаковых вызовов в рамках запроса берутся из кэша.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from services.menu_attributes import DIET_RESTRICTIONS
+except ImportError:
+    from menu_attributes import DIET_RESTRICTIONS
+
+logger = logging.getLogger(__name__)
+
+# Раундов запрос-ответ с вызовами инструментов на одну смету
+DEFAULT_MAX_TOOL_ROUNDS = 4
+# Позиций в одном ответе инструмента
+DEFAULT_TOOL_RESULT_LIMIT = 15
+MAX_TOOL_RESULT_LIMIT = 30
+
+# Описания инструментов для параметра tools Messages API
+MENU_TOOLS: List[Dict[str, Any]] = [
+    {
+        "name": "search_menu",
+        "description": "Поиск блюд в меню по названию или ингредиенту. "
+                       "Возвращает артикул, название, категорию, выход в граммах и цену.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Что искать: 'канапе', 'лосось', 'салат цезарь'"},
+                "limit": {"type": "integer", "description": f"Сколько позиций вернуть (до {MAX_TOOL_RESULT_LIMIT})"}
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "list_categories",
+        "description": "Категории меню с числом позиций и диапазоном цен.",
+        "input_schema": {"type": "object", "properties": {}}
+    },
+    {
+        "name": "find_by_price",
+        "description": "Блюда в диапазоне цен, по возрастанию цены. Можно ограничить категорией "
+                       "и особым меню (диетой).",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "category": {"type": "string", "description": "Категория из list_categories"},
+                "min_price": {"type": "number", "description": "Минимальная цена, ₽"},
+                "max_price": {"type": "number", "description": "Максимальная цена, ₽"},
+                "diet": {"type": "string", "enum": list(DIET_RESTRICTIONS)},
+                "limit": {"type": "integer", "description": f"Сколько позиций вернуть (до {MAX_TOOL_RESULT_LIMIT})"}
+            }
+        }
+    }
+]
+
+
+def _compact_item(item: Any) -> Dict[str, Any]:
+    """Поля позиции, нужные для сметы"""
+    result = {
+        'article': item.get('article'),
+        'name': item.get('name'),
+        'category': item.get('category'),
+        'weight': item.get('weight'),
+        'price': item.get('price'),
+        'unit': item.get('unit')
+    }
+    if item.get('serves_max'):
+        result['serves'] = f"{item.get('serves_min') or item['serves_max']}-{item['serves_max']}"
+    return result
+
+
+def _limit(tool_input: Dict[str, Any]) -> int:
+    try:
+        limit = int(tool_input.get('limit') or DEFAULT_TOOL_RESULT_LIMIT)
+    except (TypeError, ValueError):
+        limit = DEFAULT_TOOL_RESULT_LIMIT
+    return max(1, min(limit, MAX_TOOL_RESULT_LIMIT))
+
+
+class MenuToolExecutor:
+    """Выполнение инструментов по MenuService с кэшем результатов на один запрос"""
+
+    def __init__(self, menu_service):
+        self.menu_service = menu_service
+        self.calls = 0
+        self.cache_hits = 0
+        self._results: Dict[Tuple[str, str], str] = {}
+
+    def run(self, name: str, tool_input: Optional[Dict[str, Any]]) -> Tuple[str, bool]:
+        """JSON-результат инструмента и признак ошибки (для tool_result.is_error)"""
+        tool_input = tool_input or {}
+        key = (name, json.dumps(tool_input, ensure_ascii=False, sort_keys=True))
+        if key in self._results:
+            self.cache_hits += 1
+            return self._results[key], False
+
+        handler = getattr(self, f"_tool_{name}", None)
+        if handler is None:
+            return json.dumps({'error': f"Неизвестный инструмент: {name}"}, ensure_ascii=False), True
+        try:
+            result = json.dumps(handler(tool_input), ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка инструмента {name}({tool_input}): {e}")
+            return json.dumps({'error': str(e)}, ensure_ascii=False), True
+
+        self.calls += 1
+        self._results[key] = result
+        return result, False
+
+    def _tool_search_menu(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        query = str(tool_input.get('query') or '').strip()
+        if not query:
+            raise ValueError("Пустой запрос поиска")
+        items = self.menu_service.search_items(query, _limit(tool_input))
+        return {'items': [_compact_item(item) for item in items]}
+
+    def _tool_list_categories(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        categories = []
+        for category in self.menu_service.get_available_categories():
+            stats = self.menu_service.get_category_stats(category) or {}
+            categories.append({
+                'category': category,
+                'count': stats.get('count'),
+                'min_price': stats.get('min_price'),
+                'max_price': stats.get('max_price')
+            })
+        return {'categories': categories}
+
+    def _tool_find_by_price(self, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        category = tool_input.get('category') or None
+        min_price = float(tool_input.get('min_price') or 0)
+        max_price = float(tool_input['max_price']) if tool_input.get('max_price') is not None else None
+        diet = tool_input.get('diet') or None
+        if diet and diet not in DIET_RESTRICTIONS:
+            raise ValueError(f"Неизвестное особое меню: {diet}")
+
+        if diet:
+            items = self.menu_service.get_diet_items([diet], category)
+        elif category:
+            items = self.menu_service.get_category_items_by_price(category)
+        else:
+            items = self.menu_service.menu_items
+
+        matched = sorted(
+            (item for item in items
+             if (item.get('price') or 0) >= min_price and (max_price is None or (item.get('price') or 0) <= max_price)),
+            key=lambda item: item.get('price') or 0
+        )
+        limit = _limit(tool_input)
+        return {'total': len(matched), 'items': [_compact_item(item) for item in matched[:limit]]}
+
+
+def _block_to_dict(block: Any) -> Dict[str, Any]:
+    """Блок ответа модели в формате сообщения для следующего запроса"""
+    if block.type == 'tool_use':
+        return {'type': 'tool_use', 'id': block.id, 'name': block.name, 'input': block.input}
+    return {'type': 'text', 'text': getattr(block, 'text', '')}
+
+
+def _response_text(response: Any) -> str:
+    return "".join(getattr(block, 'text', '') for block in response.content if block.type == 'text')
+
+
+async def run_tool_loop(transport, messages: List[Dict[str, Any]], executor: MenuToolExecutor,
+                        model: str, max_tokens: int, temperature: float,
+                        max_rounds: int = DEFAULT_MAX_TOOL_ROUNDS,
+                        timeout: Optional[float] = None) -> str:
+    """Диалог с вызовами инструментов до текстового ответа (не больше max_rounds вызовов модели)
+
+    transport - объект с create_message (AsyncClaudeTransport или заглушка).
+    На последнем раунде модель получает результаты вместе с просьбой ответить
+    без инструментов; если она все равно вызывает инструмент, возвращается
+    текст, который успел прийти.
+    """
+    messages = list(messages)
+    response = None
+    for round_number in range(1, max_rounds + 1):
+        response = await transport.create_message(
+            messages, model, max_tokens, temperature, timeout=timeout, tools=MENU_TOOLS
+        )
+        tool_uses = [block for block in response.content if block.type == 'tool_use']
+        if response.stop_reason != 'tool_use' or not tool_uses:
+            return _response_text(response)
+        if round_number == max_rounds:
+            break
+
+        results = []
+        for block in tool_uses:
+            content, is_error = executor.run(block.name, block.input)
+            result = {'type': 'tool_result', 'tool_use_id': block.id, 'content': content}
+            if is_error:
+                result['is_error'] = True
+            results.append(result)
+        logger.info(f"🔧 Раунд {round_number}: {', '.join(block.name for block in tool_uses)}")
+
+        if round_number == max_rounds - 1:
+            results.append({'type': 'text', 'text': "Лимит обращений к меню исчерпан. "
+                                                    "Ответьте сметой по уже найденным позициям."})
+        messages.append({'role': 'assistant', 'content': [_block_to_dict(block) for block in response.content]})
+        messages.append({'role': 'user', 'content': results})
+
+    logger.warning(f"⚠️ Claude не завершил смету за {max_rounds} раундов инструментов")
+    return _response_text(response) if response is not None else ""
+
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кэш разобранных ответов Claude
+Ключ - нормализованный текст запроса, модель, версия шаблона промпта
+и версия содержимого меню: повторная смета "фуршет 50 человек бюджет 150к"
+возвращается без вызова API, а после изменения прайса ключ не совпадет.
+Записи живут TTL, размер ограничен (LRU), кэш можно сохранять в data/.
+Одинаковые одновременные запросы (до попадания ответа в кэш)
+объединяются SingleFlight в один вызов.
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Время жизни записи, секунды
+DEFAULT_RESPONSE_TTL = 24 * 3600
+DEFAULT_RESPONSE_CACHE_SIZE = 1024
+# Сохранение на диск не чаще, чем раз в столько секунд
+_SAVE_INTERVAL = 30.0
+
+_SPACES_RE = re.compile(r'\s+')
+# "150 000" -> "150000"
+_DIGIT_GROUPS_RE = re.compile(r'(?<=\d)\s(?=\d{3}\b)')
+# "150к", "150 тыс" -> "150000"
+_THOUSANDS_RE = re.compile(r'(\d+)\s*(?:к|тыс\.?|тысяч[аи]?)(?=\s|$)')
+_PUNCTUATION_RE = re.compile(r'[!?.,;:]+(?=\s|$)')
+
+
+def normalize_request_text(text: str) -> str:
+    """Текст запроса без различий в регистре, пробелах и записи сумм"""
+    text = (text or '').lower().replace('ё', 'е').strip()
+    text = _DIGIT_GROUPS_RE.sub('', text)
+    text = _THOUSANDS_RE.sub(lambda match: f"{match.group(1)}000", text)
+    text = _PUNCTUATION_RE.sub('', text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+class ClaudeResponseCache:
+    """Потокобезопасный LRU с TTL, счетчиками и необязательным файлом на диске"""
+
+    def __init__(self, max_size: int = DEFAULT_RESPONSE_CACHE_SIZE, ttl: float = DEFAULT_RESPONSE_TTL,
+                 persist_path: Optional[Path] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        # Ключ -> (время истечения по time.time(), значение)
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        if self.persist_path:
+            self._load()
+
+    @staticmethod
+    def make_key(request_text: str, model: str, template_version: str, menu_version: Any) -> Tuple[str, ...]:
+        return (normalize_request_text(request_text), model, template_version, str(menu_version))
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Копия значения (None при промахе или истекшей записи)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                self.expired += 1
+                self._dirty = True
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, key: Hashable, value: Any):
+        """Сохранение копии значения с вытеснением самых старых записей"""
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+        if self.persist_path and time.monotonic() - self._last_save >= _SAVE_INTERVAL:
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+    def save(self):
+        """Атомарная запись непросроченных записей в JSON"""
+        if not self.persist_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            payload = [
+                {'key': list(key), 'expires_at': expires_at, 'value': value}
+                for key, (expires_at, value) in self._entries.items()
+                if expires_at > now
+            ]
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.persist_path.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_file, self.persist_path)
+            logger.info(f"💾 Кэш ответов Claude сохранен: {len(payload)} записей")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить кэш ответов Claude: {e}")
+
+    def _load(self):
+        if not self.persist_path.exists():
+            return
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            now = time.time()
+            for entry in payload[-self.max_size:]:
+                if entry['expires_at'] > now:
+                    self._entries[tuple(entry['key'])] = (entry['expires_at'], entry['value'])
+            logger.info(f"⚡ Кэш ответов Claude загружен: {len(self._entries)} записей")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прочитать кэш ответов Claude {self.persist_path}: {e}")
+
+
+class SingleFlight:
+    """Один вызов на ключ: одновременные вызовы с тем же ключом ждут его результат
+
+    Вызов выполняется отдельной задачей под asyncio.shield, поэтому отмена
+    первого вызывающего не отменяет ожидание остальных. Каждый получает
+    свою копию результата; ошибка передается всем ожидающим.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        # Сколько вызовов сэкономлено (ожидали чужой вызов)
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+            logger.info(f"🔗 Запрос объединен с уже выполняющимся (сэкономлено вызовов: {self.coalesced})")
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Ошибку получат ожидающие; если их уже нет - не пишем "never retrieved"
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': len(self._tasks),
+            'calls': self.calls,
+            'coalesced': self.coalesced
+        }
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Асинхронный транспорт Claude API
+Один AsyncAnthropic с постоянным пулом соединений httpx на весь процесс:
+запросы не занимают потоки executor, число одновременных вызовов
+ограничено семафором, у каждого вызова свой таймаут.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import anthropic
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Одновременных запросов к API (остальные ждут в очереди семафора)
+DEFAULT_MAX_CONCURRENCY = 16
+# Соединений в пуле httpx (keep-alive переиспользуются между запросами)
+DEFAULT_MAX_CONNECTIONS = 32
+# Таймауты, секунды: весь вызов и установка соединения
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+# Повторы SDK при 429/5xx и сетевых ошибках
+DEFAULT_MAX_RETRIES = 2
+
+
+class AsyncClaudeTransport:
+    """Вызовы Messages API через AsyncAnthropic с пулом соединений и лимитом параллельности"""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout)
+        )
+        self.client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            base_url=base_url or None,
+            http_client=self._http_client,
+            max_retries=max_retries
+        )
+        # Семафор привязывается к циклу событий при первом ожидании (Python 3.10+)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total_latency = 0.0
+
+    async def complete(self, prompt: str, model: str, max_tokens: int, temperature: float,
+                       timeout: Optional[float] = None) -> str:
+        """Текст ответа на одно сообщение пользователя"""
+        response = await self.create_message(
+            [{"role": "user", "content": prompt}], model, max_tokens, temperature, timeout=timeout
+        )
+        return response.content[0].text
+
+    async def create_message(self, messages: List[Dict[str, Any]], model: str, max_tokens: int,
+                             temperature: float, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Вызов messages.create (kwargs - tools, system и т.п. - передаются как есть)"""
+        async with self._semaphore:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            started = time.perf_counter()
+            try:
+                response = await self.client.messages.create(
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    messages=messages,
+                    timeout=timeout or self.timeout,
+                    **kwargs
+                )
+                self.calls += 1
+                return response
+            except anthropic.APITimeoutError:
+                self.timeouts += 1
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self.total_latency += time.perf_counter() - started
+
+    def get_stats(self) -> Dict[str, Any]:
+        finished = self.calls + self.errors + self.timeouts
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'max_concurrency': self.max_concurrency,
+            'avg_latency_ms': round(self.total_latency / finished * 1000, 1) if finished else 0.0
+        }
+
+    async def aclose(self):
+        """Закрытие пула соединений"""
+        await self._http_client.aclose()
+
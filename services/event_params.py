@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Параметры мероприятия из текста запроса
+Число гостей, тип мероприятия, бюджет, дата и особые пожелания - общий
+разбор для SuperAIAgent и промптов Claude; has_event_params отличает новый
+запрос от команды коррекции прошлой сметы
+"""
+
+import re
+from typing import Any, Dict
+
+
+def extract_event_params(message: str) -> Dict[str, Any]:
+    """Извлечение параметров мероприятия из текста"""
+    params = {
+        'guest_count': None,
+        'event_type': None,
+        'budget': None,
+        'budget_per_person': None,
+        'date': None,
+        'duration': None,
+        'special_requests': []
+    }
+
+    message_lower = message.lower()
+
+    # Извлекаем количество гостей
+    guest_patterns = [
+        r'(\d+)\s*(?:человек|персон|гостей|чел\.?)',
+        r'на\s*(\d+)\s*(?:человек|персон|гостей)',
+        r'(?:человек|персон|гостей)[:.\s]*(\d+)'
+    ]
+
+    for pattern in guest_patterns:
+        match = re.search(pattern, message_lower)
+        if match:
+            params['guest_count'] = int(match.group(1))
+            break
+
+    # Определяем тип мероприятия
+    event_types = {
+        'фуршет': ['фуршет', 'фуршетн', 'стоячий'],
+        'банкет': ['банкет', 'банкетн', 'рассадк', 'сидячий'],
+        'корпоратив': ['корпоратив', 'корпоративн', 'компани', 'офис'],
+        'кофе-брейк': ['кофе', 'брейк', 'кофебрейк', 'перерыв'],
+        'презентация': ['презентаци', 'presentat'],
+        'день рождения': ['день рождения', 'др ', 'birthday'],
+        'свадьба': ['свадьб', 'свадеб']
+    }
+
+    for event_type, keywords in event_types.items():
+        if any(keyword in message_lower for keyword in keywords):
+            params['event_type'] = event_type
+            break
+
+    # Извлекаем бюджет
+    budget_patterns = [
+        r'бюджет[:\s]*(\d+)\s*(?:тыс|к|тысяч|000)',
+        r'(\d+)\s*(?:тыс|к|тысяч)\s*(?:рублей|руб|₽)?',
+        r'до\s*(\d+)\s*(?:тыс|к|тысяч|000)',
+        r'(\d+)\s*000\s*(?:рублей|руб|₽)'
+    ]
+
+    for pattern in budget_patterns:
+        match = re.search(pattern, message_lower)
+        if match:
+            budget_value = int(match.group(1))
+            if budget_value < 1000:  # Если меньше 1000, считаем что это тысячи
+                params['budget'] = budget_value * 1000
+            else:
+                params['budget'] = budget_value
+
+            # Рассчитываем бюджет на человека
+            if params['guest_count'] and params['budget']:
+                params['budget_per_person'] = params['budget'] / params['guest_count']
+            break
+
+    # Извлекаем дату
+    date_patterns = [
+        r'(\d{1,2})[./](\d{1,2})[./](\d{2,4})',
+        r'(\d{1,2})\s*(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)',
+        r'(завтра|послезавтра|через\s*\d+\s*дн)',
+        r'(понедельник|вторник|среда|четверг|пятница|суббота|воскресенье)'
+    ]
+
+    for pattern in date_patterns:
+        match = re.search(pattern, message_lower)
+        if match:
+            params['date'] = match.group(0)
+            break
+
+    # Особые пожелания
+    special_keywords = {
+        'вегетарианское': 'вегетарианское меню',
+        'постное': 'постное меню',
+        'детское': 'детское меню',
+        'халяль': 'халяльное меню',
+        'кошерное': 'кошерное меню',
+        'безглютеновое': 'безглютеновое меню',
+        'без орехов': 'без орехов',
+        'диетическое': 'диетическое меню'
+    }
+
+    for keyword, request in special_keywords.items():
+        if keyword in message_lower:
+            params['special_requests'].append(request)
+
+    return params
+
+
+# Бюджет на гостя без слова "бюджет": "не дороже 1500 на человека", "по 2000 ₽ за персону"
+_PER_PERSON_PRICE = re.compile(r'\d+\s*(?:₽|р\.?|руб\w*)?\s*(?:на|за)\s*(?:человека|персону|гостя|чел\b)')
+
+
+def has_event_params(message: str) -> bool:
+    """Есть ли в тексте параметры мероприятия (гости, тип, дата, бюджет)
+
+    Такое сообщение - новый запрос, даже если в нем есть слова команд
+    коррекции ("премиум фуршет на 50 гостей").
+    """
+    params = extract_event_params(message)
+    if any(params[key] for key in ('guest_count', 'event_type', 'date', 'budget')):
+        return True
+    return bool(_PER_PERSON_PRICE.search(message.lower()))
@@ -76,6 +76,11 @@ class ExcelEstimateGenerator:
                 ("Длительность:", f"{request_data.get('duration', 3)} часа"),
                 ("Дата создания сметы:", datetime.now().strftime('%d.%m.%Y %H:%M'))
             ]
+            # Версия прайса, по которой посчитана смета: хеш содержимого меню
+            # (номер снимка после перезапуска бота начинается заново)
+            menu_stamp = estimate_data.get('menu_fingerprint') or estimate_data.get('menu_version')
+            if menu_stamp:
+                event_info.append(("Версия меню:", str(menu_stamp)))
             
             for label, value in event_info:
                 ws[f'A{row}'] = label
@@ -5,6 +5,7 @@
 Продвинутая обработка запросов с учетом контекста бизнеса РестДеливери
 """
 
+import contextlib
 import logging
 import re
 from typing import Dict, Any, Optional, List, Tuple
@@ -12,6 +13,15 @@ from datetime import datetime
 import json
 from pathlib import Path
 
+try:
+    from services.catering_rules_service import MENU_COST_SHARE
+    from services.event_params import extract_event_params
+    from services.session_store import SessionStore
+except ImportError:
+    from catering_rules_service import MENU_COST_SHARE
+    from event_params import extract_event_params
+    from session_store import SessionStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -129,6 +139,11 @@ class SuperAIAgent:
         self.menu_service = menu_service
         self.catering_rules = catering_rules
         self.excel_generator = None  # Будет установлен извне
+        # Сессии пользователей: последняя смета для команд коррекции
+        # (то же хранилище, что у Claude сервиса, если он есть)
+        context_manager = getattr(claude_service, 'context_manager', None)
+        sessions = getattr(context_manager, 'sessions', None)
+        self.sessions: SessionStore = sessions if sessions is not None else SessionStore()
         
         # Загружаем бизнес-контекст
         self._load_business_context()
@@ -182,9 +197,25 @@ class SuperAIAgent:
     
     async def process_super_request(self, message: str, user_info: Dict[str, Any]) -> str:
         """🚀 Главный метод обработки запросов"""
+        # Одна версия меню на весь запрос: перезагрузка посреди расчета не меняет цены
+        with self._pin_menu():
+            return await self._process_super_request(message, user_info)
+    
+    def _pin_menu(self):
+        """Закрепление снимка меню (если сервис меню это поддерживает)"""
+        pin = getattr(self.menu_service, 'pin', None)
+        return pin() if pin else contextlib.nullcontext()
+    
+    async def _process_super_request(self, message: str, user_info: Dict[str, Any]) -> str:
         try:
             logger.info(f"🧠 SuperAI обрабатывает: {message[:50]}...")
             
+            # Коррекция последней сметы ("подешевле", "меньше мяса", ...)
+            correction_type = self._detect_correction(message)
+            session = self.sessions.get(user_info.get('id'), create=False)
+            if correction_type and session and session.last_estimate:
+                return await self._apply_correction(correction_type, user_info)
+            
             # Извлекаем параметры из сообщения
             event_params = self._extract_event_params(message)
             
@@ -198,7 +229,7 @@ class SuperAIAgent:
             if intent == "create_estimate":
                 return await self._create_smart_estimate(event_params, user_info)
             elif intent == "menu_consultation":
-                return await self._provide_menu_consultation(event_params)
+                return await self._provide_menu_consultation(event_params, message)
             elif intent == "price_calculation":
                 return await self._calculate_pricing(event_params)
             elif intent == "service_info":
@@ -216,99 +247,7 @@ class SuperAIAgent:
     
     def _extract_event_params(self, message: str) -> Dict[str, Any]:
         """Извлечение параметров мероприятия из текста"""
-        params = {
-            'guest_count': None,
-            'event_type': None,
-            'budget': None,
-            'budget_per_person': None,
-            'date': None,
-            'duration': None,
-            'special_requests': []
-        }
-        
-        message_lower = message.lower()
-        
-        # Извлекаем количество гостей
-        guest_patterns = [
-            r'(\d+)\s*(?:человек|персон|гостей|чел\.?)',
-            r'на\s*(\d+)\s*(?:человек|персон|гостей)',
-            r'(?:человек|персон|гостей)[:.\s]*(\d+)'
-        ]
-        
-        for pattern in guest_patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                params['guest_count'] = int(match.group(1))
-                break
-        
-        # Определяем тип мероприятия
-        event_types = {
-            'фуршет': ['фуршет', 'фуршетн', 'стоячий'],
-            'банкет': ['банкет', 'банкетн', 'рассадк', 'сидячий'],
-            'корпоратив': ['корпоратив', 'корпоративн', 'компани', 'офис'],
-            'кофе-брейк': ['кофе', 'брейк', 'кофебрейк', 'перерыв'],
-            'презентация': ['презентаци', 'presentat'],
-            'день рождения': ['день рождения', 'др ', 'birthday'],
-            'свадьба': ['свадьб', 'свадеб']
-        }
-        
-        for event_type, keywords in event_types.items():
-            if any(keyword in message_lower for keyword in keywords):
-                params['event_type'] = event_type
-                break
-        
-        # Извлекаем бюджет
-        budget_patterns = [
-            r'бюджет[:\s]*(\d+)\s*(?:тыс|к|тысяч|000)',
-            r'(\d+)\s*(?:тыс|к|тысяч)\s*(?:рублей|руб|₽)?',
-            r'до\s*(\d+)\s*(?:тыс|к|тысяч|000)',
-            r'(\d+)\s*000\s*(?:рублей|руб|₽)'
-        ]
-        
-        for pattern in budget_patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                budget_value = int(match.group(1))
-                if budget_value < 1000:  # Если меньше 1000, считаем что это тысячи
-                    params['budget'] = budget_value * 1000
-                else:
-                    params['budget'] = budget_value
-                
-                # Рассчитываем бюджет на человека
-                if params['guest_count'] and params['budget']:
-                    params['budget_per_person'] = params['budget'] / params['guest_count']
-                break
-        
-        # Извлекаем дату
-        date_patterns = [
-            r'(\d{1,2})[./](\d{1,2})[./](\d{2,4})',
-            r'(\d{1,2})\s*(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)',
-            r'(завтра|послезавтра|через\s*\d+\s*дн)',
-            r'(понедельник|вторник|среда|четверг|пятница|суббота|воскресенье)'
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                params['date'] = match.group(0)
-                break
-        
-        # Особые пожелания
-        special_keywords = {
-            'вегетарианское': 'вегетарианское меню',
-            'постное': 'постное меню',
-            'детское': 'детское меню',
-            'халяль': 'халяльное меню',
-            'кошерное': 'кошерное меню',
-            'безглютеновое': 'безглютеновое меню',
-            'диетическое': 'диетическое меню'
-        }
-        
-        for keyword, request in special_keywords.items():
-            if keyword in message_lower:
-                params['special_requests'].append(request)
-        
-        return params
+        return extract_event_params(message)
     
     def _detect_intent(self, message: str) -> str:
         """Определение намерения пользователя"""
@@ -322,7 +261,7 @@ class SuperAIAgent:
             ],
             'menu_consultation': [
                 'меню', 'блюда', 'что входит', 'состав', 'ассортимент',
-                'что есть', 'варианты', 'выбор'
+                'что есть', 'варианты', 'выбор', 'похож', 'замен'
             ],
             'price_calculation': [
                 'цен', 'стоимост', 'стоит', 'прайс', 'тариф',
@@ -366,51 +305,152 @@ class SuperAIAgent:
             if self.claude_service and self.claude_service.is_available():
                 claude_params = await self.claude_service.analyze_request(
                     f"{params['event_type']} {params['guest_count']} человек"
-                    + (f" бюджет {params['budget']}" if params['budget'] else "")
+                    + (f" бюджет {params['budget']}" if params['budget'] else ""),
+                    client_id=user_info.get('id')
                 )
                 if claude_params and claude_params.get('success'):
                     params.update(claude_params.get('data', {}))
             
-            # Получаем подходящие блюда
-            menu_items = self.menu_service.get_items_for_event_type(
-                params['event_type'],
-                params['guest_count'],
-                params['budget_per_person']
-            )
+            # Подбираем состав с количествами под граммовку и бюджет
+            menu_items = []
+            if hasattr(self.menu_service, 'compose_menu'):
+                # На меню доля MENU_COST_SHARE бюджета, остальное - обслуживание
+                menu_budget_per_person = params['budget_per_person'] * MENU_COST_SHARE if params['budget_per_person'] else None
+                composition = self.menu_service.compose_menu(
+                    params['event_type'],
+                    params['guest_count'],
+                    menu_budget_per_person,
+                    special_requests=params.get('special_requests')
+                )
+                menu_items = composition['items']
+            composed = bool(menu_items)
+            
+            # Запасной вариант - простой подбор по категориям
+            if not menu_items:
+                menu_items = self.menu_service.get_items_for_event_type(
+                    params['event_type'],
+                    params['guest_count'],
+                    params['budget_per_person'],
+                    special_requests=params.get('special_requests')
+                )
             
             if not menu_items:
                 return self._no_menu_items_response(params)
             
             # Рассчитываем смету
-            estimate = self.catering_rules.calculate_estimate(
+            estimate = self._calculate(menu_items, params, composed)
+            estimate.update(self._menu_stamp())
+            
+            self._remember_estimate(user_info, params, menu_items, composed)
+            return self._finish_estimate_response(estimate, params, user_info)
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка создания сметы: {e}")
+            return self._get_error_response()
+    
+    def _calculate(self, menu_items: List[Dict[str, Any]], params: Dict[str, Any], composed: bool) -> Dict[str, Any]:
+        """Смета по позициям: количества составителя или стандартный расчет"""
+        if composed:
+            return self.catering_rules.calculate_estimate(
                 menu_items,
                 params['guest_count'],
                 params['event_type'],
-                params['budget']
+                params['budget'],
+                use_item_quantities=True
             )
+        return self.catering_rules.calculate_estimate(
+            menu_items,
+            params['guest_count'],
+            params['event_type'],
+            params['budget']
+        )
+    
+    def _menu_stamp(self) -> Dict[str, Any]:
+        """Версия меню сметы: номер снимка (в пределах процесса) и хеш содержимого
+        (не меняется при перезапуске - по нему сметы из сохраненных сессий
+        сравниваются с текущим меню)"""
+        return {
+            'menu_version': getattr(self.menu_service, 'menu_version', None),
+            'menu_fingerprint': getattr(self.menu_service, 'menu_fingerprint', None)
+        }
+    
+    def _remember_estimate(self, user_info: Dict[str, Any], params: Dict[str, Any],
+                           menu_items: List[Dict[str, Any]], composed: bool):
+        """Запоминаем позиции сметы пользователя для последующих коррекций"""
+        session = self.sessions.get(user_info.get('id'))
+        session.last_estimate = {
+            'params': dict(params),
+            'items': menu_items,
+            'composed': composed,
+            **self._menu_stamp()
+        }
+        self.sessions.update(session)
+    
+    def _detect_correction(self, message: str) -> Optional[str]:
+        """Тип команды коррекции (None - это не коррекция)"""
+        command_parser = getattr(self.claude_service, 'command_parser', None)
+        if command_parser is None:
+            return None
+        command_type, confidence, _ = command_parser.parse_command(message)
+        if command_type == 'unknown' or confidence <= 0.4:
+            return None
+        return command_type
+    
+    async def _apply_correction(self, command_type: str, user_info: Dict[str, Any]) -> str:
+        """Коррекция последней сметы по графу замен, без нового запроса к Claude"""
+        try:
+            last = self.sessions.get(user_info.get('id')).last_estimate
+            params = last['params']
             
-            # Генерируем Excel если генератор доступен
-            excel_path = None
-            if self.excel_generator:
-                try:
-                    excel_path = self.excel_generator.create_estimate(estimate, params)
-                    logger.info(f"📊 Excel создан: {excel_path}")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка создания Excel: {e}")
+            # Смета собрана на другом содержимом меню - сначала актуальные цены
+            items = last['items']
+            menu_stamp = self._menu_stamp()
+            if last.get('menu_fingerprint') != menu_stamp['menu_fingerprint']:
+                logger.info(f"🔄 Смета на меню {last.get('menu_fingerprint')}, "
+                            f"пересчет по текущему меню {menu_stamp['menu_fingerprint']}")
+                items = self.menu_service.reprice_lines(items)
             
-            # Формируем ответ
-            response = self._format_smart_estimate_response(estimate, params, user_info)
+            menu_items, changes = self.menu_service.apply_correction(
+                items,
+                command_type,
+                special_requests=params.get('special_requests')
+            )
+            if not changes:
+                return "🤔 Подходящих замен в меню не нашлось - смета осталась прежней."
             
-            # Добавляем информацию о файле если создан
-            if excel_path:
-                response += f"\n\n📊 **Excel файл готов!** Файл: `{excel_path}`"
+            estimate = self._calculate(menu_items, params, last['composed'])
+            estimate.update(menu_stamp)
+            self._remember_estimate(user_info, params, menu_items, last['composed'])
             
-            return response
+            changes_text = "\n".join(f"• {old} → {new}" for old, new in changes)
+            return f"🔁 **Смета скорректирована:**\n{changes_text}\n" + \
+                self._finish_estimate_response(estimate, params, user_info)
             
         except Exception as e:
-            logger.error(f"❌ Ошибка создания сметы: {e}")
+            logger.error(f"❌ Ошибка коррекции сметы: {e}")
             return self._get_error_response()
     
+    def _finish_estimate_response(self, estimate: Dict[str, Any], params: Dict[str, Any],
+                                  user_info: Dict[str, Any]) -> str:
+        """Excel (если доступен) и текст ответа со сметой"""
+        # Генерируем Excel если генератор доступен
+        excel_path = None
+        if self.excel_generator:
+            try:
+                excel_path = self.excel_generator.create_estimate(estimate, params)
+                logger.info(f"📊 Excel создан: {excel_path}")
+            except Exception as e:
+                logger.error(f"❌ Ошибка создания Excel: {e}")
+        
+        # Формируем ответ
+        response = self._format_smart_estimate_response(estimate, params, user_info)
+        
+        # Добавляем информацию о файле если создан
+        if excel_path:
+            response += f"\n\n📊 **Excel файл готов!** Файл: `{excel_path}`"
+        
+        return response
+    
     def _guess_event_type(self, params: Dict[str, Any]) -> str:
         """Угадывание типа мероприятия по параметрам"""
         guest_count = params.get('guest_count', 50)
@@ -534,31 +574,57 @@ class SuperAIAgent:
         else:
             return "\n✨ **Это оптимальный вариант для вашего мероприятия!**"
     
-    async def _provide_menu_consultation(self, params: Dict[str, Any]) -> str:
-        """Консультация по меню"""
+    def _consultation_items(self, params: Dict[str, Any],
+                            message: str) -> Tuple[str, List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Позиции для консультации: похожие на блюдо из вопроса "что похожее на ..."
+        (и само блюдо) или подбор под мероприятие (блюда нет)"""
+        message_lower = message.lower()
+        if 'похож' in message_lower or 'замен' in message_lower:
+            query = re.sub(r'\b(похож\w*|замен\w*|блюд\w*|что|есть|на|для|чем|можно|меню)\b', ' ', message_lower)
+            found = self.menu_service.search_items(query.strip(), 1) if query.strip() else []
+            if found and hasattr(self.menu_service, 'get_similar_items'):
+                dish = found[0]
+                similar = [item for item in self.menu_service.get_similar_items(dish.get('id'), 6)
+                           if item.get('id') != dish.get('id')]
+                return f"🔁 **Похожие на «{dish['name']}»:**", similar[:5], dish
+        
+        event_type = params.get('event_type') or 'фуршет'
+        guest_count = params.get('guest_count') or 30
+        if hasattr(self.menu_service, 'compose_menu'):
+            items = self.menu_service.compose_menu(
+                event_type, guest_count, special_requests=params.get('special_requests')
+            )['items']
+        else:
+            items = self.menu_service.get_items_for_event_type(event_type, guest_count)
+        return f"🌟 **Подборка ({event_type}) и похожие варианты:**", items[:5], None
+    
+    async def _provide_menu_consultation(self, params: Dict[str, Any], message: str = '') -> str:
+        """Консультация по меню: реальные позиции каталога и похожие на них"""
         menu_stats = self.menu_service.get_menu_stats()
         
+        title, items, dish = self._consultation_items(params, message)
+        # Блюдо из вопроса и уже перечисленные позиции в альтернативах не повторяются
+        shown = {item.get('id') for item in items} | ({dish.get('id')} if dish else set())
+        lines = []
+        for item in items:
+            lines.append(f"• **{item['name']}** - {item.get('price', 0):,.0f}₽, {item.get('weight', 0)}г")
+            if hasattr(self.menu_service, 'get_similar_items'):
+                similar = [other for other in self.menu_service.get_similar_items(item.get('id'), 3 + len(shown))
+                           if other.get('id') not in shown][:3]
+                if similar:
+                    lines.append("   ↳ " + "; ".join(
+                        f"{other['name']} ({other.get('price', 0):,.0f}₽)" for other in similar
+                    ))
+        items_text = "\n".join(lines) if lines else "Подходящих позиций в каталоге не нашлось"
+        
         response = f"""
 📋 **Консультация по меню РестДеливери**
 
 У нас {menu_stats['total_items']} позиций в {menu_stats['categories']} категориях!
 
-🌟 **Популярные позиции для {params.get('event_type', 'мероприятий')}:**
-
-**Канапе и брускетты:**
-• Канапе с лососем и сливочным сыром
-• Брускетта с томатами и моцареллой
-• Канапе с ростбифом и трюфельным соусом
+{title}
 
-**Горячие закуски:**
-• Мини-шашлычки из курицы
-• Жульен в тарталетках
-• Темпура из креветок
-
-**Десерты:**
-• Мини-чизкейки
-• Макаронс ассорти
-• Фруктовые канапе
+{items_text}
 
 💡 **Как подобрать меню:**
 1. Учитывайте формат мероприятия
@@ -582,6 +648,16 @@ class SuperAIAgent:
         min_price = guest_count * int(standards['price_range'].split('-')[0].replace('₽', ''))
         max_price = guest_count * int(standards['price_range'].split('-')[1].replace('₽', ''))
         
+        # Стоимость еды по текущим ценам каталога: средняя цена грамма x граммовка
+        menu_cost_line = ""
+        price_per_gram = self.menu_service.get_menu_stats().get('food_price_stats', {}).get('price_per_gram')
+        if price_per_gram:
+            weight_min, weight_max = (int(w) for w in standards['weight_per_person'].replace('г', '').split('-'))
+            menu_cost_line = (
+                f"\n• Меню по ценам каталога: **{weight_min * price_per_gram:,.0f}–"
+                f"{weight_max * price_per_gram:,.0f}₽** на гостя ({price_per_gram:.2f}₽/г)"
+            )
+        
         response = f"""
 💰 **Детальный расчет стоимости**
 
@@ -593,7 +669,7 @@ class SuperAIAgent:
 💵 **Стоимость мероприятия:**
 • Эконом вариант: **{min_price:,}₽**
 • Оптимальный: **{(min_price + max_price) // 2:,}₽**
-• Премиум: **{max_price:,}₽**
+• Премиум: **{max_price:,}₽**{menu_cost_line}
 
 📋 **Что влияет на цену:**
 • Выбор блюд (30-50% от стоимости)
@@ -760,7 +836,7 @@ def test_super_ai_agent():
         def get_menu_stats(self):
             return {'total_items': 100, 'categories': 10}
         
-        def get_items_for_event_type(self, *args):
+        def get_items_for_event_type(self, *args, **kwargs):
             return [{'name': 'Тест', 'price': 100}] * 10
         
         def calculate_estimate(self, *args):
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Диетические атрибуты позиций меню
+Атрибуты (мясо, рыба, глютен, ...) вычисляются один раз при загрузке по
+названию и описанию и хранятся битовыми масками: маска на позицию и
+битовое множество строк каталога на атрибут. Фильтр по диете - одна
+операция над целыми числами вместо поиска подстрок.
+"""
+
+import logging
+from array import array
+from enum import IntFlag
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ItemAttribute(IntFlag):
+    """Атрибуты позиции (биты маски)"""
+    MEAT = 1 << 0
+    POULTRY = 1 << 1
+    PORK = 1 << 2
+    FISH = 1 << 3
+    SEAFOOD = 1 << 4
+    DAIRY = 1 << 5
+    EGG = 1 << 6
+    GLUTEN = 1 << 7
+    NUTS = 1 << 8
+    ALCOHOL = 1 << 9
+    SPICY = 1 << 10
+    # Явно вегетарианская позиция (в названии или описании)
+    VEGETARIAN = 1 << 11
+    # Состав не раскрыт (готовые сеты): строгие диеты такие позиции не берут
+    MIXED = 1 << 12
+
+
+# Основы слов по атрибутам (название + описание, нижний регистр, ё -> е)
+ATTRIBUTE_KEYWORDS = {
+    ItemAttribute.MEAT: ('говя', 'говяд', 'телят', 'теляч', 'ростбиф', 'бифштекс', 'баранин',
+                         'ягнят', 'мяс', 'шашлык', 'стейк', 'мраморн', 'хот-дог'),
+    ItemAttribute.POULTRY: ('куриц', 'курин', 'цыпл', 'индейк', 'утин', 'утка', 'утки'),
+    ItemAttribute.PORK: ('свин', 'бекон', 'ветчин', 'буженин', 'салями', 'прошутто', 'хамон',
+                         'колбас', 'сосис', 'хот-дог'),
+    ItemAttribute.FISH: ('рыб', 'лосос', 'тунец', 'тунц', 'форел', 'скумбри', 'треск', 'палтус',
+                         'сельдь', 'сельди', 'селедк', 'анчоус', 'семг', 'фишбургер', 'угор', 'дорадо', 'сибас', 'судак'),
+    ItemAttribute.SEAFOOD: ('кревет', 'мидии', 'кальмар', 'осьминог', 'краб', 'гребеш',
+                            'морепродукт', 'устриц'),
+    ItemAttribute.DAIRY: ('сыр', 'моцарел', 'рикот', 'маскарпоне', 'фета', 'феты', 'фетой', 'брынз',
+                          'камамбер', 'дор блю', 'чеддер', 'сливк', 'сливоч', 'молок', 'молоч',
+                          'йогурт', 'творог', 'творож', 'чизкейк', 'тирамису', 'капкейк', 'эклер'),
+    ItemAttribute.EGG: ('яйц', 'яйцо', 'майонез', 'киш', 'эклер', 'капкейк', 'тирамису', 'профитрол'),
+    ItemAttribute.GLUTEN: ('хлеб', 'брускет', 'тост', 'сэндвич', 'бургер', 'круассан', 'киш',
+                           'пирож', 'пирог', 'тарталет', 'профитрол', 'эклер', 'бородинск', 'кекс',
+                           'капкейк', 'торт', 'лаваш', 'хот-дог', 'птитим', 'тирамису', 'чизкейк'),
+    ItemAttribute.NUTS: ('орех', 'миндал', 'фисташ', 'кешью', 'фундук', 'арахис', 'кедров', 'пекан'),
+    ItemAttribute.ALCOHOL: ('коньяк', 'ликер', 'винн', 'в вине', 'пивн'),
+    ItemAttribute.SPICY: ('халапеньо', 'остр', 'спайси', 'чили', 'васаби', 'кимчи', 'пикант'),
+    ItemAttribute.VEGETARIAN: ('вегетариан', 'веган', 'vegan', 'veggie', 'постн', 'растительн'),
+}
+
+# Категории с нераскрытым составом
+MIXED_CONTENT_CATEGORIES = frozenset({'Готовые сеты'})
+
+ANIMAL = ItemAttribute.MEAT | ItemAttribute.POULTRY | ItemAttribute.PORK | ItemAttribute.FISH | ItemAttribute.SEAFOOD
+
+# Запрещенные атрибуты по особым пожеланиям (special_requests из SuperAIAgent)
+DIET_RESTRICTIONS: Dict[str, ItemAttribute] = {
+    'вегетарианское меню': ANIMAL | ItemAttribute.MIXED,
+    'постное меню': ANIMAL | ItemAttribute.DAIRY | ItemAttribute.EGG | ItemAttribute.MIXED,
+    'халяльное меню': ItemAttribute.PORK | ItemAttribute.ALCOHOL | ItemAttribute.MIXED,
+    # Приближение: без свинины и морепродуктов (сочетание мясного и молочного не проверяется)
+    'кошерное меню': ItemAttribute.PORK | ItemAttribute.SEAFOOD | ItemAttribute.MIXED,
+    'безглютеновое меню': ItemAttribute.GLUTEN | ItemAttribute.MIXED,
+    'детское меню': ItemAttribute.SPICY | ItemAttribute.ALCOHOL,
+    'без орехов': ItemAttribute.NUTS | ItemAttribute.MIXED,
+}
+
+ATTRIBUTE_LABELS = {
+    ItemAttribute.MEAT: 'мясо',
+    ItemAttribute.POULTRY: 'птица',
+    ItemAttribute.PORK: 'свинина',
+    ItemAttribute.FISH: 'рыба',
+    ItemAttribute.SEAFOOD: 'морепродукты',
+    ItemAttribute.DAIRY: 'молочное',
+    ItemAttribute.EGG: 'яйца',
+    ItemAttribute.GLUTEN: 'глютен',
+    ItemAttribute.NUTS: 'орехи',
+    ItemAttribute.ALCOHOL: 'алкоголь',
+    ItemAttribute.SPICY: 'острое',
+    ItemAttribute.VEGETARIAN: 'вегетарианское',
+    ItemAttribute.MIXED: 'состав набора',
+}
+
+
+def item_attributes(item: Dict[str, Any]) -> int:
+    """Маска атрибутов позиции по названию и описанию"""
+    text = f"{item.get('name', '')} {item.get('description', '')}".lower().replace('ё', 'е')
+    mask = 0
+    for attribute, keywords in ATTRIBUTE_KEYWORDS.items():
+        if any(keyword in text for keyword in keywords):
+            mask |= attribute
+
+    # Явная пометка вегетарианского снимает неопределенность набора, но не найденные продукты
+    if item.get('category') in MIXED_CONTENT_CATEGORIES and not mask & ItemAttribute.VEGETARIAN:
+        mask |= ItemAttribute.MIXED
+    return mask
+
+
+def diet_restrictions(special_requests: Optional[Iterable[str]]) -> int:
+    """Объединенная маска запрещенных атрибутов (неизвестные пожелания игнорируются)"""
+    forbidden = 0
+    for request in special_requests or ():
+        request = (request or '').lower().strip()
+        for diet, restricted in DIET_RESTRICTIONS.items():
+            if request == diet or request == diet.split()[0]:
+                forbidden |= restricted
+    return forbidden
+
+
+def attribute_labels(mask: int) -> List[str]:
+    """Подписи атрибутов маски"""
+    return [label for attribute, label in ATTRIBUTE_LABELS.items() if mask & attribute]
+
+
+class MenuAttributeIndex:
+    """Маски атрибутов для строк каталога (порядок строк - как в MenuColumns)"""
+
+    def __init__(self, items: Iterable[Dict[str, Any]]):
+        self.masks = array('L')
+        self.row_by_id: Dict[Any, int] = {}
+        # Атрибут -> битовое множество строк (бит i - строка i)
+        self.rows_by_attribute: Dict[int, int] = {int(attribute): 0 for attribute in ItemAttribute}
+
+        for row, item in enumerate(items):
+            mask = item_attributes(item)
+            self.masks.append(mask)
+            self.row_by_id.setdefault(item.get('id'), row)
+            for attribute in self.rows_by_attribute:
+                if mask & attribute:
+                    self.rows_by_attribute[attribute] |= 1 << row
+
+        self.all_rows = (1 << len(self.masks)) - 1
+        self._allowed_cache: Dict[int, int] = {0: self.all_rows}
+
+    def allowed_rows(self, forbidden: int) -> int:
+        """Битовое множество строк без запрещенных атрибутов"""
+        rows = self._allowed_cache.get(forbidden)
+        if rows is None:
+            rows = self.all_rows
+            for attribute, attribute_rows in self.rows_by_attribute.items():
+                if forbidden & attribute:
+                    rows &= ~attribute_rows
+            self._allowed_cache[forbidden] = rows
+        return rows
+
+    def mask_by_id(self, item_id: Any) -> int:
+        """Маска позиции по ID (0 - позиции нет)"""
+        row = self.row_by_id.get(item_id)
+        return self.masks[row] if row is not None else 0
+
+    def count(self, forbidden: int) -> int:
+        """Сколько позиций проходит фильтр"""
+        return bin(self.allowed_rows(forbidden)).count('1')
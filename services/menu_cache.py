@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кэш разобранного каталога меню на диске
+Ключ - хеш содержимого исходного файла: при перезапуске бота
+неизменившиеся файлы не разбираются заново
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Dict
+
+try:
+    from services.menu_snapshot import MenuFileState
+except ImportError:
+    from menu_snapshot import MenuFileState
+
+logger = logging.getLogger(__name__)
+
+# Меняется при изменении структуры позиций - старый кэш игнорируется
+CACHE_FORMAT_VERSION = 4
+
+
+class MenuCatalogCache:
+    """Pickle-кэш состояний файлов меню для одной папки"""
+
+    def __init__(self, menu_files_dir: Path, cache_dir: str = "data/cache"):
+        self.menu_files_dir = Path(menu_files_dir)
+        # Имена файлов в кэше считаются от папки (или от папки файла-каталога)
+        self.base_dir = self.menu_files_dir.parent if self.menu_files_dir.is_file() else self.menu_files_dir
+        dir_key = hashlib.sha1(str(self.menu_files_dir.absolute()).encode('utf-8')).hexdigest()[:12]
+        self.cache_file = Path(cache_dir) / f"menu_catalog_{dir_key}.pkl"
+
+    def load(self) -> Dict[Path, MenuFileState]:
+        """Состояния файлов из кэша (пустой словарь, если кэша нет или он устарел)"""
+        if not self.cache_file.exists():
+            return {}
+
+        try:
+            with open(self.cache_file, 'rb') as f:
+                payload = pickle.load(f)
+
+            if payload.get('format_version') != CACHE_FORMAT_VERSION:
+                logger.info("♻️ Кэш меню устарел (другая версия формата)")
+                return {}
+
+            states = {
+                self.base_dir / filename: state
+                for filename, state in payload.get('files', {}).items()
+            }
+            logger.info(f"⚡ Кэш меню загружен: {len(states)} файлов")
+            return states
+
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прочитать кэш меню {self.cache_file}: {e}")
+            return {}
+
+    def save(self, file_states: Dict[Path, MenuFileState]):
+        """Атомарная запись кэша"""
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            payload = {
+                'format_version': CACHE_FORMAT_VERSION,
+                'menu_files_dir': str(self.menu_files_dir.absolute()),
+                'files': {path.name: state for path, state in file_states.items() if state.digest}
+            }
+
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self.cache_file)
+
+            logger.info(f"💾 Кэш меню сохранен: {self.cache_file}")
+
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить кэш меню: {e}")
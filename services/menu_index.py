@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Индекс каталога меню для MenuService
+Строится один раз при загрузке: поиск по ID и артикулу за O(1),
+категории заранее отсортированы по цене
+"""
+
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    from services.menu_item import MenuColumns, MenuItem
+except ImportError:
+    from menu_item import MenuColumns, MenuItem
+
+logger = logging.getLogger(__name__)
+
+# 40 бит: на 10 тыс. позиций вероятность коллизии ~5e-5, коллизии все равно проверяются
+_ID_DIGEST_SIZE = 5
+_ID_OFFSET = 100000
+
+
+def item_id_key(article: str, name: str = '') -> str:
+    """Ключ позиции для ID: артикул, а без артикула - название"""
+    article_key = MenuIndex.normalize_article(article)
+    if article_key:
+        return article_key
+    return 'name:' + ' '.join((name or '').casefold().split())
+
+
+def stable_item_id(key: str, salt: int = 0) -> int:
+    """Детерминированный ID по ключу позиции (не зависит от PYTHONHASHSEED)"""
+    data = key if not salt else f"{key}#{salt}"
+    digest = hashlib.blake2b(data.encode('utf-8'), digest_size=_ID_DIGEST_SIZE).digest()
+    return int.from_bytes(digest, 'big') + _ID_OFFSET
+
+
+def _with_id(item: Dict[str, Any], item_id: int) -> Dict[str, Any]:
+    """Копия позиции с другим ID (исходная позиция не меняется)"""
+    if isinstance(item, MenuItem):
+        data = item.to_dict()
+        data['id'] = item_id
+        return MenuItem.from_dict(data)
+    return {**item, 'id': item_id}
+
+
+def resolve_id_collisions(items: List[Dict[str, Any]]) -> Tuple[Tuple[Dict[str, Any], ...], int]:
+    """Проверка коллизий ID при загрузке
+    
+    Разные ключи с одинаковым ID разводятся детерминированно: ключ, меньший
+    в лексикографическом порядке, сохраняет ID, остальные получают ID с солью.
+    Позиции общие для снимков и филиалов (MenuItemPool), поэтому вместо
+    правки ID конфликтующая позиция заменяется копией с новым ID.
+    Возвращает позиции и количество исправленных.
+    """
+    keys_by_id: Dict[int, set] = {}
+    for item in items:
+        keys_by_id.setdefault(item.get('id'), set()).add(item_id_key(item.get('article', ''), item.get('name', '')))
+
+    taken = set(keys_by_id)
+    reassigned: Dict[str, int] = {}
+    for item_id, keys in keys_by_id.items():
+        if len(keys) < 2:
+            continue
+        logger.error(f"❌ Коллизия ID {item_id}: {sorted(keys)}")
+        for key in sorted(keys)[1:]:
+            salt = 1
+            new_id = stable_item_id(key, salt)
+            while new_id in taken:
+                salt += 1
+                new_id = stable_item_id(key, salt)
+            taken.add(new_id)
+            reassigned[key] = new_id
+
+    if not reassigned:
+        return tuple(items), 0
+
+    fixed = 0
+    resolved = []
+    for item in items:
+        key = item_id_key(item.get('article', ''), item.get('name', ''))
+        if key in reassigned and item.get('id') != reassigned[key]:
+            item = _with_id(item, reassigned[key])
+            fixed += 1
+        resolved.append(item)
+    return tuple(resolved), fixed
+
+
+class MenuIndex:
+    """Неизменяемый индекс позиций меню"""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.by_id: Dict[Any, Dict[str, Any]] = {}
+        self.by_article: Dict[str, Dict[str, Any]] = {}
+        self.by_category: Dict[str, Tuple[Dict[str, Any], ...]] = {}
+        # Заранее приведенные к нижнему регистру поля для подстрочного поиска
+        self.search_rows: Tuple[Tuple[Dict[str, Any], str, str, str], ...] = ()
+
+        search_rows = []
+
+        for item in items:
+            item_id = item.get('id')
+            # Первое вхождение выигрывает - как и при линейном поиске
+            if item_id is not None and item_id not in self.by_id:
+                self.by_id[item_id] = item
+
+            article_key = self.normalize_article(item.get('article', ''))
+            if article_key and article_key not in self.by_article:
+                self.by_article[article_key] = item
+
+            search_rows.append((
+                item,
+                item.get('name', '').lower(),
+                item.get('description', '').lower(),
+                item.get('article', '').lower()
+            ))
+
+        self.search_rows = tuple(search_rows)
+        # Числовые поля в колонках для горячих путей подбора
+        self.columns = MenuColumns(items)
+        self.by_category = {
+            category: tuple(self.columns.items[row] for row in rows)
+            for category, rows in self.columns.category_rows.items()
+        }
+
+        logger.debug(
+            "Индекс меню построен: %d ID, %d артикулов, %d категорий",
+            len(self.by_id), len(self.by_article), len(self.by_category)
+        )
+
+    @staticmethod
+    def normalize_article(article: str) -> str:
+        """Ключ артикула без учета регистра"""
+        return (article or '').strip().casefold()
+
+    def get_by_id(self, item_id: Any) -> Optional[Dict[str, Any]]:
+        """Позиция по ID"""
+        return self.by_id.get(item_id)
+
+    def get_by_article(self, article: str) -> Optional[Dict[str, Any]]:
+        """Позиция по артикулу"""
+        return self.by_article.get(self.normalize_article(article))
+
+    def get_category_by_price(self, category: str) -> Tuple[Dict[str, Any], ...]:
+        """Позиции категории, отсортированные по возрастанию цены"""
+        return self.by_category.get(category, ())
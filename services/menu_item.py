@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Компактное представление позиции меню
+MenuItem хранит поля в __slots__ (без словаря на каждую позицию),
+повторяющиеся строки интернируются, а числовые поля каталога
+дополнительно лежат в колонках MenuColumns
+"""
+
+import math
+import sys
+import threading
+import weakref
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class MenuItem:
+    """Позиция меню со словарным интерфейсом для совместимости
+
+    Только для чтения: одна позиция может входить в несколько снимков и
+    каталогов филиалов (MenuItemPool), изменения делаются через copy().
+    """
+
+    # Поля позиции (ключи словарного интерфейса)
+    FIELDS = ('id', 'article', 'name', 'description', 'category',
+              'price', 'weight', 'unit', 'source_file', 'serves_min', 'serves_max')
+    # __weakref__ - одинаковые позиции разных филиалов делятся через MenuItemPool
+    __slots__ = FIELDS + ('__weakref__',)
+
+    def __init__(self, id: int, article: str, name: str, description: str = '',
+                 category: str = 'Другое', price: int = 0, weight: int = 0,
+                 unit: str = 'шт', source_file: str = '',
+                 serves_min: int = 0, serves_max: int = 0):
+        self.id = id
+        self.article = article
+        self.name = name
+        self.description = description
+        # Категории, единицы и имена файлов повторяются тысячи раз
+        self.category = sys.intern(category)
+        self.price = price
+        self.weight = weight
+        self.unit = sys.intern(unit)
+        self.source_file = sys.intern(source_file)
+        # Сет на компанию: диапазон гостей из названия ("на 25-30 человек"), 0 - порция
+        self.serves_min = serves_min
+        self.serves_max = serves_max
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MenuItem':
+        """Создание из словаря (лишние ключи игнорируются)"""
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    # Словарный интерфейс: существующий код читает позиции как dict
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.FIELDS:
+            return default
+        return getattr(self, key)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(field, getattr(self, field)) for field in self.FIELDS]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Обычный словарь (для смет, JSON и т.п.)"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def copy(self) -> Dict[str, Any]:
+        """Копия как изменяемый словарь - в нее добавляют quantity и т.п."""
+        return self.to_dict()
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, MenuItem):
+            return self.items() == other.items()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"MenuItem(id={self.id!r}, article={self.article!r}, name={self.name!r}, price={self.price!r})"
+
+
+def item_servings(item: Any) -> float:
+    """Гостей на единицу позиции: середина диапазона сета, для порции - 1"""
+    serves_max = item.get('serves_max') or 0
+    if not serves_max:
+        return 1.0
+    return (float(item.get('serves_min') or serves_max) + serves_max) / 2
+
+
+def is_serving_set(item: Any) -> bool:
+    """Позиция - сет на компанию (считается целыми единицами)"""
+    return bool(item.get('serves_max'))
+
+
+def set_units(item: Any, guests: float) -> int:
+    """Сколько единиц позиции нужно на guests гостей"""
+    return max(1, math.ceil(guests / item_servings(item) - 1e-9))
+
+
+class MenuItemPool:
+    """Общий пул одинаковых позиций для каталогов нескольких филиалов
+
+    Позиция, совпадающая по всем полям с уже загруженной, заменяется
+    существующим экземпляром. Ссылки слабые: позиция пропадает из пула,
+    когда ее не держит ни один каталог.
+    """
+
+    def __init__(self):
+        self._items: 'weakref.WeakValueDictionary[tuple, MenuItem]' = weakref.WeakValueDictionary()
+        self.shared = 0
+        # Каталоги филиалов загружаются в разных потоках
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def share(self, items: Iterable[Any]) -> Tuple[Any, ...]:
+        """Позиции с заменой одинаковых на общие экземпляры"""
+        result = []
+        with self._lock:
+            for item in items:
+                if isinstance(item, MenuItem):
+                    key = tuple(getattr(item, field) for field in MenuItem.FIELDS)
+                    existing = self._items.get(key)
+                    if existing is not None:
+                        if existing is not item:
+                            self.shared += 1
+                        item = existing
+                    else:
+                        self._items[key] = item
+                result.append(item)
+        return tuple(result)
+
+
+class MenuColumns:
+    """Колоночное хранение числовых полей каталога
+
+    Строка i соответствует items[i]; цены, вес и коды категорий лежат
+    в плотных массивах array вместо обращений к полям каждой позиции.
+    Для сетов на компанию дополнительно хранятся цена и вес на гостя;
+    подбор по бюджету идет по цене на гостя (у порций она равна цене).
+    """
+
+    def __init__(self, items: Iterable[Any]):
+        self.items = tuple(items)
+        self.prices = array('d')
+        self.weights = array('d')
+        self.servings = array('d')
+        self.guest_prices = array('d')
+        self.guest_weights = array('d')
+        self.category_codes = array('H')
+        self.category_names: List[str] = []
+        self.category_code_by_name: Dict[str, int] = {}
+        # Строки каждой категории по возрастанию цены и их цены для бинарного поиска
+        self.category_rows: Dict[str, array] = {}
+        self.category_prices: Dict[str, array] = {}
+        # То же по цене на гостя (для категорий без сетов - те же массивы)
+        self.category_guest_rows: Dict[str, array] = {}
+        self.category_guest_prices: Dict[str, array] = {}
+
+        for row, item in enumerate(self.items):
+            category = item.get('category', 'Другое')
+            code = self.category_code_by_name.get(category)
+            if code is None:
+                code = len(self.category_names)
+                self.category_code_by_name[category] = code
+                self.category_names.append(category)
+                self.category_rows[category] = array('l')
+
+            servings = item_servings(item)
+            self.prices.append(float(item.get('price', 0) or 0))
+            self.weights.append(float(item.get('weight', 0) or 0))
+            self.servings.append(servings)
+            self.guest_prices.append(self.prices[-1] / servings)
+            self.guest_weights.append(self.weights[-1] / servings)
+            self.category_codes.append(code)
+            self.category_rows[category].append(row)
+
+        for category, rows in self.category_rows.items():
+            # Сортировка устойчивая: при равной цене сохраняется порядок файла
+            sorted_rows = sorted(rows, key=self.prices.__getitem__)
+            self.category_rows[category] = array('l', sorted_rows)
+            self.category_prices[category] = array('d', (self.prices[row] for row in sorted_rows))
+            if any(self.servings[row] != 1.0 for row in rows):
+                guest_rows = sorted(rows, key=self.guest_prices.__getitem__)
+                self.category_guest_rows[category] = array('l', guest_rows)
+                self.category_guest_prices[category] = array('d', (self.guest_prices[row] for row in guest_rows))
+            else:
+                self.category_guest_rows[category] = self.category_rows[category]
+                self.category_guest_prices[category] = self.category_prices[category]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def count_up_to_price(self, category: str, max_price: Optional[float] = None) -> int:
+        """Сколько позиций категории не дороже max_price на гостя (бинарный поиск)"""
+        prices = self.category_guest_prices.get(category)
+        if prices is None:
+            return 0
+        if max_price is None:
+            return len(prices)
+        return bisect_right(prices, max_price)
+
+    def cheapest(self, category: str, count: int, max_price: Optional[float] = None,
+                 allowed_rows: Optional[int] = None) -> List[Any]:
+        """Самые дешевые на гостя позиции категории не дороже max_price: O(log n + k)
+
+        allowed_rows - битовое множество допустимых строк (фильтр по диете).
+        """
+        end = self.count_up_to_price(category, max_price)
+        rows = self.category_guest_rows.get(category, ())
+        if allowed_rows is None:
+            return [self.items[row] for row in rows[:min(count, end)]]
+
+        selected = []
+        for row in rows[:end]:
+            if allowed_rows >> row & 1:
+                selected.append(self.items[row])
+                if len(selected) >= count:
+                    break
+        return selected
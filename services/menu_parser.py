@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Потоковый разбор txt файлов меню табличного формата
+Файл читается построчно (память не зависит от размера выгрузки),
+большие файлы режутся на диапазоны по границам строк, а диапазоны
+разных файлов разбираются параллельно в пуле процессов.
+Функции модульного уровня - чтобы их можно было передать в процесс.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from services.menu_index import item_id_key, stable_item_id
+    from services.menu_item import MenuItem
+except ImportError:
+    from menu_index import item_id_key, stable_item_id
+    from menu_item import MenuItem
+
+logger = logging.getLogger(__name__)
+
+# Размер блока чтения при хешировании
+_READ_BLOCK = 1 << 20
+# Файлы больше этого режутся на диапазоны для параллельного разбора
+PARSE_CHUNK_BYTES = 4 << 20
+# Меньше этого объема пул процессов не окупает запуск
+PARALLEL_MIN_BYTES = 2 << 20
+
+_NUMBER_RE = re.compile(r'\d+')
+# Размер сета в названии: "на 25-30 человек", "на 21-25 персон", "на 10 человек"
+_SERVING_RANGE_RE = re.compile(r'на\s+(\d+)(?:\s*[-–—]\s*(\d+))?\s*(?:человек|персон|гост|чел)', re.IGNORECASE)
+
+CATEGORY_BY_FILENAME = {
+    'канапе': 'Канапе',
+    'брускетт': 'Брускетты',
+    'салат': 'Салаты',
+    'банкет': 'Банкетные блюда',
+    'горячие': 'Горячие закуски',
+    'холодные': 'Холодные закуски',
+    'десерт': 'Десерты',
+    'сэндвич': 'Сэндвичи',
+    'выпечка': 'Выпечка',
+    'напитки': 'Напитки',
+    'гарнир': 'Гарниры',
+    'сет': 'Готовые сеты',
+    'меню': 'Основное меню'
+}
+
+# Диапазон файла: начало, конец (байты) и номер первой строки
+FileRange = Tuple[int, int, int]
+
+
+def determine_category(filename: str) -> str:
+    """Определение категории по имени файла"""
+    filename_lower = filename.lower()
+
+    for keyword, category in CATEGORY_BY_FILENAME.items():
+        if keyword in filename_lower:
+            return category
+
+    # Если не определили, используем имя файла как категорию
+    return filename.replace('.txt', '').replace('_', ' ').title()
+
+
+def extract_number(text: str) -> int:
+    """Первое целое число в тексте (0, если чисел нет)"""
+    if not text:
+        return 0
+    match = _NUMBER_RE.search(text)
+    return int(match.group()) if match else 0
+
+
+def parse_serving_range(name: str) -> Tuple[int, int]:
+    """Диапазон гостей сета из названия: (мин, макс); (0, 0) - обычная порция"""
+    match = _SERVING_RANGE_RE.search(name or '')
+    if not match:
+        return 0, 0
+    low = int(match.group(1))
+    high = int(match.group(2)) if match.group(2) else low
+    return min(low, high), max(low, high)
+
+
+def is_table_header(line: str) -> bool:
+    """Первая строка - заголовок таблицы"""
+    return '\t' in line or 'Артикул' in line
+
+
+def parse_table_line(line: str, category: str, line_num: int, filename: str) -> Optional[MenuItem]:
+    """Разбор одной строки табличного формата
+
+    Полный формат: Артикул, Наименование, Описание, Вес (г), Цена (₽);
+    сокращенный - без описания.
+    """
+    parts = line.split('\t')
+
+    if len(parts) >= 5:
+        article, name, description, weight_str, price_str = (part.strip() for part in parts[:5])
+    elif len(parts) >= 3:
+        article = parts[0].strip()
+        name = parts[1].strip()
+        description = ''
+        weight_str = parts[2].strip()
+        price_str = parts[3].strip() if len(parts) > 3 else "500"
+    else:
+        logger.warning("⚠️ Недостаточно данных в строке %d файла %s: %d колонок (нужно минимум 3)",
+                       line_num, filename, len(parts))
+        return None
+
+    if not name:
+        logger.warning("⚠️ Пустое название в строке %d файла %s", line_num, filename)
+        return None
+
+    item = make_menu_item(article, name, description, weight_str, price_str, category, filename)
+    logger.debug("✅ Строка %d: %s (ID: %s)", line_num, name, item.id)
+    return item
+
+
+def make_menu_item(article: str, name: str, description: str, weight: Any, price: Any,
+                   category: str, filename: str) -> MenuItem:
+    """Позиция из сырых значений любого источника (числа или текст вида '250 г')"""
+    serves_min, serves_max = parse_serving_range(name)
+    return MenuItem(
+        id=stable_item_id(item_id_key(article, name)),
+        article=article,
+        name=name,
+        description=description,
+        category=category,
+        price=max(1, to_number(price)),
+        weight=max(1, to_number(weight)),
+        unit='сет' if serves_max else 'шт',
+        source_file=filename,
+        serves_min=serves_min,
+        serves_max=serves_max
+    )
+
+
+def to_number(value: Any) -> int:
+    """Целое из числа или текста"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(round(value))
+    return extract_number(str(value) if value is not None else '')
+
+
+def iter_table_items(lines: Iterable[str], category: str, filename: str,
+                     first_line: int = 1, detect_header: bool = True) -> Iterator[MenuItem]:
+    """Позиции из потока строк (генератор)
+
+    detect_header - поток начинается с первой строки файла, где может быть заголовок.
+    """
+    for line_num, line in enumerate(lines, first_line):
+        line = line.strip()
+        if detect_header and line_num == first_line:
+            if line and is_table_header(line):
+                logger.debug("📋 Заголовок файла %s: %s", filename, line)
+                continue
+            if line:
+                logger.warning("⚠️ Заголовок не найден в %s, обрабатываем все строки", filename)
+
+        if not line or line.startswith('#'):
+            continue
+
+        try:
+            item = parse_table_line(line, category, line_num, filename)
+        except Exception as e:
+            logger.warning("⚠️ Ошибка парсинга строки %d в %s: %s", line_num, filename, e)
+            continue
+        if item is not None:
+            yield item
+
+
+def _iter_range_lines(txt_file: Path, start: int, end: Optional[int]) -> Iterator[str]:
+    """Строки файла в диапазоне байт [start, end) без чтения файла целиком"""
+    with open(txt_file, 'rb') as f:
+        f.seek(start)
+        position = start
+        for raw in f:
+            if end is not None and position >= end:
+                break
+            position += len(raw)
+            yield raw.decode('utf-8')
+
+
+def iter_menu_file(txt_file: Path, category: Optional[str] = None) -> Iterator[MenuItem]:
+    """Позиции txt файла меню потоком"""
+    txt_file = Path(txt_file)
+    category = category or determine_category(txt_file.name)
+    return iter_table_items(_iter_range_lines(txt_file, 0, None), category, txt_file.name)
+
+
+def parse_menu_range(txt_file: str, start: int, end: int, first_line: int,
+                     category: str) -> List[MenuItem]:
+    """Разбор диапазона файла - единица работы для пула процессов"""
+    path = Path(txt_file)
+    return list(iter_table_items(
+        _iter_range_lines(path, start, end),
+        category,
+        path.name,
+        first_line=first_line,
+        detect_header=start == 0
+    ))
+
+
+def scan_menu_file(txt_file: Path, chunk_bytes: Optional[int] = PARSE_CHUNK_BYTES) -> Tuple[str, List[FileRange]]:
+    """Хеш содержимого и диапазоны для разбора за один проход по файлу
+
+    Границы диапазонов выравниваются на начало строки, для каждого
+    диапазона запоминается номер первой строки (для сообщений об ошибках).
+    chunk_bytes=None - файл не делится (один диапазон).
+    """
+    digest = hashlib.sha1()
+    starts = [(0, 1)]
+    next_boundary = chunk_bytes if chunk_bytes else float('inf')
+    block_start = 0
+    lines_before = 0
+
+    with open(txt_file, 'rb') as f:
+        while True:
+            block = f.read(_READ_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+
+            block_end = block_start + len(block)
+            while next_boundary < block_end:
+                newline = block.find(b'\n', next_boundary - block_start)
+                if newline < 0:
+                    # Граница переносится на следующий блок
+                    next_boundary = block_end
+                    break
+                boundary = block_start + newline + 1
+                starts.append((boundary, lines_before + block.count(b'\n', 0, newline + 1) + 1))
+                next_boundary = boundary + chunk_bytes
+
+            lines_before += block.count(b'\n')
+            block_start = block_end
+
+    # Граница ровно в конце файла не дает нового диапазона
+    if len(starts) > 1 and starts[-1][0] >= block_start:
+        starts.pop()
+    ranges = [
+        (start, starts[i + 1][0] if i + 1 < len(starts) else block_start, first_line)
+        for i, (start, first_line) in enumerate(starts)
+    ]
+    return digest.hexdigest(), ranges
+
+
+# Задача разбора: файл, функция модульного уровня (или метод источника) и ее аргументы
+ParseTask = Tuple[Path, Callable[..., List[MenuItem]], Tuple[Any, ...]]
+
+
+def txt_parse_tasks(txt_file: Path, ranges: Sequence[FileRange]) -> List[ParseTask]:
+    """Задачи разбора txt файла - по одной на диапазон"""
+    category = determine_category(txt_file.name)
+    return [
+        (txt_file, parse_menu_range, (str(txt_file), start, end, first_line, category))
+        for start, end, first_line in ranges
+    ]
+
+
+def run_parse_tasks(tasks: Sequence[ParseTask], workers: int = 0,
+                    total_bytes: int = 0) -> Dict[Path, Tuple[MenuItem, ...]]:
+    """Выполнение задач разбора: последовательно или в пуле процессов
+
+    workers=0 - по числу ядер, если объем данных (total_bytes) окупает пул;
+    workers=1 - всегда в этом процессе. Порядок позиций внутри файла
+    сохраняется. Файлы, которые не удалось разобрать, в результат не попадают.
+    """
+    paths = list(dict.fromkeys(path for path, _, _ in tasks))
+
+    if workers <= 0:
+        workers = (os.cpu_count() or 1) if total_bytes >= PARALLEL_MIN_BYTES else 1
+    workers = min(workers, len(tasks))
+
+    if workers > 1:
+        try:
+            results: Dict[Path, List[MenuItem]] = {path: [] for path in paths}
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [(path, pool.submit(func, *args)) for path, func, args in tasks]
+                for path, future in futures:
+                    results[path].extend(future.result())
+            logger.info(f"⚡ Разобрано {len(tasks)} частей {len(paths)} файлов в {workers} процессах "
+                        f"({total_bytes / (1 << 20):.1f} МБ)")
+            return {path: tuple(items) for path, items in results.items()}
+        except Exception as e:
+            # Ошибку конкретного файла покажет последовательный разбор
+            logger.warning(f"⚠️ Параллельный разбор не удался ({e}), разбираем последовательно")
+
+    results = {path: [] for path in paths}
+    failed = set()
+    for path, func, args in tasks:
+        if path in failed:
+            continue
+        try:
+            results[path].extend(func(*args))
+        except Exception as e:
+            logger.error(f"❌ Ошибка разбора файла {path}: {e}")
+            failed.add(path)
+    return {path: tuple(items) for path, items in results.items() if path not in failed}
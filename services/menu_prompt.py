@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Срез каталога для промпта Claude
+Вместо первых позиций меню в промпт попадают блюда категорий типа
+мероприятия, подходящие по диете и по цене на гостя в пределах бюджета.
+Строки компактные (артикул, название, граммы, цена) и упаковываются
+под явный бюджет токенов: категории заполняются по очереди пропорционально
+долям правил, поэтому при обрезке ни одна категория не теряется целиком.
+"""
+
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+try:
+    from services.catering_rules_service import MENU_COST_SHARE
+    from services.menu_item import MenuColumns, is_serving_set
+except ImportError:
+    from catering_rules_service import MENU_COST_SHARE
+    from menu_item import MenuColumns, is_serving_set
+
+# Бюджет токенов на срез меню по умолчанию
+DEFAULT_PROMPT_MENU_TOKENS = 1200
+# Символов кириллицы на токен (с запасом: цифры и знаки дороже)
+_CHARS_PER_TOKEN = 3
+# Минимум строк категории, если она поместилась в бюджет токенов
+_MIN_CATEGORY_LINES = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов текста"""
+    return -(-len(text) // _CHARS_PER_TOKEN)
+
+
+def format_item_line(item: Any) -> str:
+    """Строка позиции: "- арт. 1234 Канапе с лососем, 30 г, 180 ₽/шт" """
+    parts = [f"{item.get('name', '')}"]
+    if item.get('weight'):
+        parts.append(f"{int(item['weight'])} г")
+    parts.append(f"{int(item.get('price') or 0)} ₽/{item.get('unit') or 'шт'}")
+    if is_serving_set(item):
+        serves_min = item.get('serves_min') or item.get('serves_max')
+        parts.append(f"на {serves_min}-{item['serves_max']} гостей")
+    line = ", ".join(parts)
+    article = item.get('article')
+    return f"- арт. {article} {line}" if article else f"- {line}"
+
+
+def _spread_order(count: int) -> Iterator[int]:
+    """Индексы 0..count-1 от середины к краям и промежуткам: любая префиксная
+    выборка покрывает весь ценовой диапазон"""
+    if count <= 0:
+        return
+    seen = set()
+    intervals = [(0, count)]
+    while intervals:
+        next_intervals = []
+        for low, high in intervals:
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            if middle not in seen:
+                seen.add(middle)
+                yield middle
+            next_intervals.extend(((low, middle), (middle + 1, high)))
+        intervals = next_intervals
+
+
+def _category_candidates(columns: MenuColumns, category: str, max_price: Optional[float],
+                         allowed_rows: Optional[int]) -> List[Any]:
+    """Позиции категории в ценовом диапазоне, в порядке равномерного охвата цен"""
+    end = columns.count_up_to_price(category, max_price)
+    rows = [
+        row for row in columns.category_guest_rows.get(category, ())[:end]
+        if allowed_rows is None or allowed_rows >> row & 1
+    ]
+    return [columns.items[rows[index]] for index in _spread_order(len(rows))]
+
+
+def build_menu_context(columns: MenuColumns, category_shares: Mapping[str, float],
+                       budget_per_person: Optional[float] = None,
+                       allowed_rows: Optional[int] = None,
+                       max_tokens: int = DEFAULT_PROMPT_MENU_TOKENS,
+                       title: str = "Доступное меню") -> Dict[str, Any]:
+    """Текст среза каталога под бюджет токенов
+
+    category_shares - доли категорий из правил мероприятия (категорий нет
+    в каталоге - берутся все категории поровну). allowed_rows - строки,
+    подходящие по диете. Позиции дороже доли бюджета на меню на гостя
+    не предлагаются.
+    """
+    shares = {category: share for category, share in category_shares.items()
+              if columns.category_guest_rows.get(category)}
+    if not shares:
+        shares = {category: 1.0 for category in columns.category_names}
+
+    max_price = budget_per_person * MENU_COST_SHARE if budget_per_person else None
+    candidates = {
+        category: _category_candidates(columns, category, max_price, allowed_rows)
+        for category in sorted(shares, key=shares.get, reverse=True)
+    }
+    candidates = {category: items for category, items in candidates.items() if items}
+
+    header = f"{title} (артикул, название, выход, цена):"
+    used_tokens = estimate_tokens(header) + 1
+    selected: Dict[str, List[Any]] = {category: [] for category in candidates}
+    total_share = sum(shares[category] for category in candidates) or 1.0
+
+    # По очереди: в каждом круге категория получает строки пропорционально доле
+    round_number = 0
+    budget_left = True
+    while budget_left and any(len(selected[c]) < len(items) for c, items in candidates.items()):
+        round_number += 1
+        for category, items in candidates.items():
+            quota = max(_MIN_CATEGORY_LINES, round(round_number * 10 * shares[category] / total_share))
+            while len(selected[category]) < min(quota, len(items)):
+                item = items[len(selected[category])]
+                cost = estimate_tokens(format_item_line(item)) + 1
+                if not selected[category]:
+                    cost += estimate_tokens(f"{category}:") + 1
+                if used_tokens + cost > max_tokens:
+                    budget_left = False
+                    break
+                selected[category].append(item)
+                used_tokens += cost
+            if not budget_left:
+                break
+
+    lines = [header]
+    items_count = 0
+    for category, items in selected.items():
+        if not items:
+            continue
+        lines.append(f"{category}:")
+        # В промпте позиции категории по возрастанию цены
+        for item in sorted(items, key=lambda item: item.get('price') or 0):
+            lines.append(format_item_line(item))
+        items_count += len(items)
+
+    text = "\n".join(lines) if items_count else ""
+    return {
+        'text': text,
+        'items_count': items_count,
+        'categories': [category for category, items in selected.items() if items],
+        'tokens': estimate_tokens(text)
+    }
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Реестр каталогов меню по филиалам (кухням)
+Каталог филиала загружается при первом обращении, одинаковые позиции
+разных филиалов хранятся один раз (MenuItemPool), а давно не нужные
+каталоги выгружаются по LRU, когда оценка памяти превышает лимит.
+Филиал выбирается на чат: обработчик бота вызывает use_chat(), и все
+сервисы, получившие registry.service, читают каталог филиала этого чата.
+Разбор файлов филиала не держит общую блокировку реестра, а асинхронные
+обработчики загружают каталог в потоке (preload), не останавливая цикл событий.
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+try:
+    from services.menu_item import MenuItemPool
+except ImportError:
+    from menu_item import MenuItemPool
+
+logger = logging.getLogger(__name__)
+
+# Филиал по умолчанию, если MENU_BRANCHES не задан
+DEFAULT_BRANCH = 'основной'
+# Лимит оценки памяти каталогов по умолчанию
+DEFAULT_REGISTRY_MAX_MB = 512
+
+# Оценка памяти (замер tracemalloc на каталогах 2-10 тыс. позиций):
+# индексы снимка на позицию и сама позиция со строками
+_SNAPSHOT_BYTES_PER_ITEM = 4096
+_ITEM_BYTES = 512
+
+
+def parse_branches(spec: str) -> Dict[str, Path]:
+    """Филиалы из MENU_BRANCHES: "центр=menu_files/center;север=/srv/north"
+
+    Разделитель пар - ";" или ",", имя филиала без учета регистра.
+    """
+    branches: Dict[str, Path] = {}
+    for part in (spec or '').replace(',', ';').split(';'):
+        name, sep, path = part.partition('=')
+        name, path = name.strip().lower(), path.strip()
+        if not sep or not name or not path:
+            if part.strip():
+                logger.warning(f"⚠️ MENU_BRANCHES: пропущена запись '{part.strip()}' (ожидается имя=папка)")
+            continue
+        branches[name] = Path(path)
+    return branches
+
+
+class BranchMenuService:
+    """MenuService филиала текущего чата (подставляется вместо MenuService)"""
+
+    def __init__(self, registry: 'MenuRegistry'):
+        self._registry = registry
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._registry.get(), name)
+
+
+class MenuRegistry:
+    """Каталоги меню филиалов с ленивой загрузкой и LRU-выгрузкой"""
+
+    def __init__(self, branches: Mapping[str, Path], service_factory: Callable[..., Any],
+                 default_branch: Optional[str] = None, max_bytes: int = DEFAULT_REGISTRY_MAX_MB << 20,
+                 watch_interval: float = 0.0, **service_kwargs):
+        if not branches:
+            raise ValueError("Не задано ни одного филиала")
+        self.branches: Dict[str, Path] = {name.lower(): Path(path) for name, path in branches.items()}
+        self.default_branch = (default_branch or next(iter(self.branches))).lower()
+        if self.default_branch not in self.branches:
+            raise ValueError(f"Филиал по умолчанию '{self.default_branch}' не задан в списке филиалов")
+
+        self.max_bytes = max_bytes
+        self.watch_interval = watch_interval
+        self._service_factory = service_factory
+        self._service_kwargs = service_kwargs
+
+        # Общие для всех филиалов: пул позиций и счетчик версий снимков
+        # (версия меню однозначно указывает на каталог и в кэшах по версии)
+        self.item_pool = MenuItemPool()
+        self._versions = itertools.count(1)
+
+        # Загруженные каталоги: от давно не использованных к недавним
+        self._services: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.RLock()
+        # Блокировки загрузки по филиалам: один разбор файлов на филиал,
+        # остальные филиалы в это время доступны
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._chat_branches: Dict[int, str] = {}
+        self._current: ContextVar[Optional[str]] = ContextVar(f"menu_branch_{id(self)}", default=None)
+
+        self.loads = 0
+        self.evictions = 0
+        self.service = BranchMenuService(self)
+
+    # Каталоги
+
+    def get(self, branch: Optional[str] = None) -> Any:
+        """MenuService филиала (по умолчанию - филиала текущего чата)"""
+        branch = (branch or self.current_branch).lower()
+        service = self._cached(branch)
+        if service is not None:
+            return service
+        with self._lock:
+            if branch not in self.branches:
+                raise KeyError(f"Неизвестный филиал: {branch}")
+            load_lock = self._load_locks.setdefault(branch, threading.Lock())
+
+        # Файлы разбираются без общей блокировки: ждут только запросы этого филиала
+        with load_lock:
+            service = self._cached(branch)
+            if service is not None:
+                return service
+            service = self._load(branch)
+            with self._lock:
+                self._services[branch] = service
+                self.loads += 1
+                self._evict(keep=branch)
+            return service
+
+    async def preload(self, branch: Optional[str] = None) -> Any:
+        """MenuService филиала для асинхронного обработчика
+
+        Незагруженный каталог разбирается в потоке (asyncio.to_thread),
+        чтобы холодный филиал не останавливал цикл событий и чаты других
+        филиалов.
+        """
+        branch = (branch or self.current_branch).lower()
+        service = self._cached(branch)
+        if service is not None:
+            return service
+        return await asyncio.to_thread(self.get, branch)
+
+    def _cached(self, branch: str) -> Optional[Any]:
+        """Загруженный каталог филиала (с отметкой использования для LRU)"""
+        with self._lock:
+            service = self._services.get(branch)
+            if service is not None:
+                self._services.move_to_end(branch)
+            return service
+
+    def _load(self, branch: str) -> Any:
+        logger.info(f"🏢 Загрузка меню филиала '{branch}': {self.branches[branch]}")
+        shared_before = self.item_pool.shared
+        service = self._service_factory(
+            str(self.branches[branch]),
+            item_pool=self.item_pool,
+            versions=self._versions,
+            **self._service_kwargs
+        )
+        if self.watch_interval > 0:
+            service.start_watcher(self.watch_interval)
+        logger.info(f"✅ Филиал '{branch}': {len(service.menu_items)} позиций, "
+                    f"общих с другими филиалами {self.item_pool.shared - shared_before}")
+        return service
+
+    def _evict(self, keep: str):
+        """Выгрузка давно не использованных каталогов сверх лимита памяти"""
+        while len(self._services) > 1 and self.memory_usage() > self.max_bytes:
+            branch = next(iter(self._services))
+            if branch == keep:
+                self._services.move_to_end(branch)
+                branch = next(iter(self._services))
+            service = self._services.pop(branch)
+            service.stop_watcher()
+            self.evictions += 1
+            logger.info(f"♻️ Меню филиала '{branch}' выгружено из памяти (лимит {self.max_bytes >> 20} МБ)")
+
+    def memory_usage(self) -> int:
+        """Оценка памяти загруженных каталогов, байт
+
+        Индексы считаются на каждый каталог, позиции - один раз по пулу.
+        """
+        with self._lock:
+            indexes = sum(len(service.menu_items) for service in self._services.values())
+            return indexes * _SNAPSHOT_BYTES_PER_ITEM + len(self.item_pool) * _ITEM_BYTES
+
+    def loaded_branches(self) -> List[str]:
+        """Загруженные филиалы (от давно не использованных к недавним)"""
+        with self._lock:
+            return list(self._services)
+
+    def reload_all(self):
+        """Перечитать файлы всех загруженных филиалов"""
+        with self._lock:
+            services = list(self._services.values())
+        for service in services:
+            service.reload_menu()
+
+    def stop_watchers(self):
+        with self._lock:
+            for service in self._services.values():
+                service.stop_watcher()
+
+    # Филиал чата
+
+    @property
+    def current_branch(self) -> str:
+        """Филиал текущего обработчика (use_chat), иначе филиал по умолчанию"""
+        return self._current.get() or self.default_branch
+
+    def branch_for_chat(self, chat_id: Optional[int]) -> str:
+        return self._chat_branches.get(chat_id, self.default_branch)
+
+    def select_branch(self, chat_id: int, branch: str) -> bool:
+        """Выбор филиала для чата (False - такого филиала нет)"""
+        branch = (branch or '').strip().lower()
+        if branch not in self.branches:
+            return False
+        if branch == self.default_branch:
+            self._chat_branches.pop(chat_id, None)
+        else:
+            self._chat_branches[chat_id] = branch
+        self._current.set(branch)
+        return True
+
+    def use_chat(self, chat_id: Optional[int]) -> str:
+        """Филиал чата для текущей задачи asyncio (значение ContextVar не видно другим чатам)"""
+        branch = self.branch_for_chat(chat_id)
+        self._current.set(branch)
+        return branch
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'branches': list(self.branches),
+                'default_branch': self.default_branch,
+                'loaded': list(self._services),
+                'memory_mb': round(self.memory_usage() / (1 << 20), 1),
+                'max_mb': self.max_bytes >> 20,
+                'pooled_items': len(self.item_pool),
+                'shared_items': self.item_pool.shared,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'chats_with_branch': len(self._chat_branches)
+            }
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Полнотекстовый поиск по меню с ранжированием
+Инвертированный индекс строится при загрузке меню:
+нормализация (ё→е, нижний регистр), легкий стемминг, веса полей, top-k.
+Нечеткий поиск - триграммный индекс по словам названий и артикулам
+"""
+
+import heapq
+import logging
+import math
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Веса полей при ранжировании
+FIELD_WEIGHTS = {
+    'article': 5.0,
+    'name': 3.0,
+    'description': 1.0
+}
+
+# Окончания русских слов - от длинных к коротким
+_RU_ENDINGS = (
+    'иями', 'ями', 'ами', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ией', 'ые', 'ие', 'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее',
+    'ую', 'юю', 'ов', 'ев', 'ом', 'ем', 'ах', 'ях', 'ам', 'ям', 'ию', 'ия',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й'
+)
+
+# Предлоги и союзы не участвуют в поиске
+STOP_WORDS = frozenset({'в', 'во', 'и', 'с', 'со', 'на', 'из', 'по', 'под', 'для', 'к', 'о', 'от', 'до', 'без'})
+
+_MIN_STEM_LENGTH = 3
+_MIN_PREFIX_LENGTH = 3
+_MAX_PREFIX_EXPANSIONS = 20
+_TOKEN_RE = re.compile(r'[0-9a-zа-я]+')
+_WORD_RE = re.compile(r'[0-9a-zа-яё]+')
+_CYRILLIC_RE = re.compile(r'[а-яё]')
+
+# Латинские буквы, похожие на кириллические (после приведения к нижнему регистру)
+_HOMOGLYPHS = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у'
+})
+
+# Нечеткий поиск
+_FUZZY_MAX_CANDIDATES = 50
+_FUZZY_MIN_WORD_LENGTH = 3
+
+
+def _fold_word(match) -> str:
+    """Слово со смесью алфавитов приводим к кириллице"""
+    word = match.group(0)
+    if _CYRILLIC_RE.search(word):
+        return word.translate(_HOMOGLYPHS)
+    return word
+
+
+def normalize_text(text: str) -> str:
+    """Нижний регистр, ё→е, латинские двойники в кириллических словах"""
+    return _WORD_RE.sub(_fold_word, (text or '').lower()).replace('ё', 'е')
+
+
+@lru_cache(maxsize=1 << 16)
+def stem_token(token: str) -> str:
+    """Легкий стемминг: отбрасываем типичное окончание (словарь меню невелик - кэшируем)"""
+    if not re.match(r'[а-я]', token):
+        return token
+    for ending in _RU_ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= _MIN_STEM_LENGTH:
+            return token[:-len(ending)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Нормализованные токены со стеммингом"""
+    return [
+        stem_token(token) for token in _TOKEN_RE.findall(normalize_text(text))
+        if token not in STOP_WORDS
+    ]
+
+
+class MenuSearchIndex:
+    """Инвертированный индекс по названию, описанию и артикулу"""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = tuple(items)
+        self.postings: Dict[str, Dict[int, float]] = {}
+
+        for doc_id, item in enumerate(self.items):
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(item.get(field, '')):
+                    doc_weights = self.postings.setdefault(token, {})
+                    doc_weights[doc_id] = doc_weights.get(doc_id, 0.0) + weight
+
+        total_docs = max(1, len(self.items))
+        self.idf = {
+            token: math.log(1 + total_docs / len(docs))
+            for token, docs in self.postings.items()
+        }
+        self.vocabulary = sorted(self.postings)
+
+        logger.debug("Поисковый индекс: %d позиций, %d токенов", len(self.items), len(self.vocabulary))
+
+    def _expand_prefix(self, token: str) -> List[str]:
+        """Токены словаря, начинающиеся с префикса (для недописанного слова)"""
+        start = bisect_left(self.vocabulary, token)
+        expansions = []
+        for vocab_token in self.vocabulary[start:start + _MAX_PREFIX_EXPANSIONS]:
+            if not vocab_token.startswith(token):
+                break
+            expansions.append(vocab_token)
+        return expansions
+
+    def score(self, query: str) -> Dict[int, float]:
+        """Оценки релевантности для всех подходящих позиций"""
+        tokens = tokenize(query)
+        scores: Dict[int, float] = {}
+
+        for position, token in enumerate(tokens):
+            matched = [token] if token in self.postings else []
+            # Последнее слово запроса может быть недописанным
+            if len(token) >= _MIN_PREFIX_LENGTH and (position == len(tokens) - 1 or not matched):
+                matched = matched + [t for t in self._expand_prefix(token) if t != token]
+
+            for matched_token in matched:
+                # Совпадение по префиксу весит меньше точного
+                factor = 1.0 if matched_token == token else 0.5
+                idf = self.idf[matched_token]
+                for doc_id, weight in self.postings[matched_token].items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * weight * factor
+
+        return scores
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[Dict[str, Any], float]]:
+        """Top-k позиций по релевантности"""
+        scores = self.score(query)
+        if not scores:
+            return []
+
+        # При равной оценке сохраняем порядок файла
+        best = heapq.nlargest(limit, scores.items(), key=lambda pair: (pair[1], -pair[0]))
+        return [(self.items[doc_id], score) for doc_id, score in best]
+
+
+def max_edit_distance(word: str) -> int:
+    """Допустимое число опечаток в зависимости от длины слова"""
+    if len(word) <= 4:
+        return 1
+    if len(word) <= 8:
+        return 2
+    return 3
+
+
+def bounded_levenshtein(left: str, right: str, max_distance: int) -> int:
+    """Расстояние Левенштейна с отсечкой: max_distance + 1, если порог превышен"""
+    if abs(len(left) - len(right)) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(right) + 1))
+    for i, left_char in enumerate(left, 1):
+        current = [i] + [0] * len(right)
+        row_min = i
+        for j, right_char in enumerate(right, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (left_char != right_char)
+            )
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return min(previous[-1], max_distance + 1)
+
+
+def trigrams(word: str) -> set:
+    """Символьные триграммы слова с границами"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyMenuIndex:
+    """Триграммный индекс по словам названий и артикулам для поиска с опечатками"""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = tuple(items)
+        self.words: List[str] = []
+        self.word_items: List[Tuple[int, ...]] = []
+        self.trigram_words: Dict[str, List[int]] = {}
+
+        word_ids: Dict[str, int] = {}
+        word_docs: List[set] = []
+
+        for doc_id, item in enumerate(self.items):
+            text = f"{item.get('name', '')} {item.get('article', '')}"
+            for word in _TOKEN_RE.findall(normalize_text(text)):
+                if len(word) < _FUZZY_MIN_WORD_LENGTH:
+                    continue
+                if word not in word_ids:
+                    word_ids[word] = len(self.words)
+                    self.words.append(word)
+                    word_docs.append(set())
+                word_docs[word_ids[word]].add(doc_id)
+
+        # Словарь растет медленнее каталога: поиск идет по словам, а не по позициям
+        for word_id, word in enumerate(self.words):
+            for gram in trigrams(word):
+                self.trigram_words.setdefault(gram, []).append(word_id)
+        self.word_items = [tuple(sorted(docs)) for docs in word_docs]
+
+        logger.debug("Нечеткий индекс: %d слов, %d триграмм", len(self.words), len(self.trigram_words))
+
+    def match_word(self, word: str) -> List[Tuple[int, int]]:
+        """Слова словаря в пределах допустимого числа опечаток: (word_id, distance)"""
+        max_distance = max_edit_distance(word)
+        overlap: Dict[int, int] = {}
+        for gram in trigrams(word):
+            for word_id in self.trigram_words.get(gram, ()):
+                overlap[word_id] = overlap.get(word_id, 0) + 1
+
+        # Проверяем только лучших кандидатов по числу общих триграмм
+        candidates = heapq.nlargest(_FUZZY_MAX_CANDIDATES, overlap.items(), key=lambda pair: pair[1])
+
+        matches = []
+        for word_id, _ in candidates:
+            distance = bounded_levenshtein(word, self.words[word_id], max_distance)
+            if distance <= max_distance:
+                matches.append((word_id, distance))
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[Dict[str, Any], float]]:
+        """Позиции, слова которых близки к словам запроса"""
+        scores: Dict[int, float] = {}
+        for word in _TOKEN_RE.findall(normalize_text(query)):
+            if len(word) < _FUZZY_MIN_WORD_LENGTH or word in STOP_WORDS:
+                continue
+
+            best_per_doc: Dict[int, float] = {}
+            for word_id, distance in self.match_word(word):
+                similarity = 1.0 - distance / max(len(word), len(self.words[word_id]))
+                for doc_id in self.word_items[word_id]:
+                    if similarity > best_per_doc.get(doc_id, 0.0):
+                        best_per_doc[doc_id] = similarity
+
+            for doc_id, similarity in best_per_doc.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + similarity
+
+        if not scores:
+            return []
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda pair: (pair[1], -pair[0]))
+        return [(self.items[doc_id], score) for doc_id, score in best]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Похожие блюда: ближайшие соседи по TF-IDF
+Разреженные векторы TF-IDF по названию и описанию строятся при создании
+снимка, top-k соседей считаются через общие токены (скалярное произведение
+только по ненулевым координатам). Для каталога обычного размера соседи
+всех позиций считаются сразу и ответ "похожие блюда" - готовый список;
+для больших выгрузок - при первом запросе позиции и запоминаются.
+
+NumPy/SciPy не используются: SciPy нет в зависимостях бота, а произведение
+по постингам - те же операции, что у разреженного X·Xᵀ, только по ненулевым
+координатам. На каталогах в сотни - несколько тысяч позиций соседи
+считаются за десятки-сотни миллисекунд, и индекс строится лениво, при
+первом запросе похожих блюд к снимку.
+"""
+
+import heapq
+import logging
+import math
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    from services.menu_search import tokenize
+except ImportError:
+    from menu_search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Веса полей в векторе позиции
+SIMILARITY_FIELD_WEIGHTS = {
+    'name': 2.0,
+    'description': 1.0
+}
+
+# Соседей на позицию
+SIMILAR_TOP_K = 10
+# Токены, которые встречаются чаще этой доли позиций, не отличают блюда
+# (и дают квадратичное число пар) - в соседях не участвуют
+_MAX_DOCUMENT_SHARE = 0.05
+_MIN_MAX_DOCUMENTS = 50
+# Ниже этого сходства позиция соседом не считается
+_MIN_SIMILARITY = 0.05
+# До такого размера каталога соседи всех позиций считаются при создании снимка
+EAGER_NEIGHBORS_LIMIT = 3000
+
+
+class MenuSimilarityIndex:
+    """Top-k похожих позиций по косинусу TF-IDF векторов"""
+
+    def __init__(self, items: Sequence[Dict[str, Any]], top_k: int = SIMILAR_TOP_K):
+        self.items = tuple(items)
+        self.top_k = top_k
+
+        term_weights: List[Dict[str, float]] = []
+        document_frequency: Dict[str, int] = {}
+        for item in self.items:
+            weights: Dict[str, float] = {}
+            for field, field_weight in SIMILARITY_FIELD_WEIGHTS.items():
+                for token in tokenize(item.get(field, '')):
+                    weights[token] = weights.get(token, 0.0) + field_weight
+            term_weights.append(weights)
+            for token in weights:
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+
+        total_docs = max(1, len(self.items))
+        max_documents = max(_MIN_MAX_DOCUMENTS, int(total_docs * _MAX_DOCUMENT_SHARE))
+
+        # Нормированные векторы и постинги только по различающим токенам
+        self.vectors: List[Dict[str, float]] = []
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc_id, weights in enumerate(term_weights):
+            vector = {
+                token: (1 + math.log(weight)) * math.log(1 + total_docs / document_frequency[token])
+                for token, weight in weights.items()
+                if document_frequency[token] <= max_documents
+            }
+            norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+            vector = {token: value / norm for token, value in vector.items()}
+            self.vectors.append(vector)
+            for token, value in vector.items():
+                self.postings.setdefault(token, []).append((doc_id, value))
+
+        self._row_by_id: Dict[Any, int] = {}
+        for row, item in enumerate(self.items):
+            self._row_by_id.setdefault(item.get('id'), row)
+
+        # Строка -> соседи (строка, сходство) по убыванию сходства
+        self.neighbors: Dict[int, Tuple[Tuple[int, float], ...]] = {}
+        if len(self.items) <= EAGER_NEIGHBORS_LIMIT:
+            for doc_id in range(len(self.items)):
+                self.neighbors[doc_id] = self._nearest(doc_id)
+
+        logger.debug("Похожие блюда: %d позиций, %d токенов", len(self.items), len(self.postings))
+
+    def _nearest(self, doc_id: int) -> Tuple[Tuple[int, float], ...]:
+        """Top-k соседей позиции по косинусу"""
+        scores: Dict[int, float] = {}
+        for token, value in self.vectors[doc_id].items():
+            for other_id, other_value in self.postings[token]:
+                if other_id != doc_id:
+                    scores[other_id] = scores.get(other_id, 0.0) + value * other_value
+        best = heapq.nlargest(
+            self.top_k,
+            ((other_id, score) for other_id, score in scores.items() if score >= _MIN_SIMILARITY),
+            key=lambda pair: pair[1]
+        )
+        return tuple((other_id, round(score, 4)) for other_id, score in best)
+
+    def similar(self, item_id: Any, limit: int = 5) -> List[Tuple[Dict[str, Any], float]]:
+        """Похожие позиции с оценкой сходства (0..1), без самой позиции"""
+        row = self._row_by_id.get(item_id)
+        if row is None:
+            return []
+        neighbors = self.neighbors.get(row)
+        if neighbors is None:
+            neighbors = self.neighbors[row] = self._nearest(row)
+        # Та же позиция может стоять в каталоге другой строкой (из другого файла)
+        similar = [(self.items[other_id], score) for other_id, score in neighbors
+                   if self.items[other_id].get('id') != item_id]
+        return similar[:limit]
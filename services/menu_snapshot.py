@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Снимки каталога меню для MenuService
+Снимок неизменяем и подменяется целиком при перезагрузке,
+поэтому обработчики никогда не видят пустое или наполовину загруженное меню
+"""
+
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+try:
+    from services.menu_index import MenuIndex, resolve_id_collisions
+    from services.menu_search import MenuSearchIndex, FuzzyMenuIndex
+    from services.menu_composer import MenuComposer
+    from services.menu_stats import MenuStats, file_category_stats
+    from services.menu_attributes import MenuAttributeIndex
+    from services.menu_substitutions import SubstitutionGraph
+    from services.menu_similarity import MenuSimilarityIndex
+except ImportError:
+    from menu_index import MenuIndex, resolve_id_collisions
+    from menu_search import MenuSearchIndex, FuzzyMenuIndex
+    from menu_composer import MenuComposer
+    from menu_stats import MenuStats, file_category_stats
+    from menu_attributes import MenuAttributeIndex
+    from menu_substitutions import SubstitutionGraph
+    from menu_similarity import MenuSimilarityIndex
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MenuFileState:
+    """Состояние исходного файла меню на момент разбора"""
+    mtime_ns: int
+    size: int
+    digest: str
+    items: Tuple[Dict[str, Any], ...]
+
+
+def menu_content_digest(file_digests: Iterable[Tuple[str, str]]) -> str:
+    """Хеш содержимого каталога по хешам исходных файлов (порядок не важен)"""
+    hasher = hashlib.blake2b(digest_size=12)
+    for filename, digest in sorted(file_digests):
+        hasher.update(f"{filename}\0{digest}\n".encode('utf-8'))
+    return hasher.hexdigest()
+
+
+class _LazyIndex:
+    """Индекс снимка, который строится при первом обращении
+
+    Перезагрузка из-за правки одного файла не строит заново поиск,
+    похожие блюда, составитель и граф замен: их строит первый запрос,
+    которому они нужны. Построение идет один раз под блокировкой снимка,
+    дальше значение читается из атрибута экземпляра без блокировки.
+    """
+
+    def __init__(self, build: Callable[['MenuSnapshot'], Any]):
+        self.build = build
+        self.name = ''
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, snapshot: Optional['MenuSnapshot'], owner=None) -> Any:
+        if snapshot is None:
+            return self
+        with snapshot._build_lock:
+            value = snapshot.__dict__.get(self.name)
+            if value is None:
+                value = self.build(snapshot)
+                snapshot.__dict__[self.name] = value
+            return value
+
+
+class MenuSnapshot:
+    """Неизменяемый снимок каталога: индекс и статистика сразу, тяжелые индексы - лениво"""
+
+    search_index = _LazyIndex(lambda snapshot: MenuSearchIndex(snapshot.menu_items))
+    fuzzy_index = _LazyIndex(lambda snapshot: FuzzyMenuIndex(snapshot.menu_items))
+    similarity = _LazyIndex(lambda snapshot: MenuSimilarityIndex(snapshot.menu_items))
+    # Строки масок совпадают со строками index.columns (тот же порядок позиций)
+    attributes = _LazyIndex(lambda snapshot: MenuAttributeIndex(snapshot.menu_items))
+    composer = _LazyIndex(lambda snapshot: MenuComposer(snapshot.menu_items))
+    substitutions = _LazyIndex(lambda snapshot: SubstitutionGraph(snapshot.menu_items, snapshot.attributes.masks))
+
+    def __init__(self, version: int, file_items: Mapping[str, Tuple[Dict[str, Any], ...]],
+                 txt_files: Iterable = (), previous: Optional['MenuSnapshot'] = None,
+                 content_digest: str = ''):
+        self.version = version
+        # Хеш содержимого исходных файлов: одинаков для одинаковых прайсов
+        # между перезапусками и филиалами (в отличие от version)
+        self.content_digest = content_digest
+        # Позиции исходных файлов переиспользуются между снимками без копирования
+        self.file_items = MappingProxyType(dict(file_items))
+        self.txt_files = tuple(txt_files)
+        self._build_lock = threading.RLock()
+        self.menu_items, fixed_ids = resolve_id_collisions(
+            [item for items in self.file_items.values() for item in items]
+        )
+        if fixed_ids:
+            logger.warning(f"⚠️ Исправлено ID при коллизиях: {fixed_ids}")
+
+        categories: Dict[str, list] = {}
+        for item in self.menu_items:
+            categories.setdefault(item.get('category', 'Другое'), []).append(item)
+        self.categories = MappingProxyType({
+            category: tuple(items) for category, items in categories.items()
+        })
+
+        self.index = MenuIndex(self.menu_items)
+
+        # Агрегаты неизменившихся файлов берутся из предыдущего снимка
+        self.file_stats = {}
+        for filename, items in self.file_items.items():
+            if previous is not None and previous.file_items.get(filename) is items:
+                self.file_stats[filename] = previous.file_stats[filename]
+            else:
+                self.file_stats[filename] = file_category_stats(items)
+        self.stats = MenuStats(self.file_stats, self.index.columns.category_prices)
+
+    @classmethod
+    def empty(cls) -> 'MenuSnapshot':
+        """Пустой снимок до первой загрузки"""
+        return cls(0, {})
+
+
+class MenuFileWatcher(threading.Thread):
+    """Фоновое наблюдение за папкой меню: применяет правки без кнопки перезагрузки"""
+
+    def __init__(self, menu_service, interval: float = 5.0):
+        super().__init__(name="MenuFileWatcher", daemon=True)
+        self.menu_service = menu_service
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        logger.info(f"👀 Наблюдение за {self.menu_service.menu_files_dir} (каждые {self.interval}с)")
+        while not self._stop_event.wait(self.interval):
+            try:
+                if self.menu_service.has_file_changes():
+                    self.menu_service.reload_menu()
+            except Exception as e:
+                logger.error(f"❌ Ошибка наблюдения за меню: {e}")
+
+    def stop(self):
+        """Остановка наблюдения"""
+        self._stop_event.set()
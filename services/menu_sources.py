@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Источники каталога меню
+Формат файла определяется по расширению: txt (табличный формат, потоковый
+разбор по диапазонам), json (data/menu.json), csv и xlsx (выгрузки закупок).
+Структурированные файлы загружаются целиком, без перевода в txt и
+построчного разбора. Новые форматы подключаются через register_menu_source.
+"""
+
+import csv
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from services.menu_item import MenuItem
+    from services.menu_parser import (
+        PARSE_CHUNK_BYTES, FileRange, ParseTask, determine_category,
+        make_menu_item, run_parse_tasks, txt_parse_tasks
+    )
+except ImportError:
+    from menu_item import MenuItem
+    from menu_parser import (
+        PARSE_CHUNK_BYTES, FileRange, ParseTask, determine_category,
+        make_menu_item, run_parse_tasks, txt_parse_tasks
+    )
+
+logger = logging.getLogger(__name__)
+
+# Названия колонок в выгрузках (без регистра и пояснений в скобках)
+FIELD_ALIASES = {
+    'article': ('артикул', 'article', 'код', 'sku'),
+    'name': ('наименование', 'название', 'name', 'блюдо'),
+    'description': ('описание', 'description', 'состав'),
+    'weight': ('вес', 'weight', 'выход', 'граммовка'),
+    'price': ('цена', 'price', 'стоимость'),
+    'category': ('категория', 'category', 'раздел'),
+}
+
+_COLUMN_NOTE_RE = re.compile(r'\(.*?\)')
+
+
+def normalize_column(title: Any) -> str:
+    """Название колонки без регистра и пояснений: 'Вес (г)' -> 'вес'"""
+    return _COLUMN_NOTE_RE.sub('', str(title or '')).strip().lower()
+
+
+def map_columns(header: Sequence[Any]) -> Dict[str, int]:
+    """Номера колонок по полям позиции"""
+    columns = {}
+    for position, title in enumerate(header):
+        title = normalize_column(title)
+        for field, aliases in FIELD_ALIASES.items():
+            if field not in columns and title in aliases:
+                columns[field] = position
+    return columns
+
+
+def items_from_rows(rows: Iterable[Sequence[Any]], filename: str) -> List[MenuItem]:
+    """Позиции из строк таблицы с заголовком (CSV, XLSX)"""
+    rows = iter(rows)
+    header = next(rows, None)
+    columns = map_columns(header or ())
+    if 'name' not in columns:
+        raise ValueError(f"в {filename} нет колонки с названием (заголовок: {header})")
+
+    default_category = determine_category(Path(filename).stem + '.txt')
+
+    def cell(row, field, default=''):
+        position = columns.get(field)
+        if position is None or position >= len(row) or row[position] is None:
+            return default
+        return row[position]
+
+    items = []
+    for row in rows:
+        name = str(cell(row, 'name')).strip()
+        if not name:
+            continue
+        items.append(make_menu_item(
+            str(cell(row, 'article')).strip(),
+            name,
+            str(cell(row, 'description')).strip(),
+            cell(row, 'weight', 0),
+            cell(row, 'price', 0),
+            str(cell(row, 'category')).strip() or default_category,
+            filename
+        ))
+    return items
+
+
+class MenuSource:
+    """Формат файлов каталога
+
+    chunk_bytes - размер диапазона для параллельного разбора одного файла
+    (None - файл разбирается целиком одной задачей).
+    """
+
+    suffixes: Tuple[str, ...] = ()
+    chunk_bytes: Optional[int] = None
+
+    def parse_tasks(self, path: Path, ranges: Sequence[FileRange]) -> List[ParseTask]:
+        """Задачи разбора файла для run_parse_tasks"""
+        return [(path, self.load, (str(path),))]
+
+    def load(self, path: str) -> List[MenuItem]:
+        raise NotImplementedError
+
+
+class TxtMenuSource(MenuSource):
+    """Табличный txt: Артикул, Наименование, Описание, Вес (г), Цена (₽)"""
+
+    suffixes = ('.txt',)
+    chunk_bytes = PARSE_CHUNK_BYTES
+
+    def parse_tasks(self, path: Path, ranges: Sequence[FileRange]) -> List[ParseTask]:
+        return txt_parse_tasks(path, ranges)
+
+
+class JsonMenuSource(MenuSource):
+    """Каталог в JSON: {"items": [...]} (как data/menu.json) или список позиций"""
+
+    suffixes = ('.json',)
+
+    def load(self, path: str) -> List[MenuItem]:
+        filename = Path(path).name
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        records = data.get('items', []) if isinstance(data, dict) else data
+        default_category = determine_category(Path(path).stem + '.txt')
+
+        items = []
+        for record in records:
+            name = str(record.get('name') or '').strip()
+            if not name:
+                continue
+            items.append(make_menu_item(
+                str(record.get('article') or '').strip(),
+                name,
+                str(record.get('description') or '').strip(),
+                record.get('weight', 0),
+                record.get('price', 0),
+                record.get('category') or default_category,
+                filename
+            ))
+        return items
+
+
+class CsvMenuSource(MenuSource):
+    """CSV с заголовком; разделитель (; , или табуляция) определяется автоматически"""
+
+    suffixes = ('.csv',)
+
+    def load(self, path: str) -> List[MenuItem]:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            sample = f.read(64 * 1024)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+            except csv.Error:
+                dialect = csv.excel
+            return items_from_rows(csv.reader(f, dialect), Path(path).name)
+
+
+class XlsxMenuSource(MenuSource):
+    """Первый лист XLSX с заголовком (нужен openpyxl)"""
+
+    suffixes = ('.xlsx',)
+
+    def load(self, path: str) -> List[MenuItem]:
+        try:
+            import openpyxl
+        except ImportError:
+            raise RuntimeError("openpyxl не установлен, xlsx прайсы не загружаются")
+
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            return items_from_rows(workbook.worksheets[0].iter_rows(values_only=True), Path(path).name)
+        finally:
+            workbook.close()
+
+
+MENU_SOURCES: Dict[str, MenuSource] = {}
+
+
+def register_menu_source(source: MenuSource):
+    """Подключение формата по его расширениям"""
+    for suffix in source.suffixes:
+        MENU_SOURCES[suffix.lower()] = source
+
+
+for _source in (TxtMenuSource(), JsonMenuSource(), CsvMenuSource(), XlsxMenuSource()):
+    register_menu_source(_source)
+
+
+def get_menu_source(path: Path) -> Optional[MenuSource]:
+    """Источник для файла (None - формат не поддерживается)"""
+    return MENU_SOURCES.get(Path(path).suffix.lower())
+
+
+def find_menu_files(location: Path) -> List[Path]:
+    """Файлы каталога: все поддерживаемые файлы папки или сам файл-каталог"""
+    location = Path(location)
+    if location.is_file():
+        return [location] if get_menu_source(location) else []
+    return sorted(
+        path for path in location.iterdir()
+        if path.is_file() and not path.name.startswith('.') and get_menu_source(path)
+    )
+
+
+def load_menu_sources(files: Sequence[Tuple[Path, Sequence[FileRange]]],
+                      workers: int = 0) -> Dict[Path, Tuple[MenuItem, ...]]:
+    """Разбор файлов любых форматов одним пакетом (см. run_parse_tasks)"""
+    tasks = []
+    total_bytes = 0
+    for path, ranges in files:
+        tasks.extend(get_menu_source(path).parse_tasks(path, ranges))
+        total_bytes += sum(end - start for start, end, _ in ranges)
+    return run_parse_tasks(tasks, workers, total_bytes)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Статистика каталога меню по категориям
+Агрегаты считаются по каждому файлу и складываются при сборке снимка:
+при горячей перезагрузке пересчитываются только изменившиеся файлы,
+а чтение статистики - готовый словарь без обхода позиций.
+"""
+
+import math
+from array import array
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+# Квантили цены в статистике категории
+PRICE_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+# Не еда: не входят в итоги для расчета стоимости граммовки
+NON_FOOD_CATEGORIES = frozenset({'Напитки'})
+
+
+class CategoryStats:
+    """Складываемые агрегаты цен и веса одной категории"""
+
+    __slots__ = ('count', 'price_sum', 'weight_sum', 'min_price', 'max_price',
+                 'min_price_per_gram', 'max_price_per_gram')
+
+    def __init__(self):
+        self.count = 0
+        self.price_sum = 0.0
+        self.weight_sum = 0.0
+        self.min_price = math.inf
+        self.max_price = -math.inf
+        self.min_price_per_gram = math.inf
+        self.max_price_per_gram = -math.inf
+
+    def add(self, price: float, weight: float):
+        self.count += 1
+        self.price_sum += price
+        self.weight_sum += weight
+        self.min_price = min(self.min_price, price)
+        self.max_price = max(self.max_price, price)
+        if weight:
+            price_per_gram = price / weight
+            self.min_price_per_gram = min(self.min_price_per_gram, price_per_gram)
+            self.max_price_per_gram = max(self.max_price_per_gram, price_per_gram)
+
+    def merge(self, other: 'CategoryStats'):
+        self.count += other.count
+        self.price_sum += other.price_sum
+        self.weight_sum += other.weight_sum
+        self.min_price = min(self.min_price, other.min_price)
+        self.max_price = max(self.max_price, other.max_price)
+        self.min_price_per_gram = min(self.min_price_per_gram, other.min_price_per_gram)
+        self.max_price_per_gram = max(self.max_price_per_gram, other.max_price_per_gram)
+
+    def to_dict(self, name: str, sorted_prices: Optional[array] = None) -> Dict[str, Any]:
+        """Итог в формате data/menu.json (name, count, avg/min/max) плюс ₽/г и квантили"""
+        if not self.count:
+            return {'name': name, 'count': 0}
+        result = {
+            'name': name,
+            'count': self.count,
+            'avg_price': round(self.price_sum / self.count, 2),
+            'min_price': self.min_price,
+            'max_price': self.max_price,
+            'avg_weight': round(self.weight_sum / self.count, 1),
+            # Средняя цена грамма по категории (сумма цен / сумма веса)
+            'price_per_gram': round(self.price_sum / self.weight_sum, 2) if self.weight_sum else None,
+            'min_price_per_gram': round(self.min_price_per_gram, 2) if self.weight_sum else None,
+            'max_price_per_gram': round(self.max_price_per_gram, 2) if self.weight_sum else None,
+        }
+        if sorted_prices:
+            result['price_quantiles'] = {
+                f"p{int(q * 100)}": price_quantile(sorted_prices, q) for q in PRICE_QUANTILES
+            }
+        return result
+
+
+def price_quantile(sorted_prices: array, q: float) -> float:
+    """Квантиль по уже отсортированным ценам (линейная интерполяция), O(1)"""
+    position = (len(sorted_prices) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_prices) - 1)
+    fraction = position - lower
+    return round(sorted_prices[lower] + (sorted_prices[upper] - sorted_prices[lower]) * fraction, 2)
+
+
+def file_category_stats(items: Iterable[Any]) -> Dict[str, CategoryStats]:
+    """Агрегаты позиций одного файла по категориям"""
+    stats: Dict[str, CategoryStats] = {}
+    for item in items:
+        category = item.get('category', 'Другое')
+        category_stats = stats.get(category)
+        if category_stats is None:
+            category_stats = stats[category] = CategoryStats()
+        category_stats.add(float(item.get('price', 0) or 0), float(item.get('weight', 0) or 0))
+    return stats
+
+
+class MenuStats:
+    """Готовая статистика снимка: категории и итоги по всему каталогу"""
+
+    def __init__(self, file_stats: Mapping[str, Mapping[str, CategoryStats]],
+                 category_prices: Mapping[str, array]):
+        merged: Dict[str, CategoryStats] = {}
+        totals = CategoryStats()
+        food_totals = CategoryStats()
+        for stats in file_stats.values():
+            for category, category_stats in stats.items():
+                merged.setdefault(category, CategoryStats()).merge(category_stats)
+                totals.merge(category_stats)
+                if category not in NON_FOOD_CATEGORIES:
+                    food_totals.merge(category_stats)
+
+        self.categories: Mapping[str, Dict[str, Any]] = MappingProxyType({
+            category: category_stats.to_dict(category, category_prices.get(category))
+            for category, category_stats in merged.items()
+        })
+        self.totals = totals.to_dict('Все категории')
+        self.food_totals = food_totals.to_dict('Блюда')
+        self.counts: Dict[str, int] = {category: stats['count'] for category, stats in self.categories.items()}
+
+    def category(self, category: str) -> Optional[Dict[str, Any]]:
+        """Статистика категории (None - категории нет)"""
+        return self.categories.get(category)
+
+    def price_range(self, category: str) -> Tuple[float, float]:
+        """Минимальная и максимальная цена категории"""
+        stats = self.categories.get(category) or {}
+        return stats.get('min_price', 0), stats.get('max_price', 0)
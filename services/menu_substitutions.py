@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Граф замен позиций меню для команд коррекции сметы
+Для каждой позиции при загрузке каталога заранее находятся ближайшие
+замены в той же роли: дешевле, дороже, без мяса и овощная. Кандидаты
+ранжируются по сходству текста и близости цены за грамм, и на каждый вид
+хранится несколько лучших: если первый запрещен диетой запроса, берется
+следующий. Коррекция сметы - один проход по строкам без обращения к Claude.
+"""
+
+import heapq
+import logging
+import math
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from services.menu_attributes import ANIMAL, ItemAttribute
+    from services.menu_composer import item_roles
+    from services.menu_index import MenuIndex
+    from services.menu_search import tokenize
+except ImportError:
+    from menu_attributes import ANIMAL, ItemAttribute
+    from menu_composer import item_roles
+    from menu_index import MenuIndex
+    from menu_search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Виды замен (ребра графа)
+SUBSTITUTION_KINDS = ('cheaper', 'pricier', 'non_meat', 'vegetable')
+
+# Команда CommandParser -> вид замены
+CORRECTION_KINDS = {
+    'make_cheaper': 'cheaper',
+    'make_premium': 'pricier',
+    'reduce_meat': 'non_meat',
+    'increase_vegetables': 'vegetable',
+}
+
+CORRECTION_EXPLANATIONS = {
+    'make_cheaper': "Заменил на бюджетные варианты",
+    'make_premium': "Обновил до премиум позиций",
+    'reduce_meat': "Уменьшил количество мясных блюд",
+    'increase_vegetables': "Добавил больше овощных блюд",
+}
+
+MEAT = ItemAttribute.MEAT | ItemAttribute.POULTRY | ItemAttribute.PORK
+
+# Кандидатов замены каждого вида на позицию (по убыванию оценки)
+SUBSTITUTE_CANDIDATES = 4
+
+# Сколько соседей по цене за грамм рассматривается с каждой стороны
+_NEIGHBOR_WINDOW = 12
+# Замена "дешевле/дороже" - разница цены за грамм не меньше 5%
+_MIN_PRICE_STEP = 0.05
+# Штраф за логарифм отношения цен за грамм (против сходства текста 0..1)
+_PRICE_DISTANCE_WEIGHT = 0.25
+# Доля строк сметы, которые "больше овощей" меняет на овощные
+_VEGETABLE_SHARE = 0.5
+
+
+def substitution_role(item: Dict[str, Any]) -> str:
+    """Роль для замен: основная роль составителя или категория"""
+    roles = item_roles(item)
+    return roles[0] if roles else item.get('category', 'Другое')
+
+
+def _price_per_gram(item: Dict[str, Any]) -> float:
+    return float(item.get('price') or 0) / max(1.0, float(item.get('weight') or 0))
+
+
+class SubstitutionGraph:
+    """Ближайшие замены для строк каталога (порядок строк - как в MenuColumns)"""
+
+    def __init__(self, items: Sequence[Dict[str, Any]], masks: Sequence[int]):
+        self.items = tuple(items)
+        self.masks = masks
+        self.row_by_id: Dict[Any, int] = {}
+        self.row_by_article: Dict[str, int] = {}
+        self.row_by_name: Dict[str, int] = {}
+        for row, item in enumerate(self.items):
+            self.row_by_id.setdefault(item.get('id'), row)
+            if item.get('article'):
+                self.row_by_article.setdefault(MenuIndex.normalize_article(item['article']), row)
+            self.row_by_name.setdefault((item.get('name') or '').lower(), row)
+
+        # Вид замены -> кандидаты строк: SUBSTITUTE_CANDIDATES ячеек на строку
+        # по убыванию оценки, -1 - кандидатов меньше
+        self.edges: Dict[str, array] = {
+            kind: array('l', [-1]) * (len(self.items) * SUBSTITUTE_CANDIDATES) for kind in SUBSTITUTION_KINDS
+        }
+
+        tokens = [frozenset(tokenize(f"{item.get('name', '')} {item.get('description', '')}")) for item in self.items]
+        prices = [_price_per_gram(item) for item in self.items]
+
+        role_rows: Dict[str, List[int]] = {}
+        for row, item in enumerate(self.items):
+            if item.get('price'):
+                role_rows.setdefault(substitution_role(item), []).append(row)
+
+        for rows in role_rows.values():
+            rows.sort(key=prices.__getitem__)
+            # Сеты с нераскрытым составом (MIXED) не считаются заменой без мяса
+            non_meat = [row for row in rows if not masks[row] & (MEAT | ItemAttribute.MIXED)]
+            non_meat_prices = [prices[row] for row in non_meat]
+            vegetable = [row for row in rows if not masks[row] & (ANIMAL | ItemAttribute.MIXED)]
+            vegetable_prices = [prices[row] for row in vegetable]
+
+            for position, row in enumerate(rows):
+                price = prices[row]
+                self._set_candidates('cheaper', row, self._ranked(
+                    row, rows[max(0, position - _NEIGHBOR_WINDOW):position], tokens, prices,
+                    lambda candidate: prices[candidate] <= price * (1 - _MIN_PRICE_STEP)
+                ))
+                self._set_candidates('pricier', row, self._ranked(
+                    row, rows[position + 1:position + 1 + _NEIGHBOR_WINDOW], tokens, prices,
+                    lambda candidate: prices[candidate] >= price * (1 + _MIN_PRICE_STEP)
+                ))
+                if masks[row] & MEAT:
+                    self._set_candidates('non_meat', row, self._ranked(
+                        row, self._near(non_meat, non_meat_prices, price), tokens, prices
+                    ))
+                if masks[row] & ANIMAL:
+                    self._set_candidates('vegetable', row, self._ranked(
+                        row, self._near(vegetable, vegetable_prices, price), tokens, prices
+                    ))
+
+        logger.debug("Граф замен: %d позиций, %d ролей", len(self.items), len(role_rows))
+
+    @staticmethod
+    def _near(rows: List[int], row_prices: List[float], price: float) -> List[int]:
+        """Соседи по цене за грамм из отсортированного списка строк"""
+        position = bisect_left(row_prices, price)
+        return rows[max(0, position - _NEIGHBOR_WINDOW):position + _NEIGHBOR_WINDOW]
+
+    @staticmethod
+    def _ranked(row: int, candidates: Iterable[int], tokens: List[frozenset], prices: List[float],
+                accept=None) -> List[int]:
+        """Лучшие кандидаты: сходство текста минус штраф за разницу цены за грамм"""
+        own_tokens, own_price = tokens[row], prices[row]
+        scored = []
+        for candidate in candidates:
+            if candidate == row or (accept is not None and not accept(candidate)):
+                continue
+            union = len(own_tokens | tokens[candidate])
+            similarity = len(own_tokens & tokens[candidate]) / union if union else 0.0
+            distance = abs(math.log(max(prices[candidate], 1e-6) / max(own_price, 1e-6)))
+            scored.append((similarity - _PRICE_DISTANCE_WEIGHT * distance, candidate))
+        best = heapq.nlargest(SUBSTITUTE_CANDIDATES, scored, key=lambda pair: pair[0])
+        return [candidate for _, candidate in best]
+
+    def _set_candidates(self, kind: str, row: int, targets: List[int]):
+        start = row * SUBSTITUTE_CANDIDATES
+        self.edges[kind][start:start + len(targets)] = array('l', targets)
+
+    def candidates(self, row: int, kind: str) -> List[int]:
+        """Строки-замены вида kind для строки каталога, лучшие первыми"""
+        start = row * SUBSTITUTE_CANDIDATES
+        return [target for target in self.edges[kind][start:start + SUBSTITUTE_CANDIDATES] if target >= 0]
+
+    def find_row(self, line: Dict[str, Any]) -> Optional[int]:
+        """Строка каталога для строки сметы: по ID, артикулу (сметы Claude), иначе по названию"""
+        row = self.row_by_id.get(line.get('id'))
+        if row is None and line.get('article'):
+            row = self.row_by_article.get(MenuIndex.normalize_article(str(line['article'])))
+        if row is None:
+            row = self.row_by_name.get((line.get('name') or '').lower())
+        return row
+
+    def substitute(self, item_id: Any, kind: str, forbidden: int = 0) -> Optional[Dict[str, Any]]:
+        """Лучшая замена позиции заданного вида, разрешенная диетой (None - замены нет)"""
+        row = self.row_by_id.get(item_id)
+        if row is None:
+            return None
+        for target in self.candidates(row, kind):
+            if not self.masks[target] & forbidden:
+                return self.items[target]
+        return None
+
+    def apply_correction(self, lines: Sequence[Dict[str, Any]], command_type: str,
+                         forbidden: int = 0) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str]]]:
+        """Коррекция строк сметы за один проход
+
+        Замена сохраняет граммовку строки (количество пересчитывается по весу
+        новой позиции) и не нарушает диету (forbidden - маска запрещенных
+        атрибутов). Возвращает новые строки и пары замен (было, стало).
+        Строки, которых нет в каталоге, остаются как есть.
+        """
+        kind = CORRECTION_KINDS.get(command_type)
+        if kind is None:
+            return [dict(line) for line in lines], []
+
+        vegetable_budget = math.ceil(len(lines) * _VEGETABLE_SHARE)
+        taken = {self.find_row(line) for line in lines}
+        corrected, changes = [], []
+
+        for line in lines:
+            line = dict(line)
+            row = self.find_row(line)
+            target = -1
+            if row is not None and not (kind == 'vegetable' and vegetable_budget <= 0):
+                # Первый кандидат, разрешенный диетой и еще не стоящий в смете
+                target = next((candidate for candidate in self.candidates(row, kind)
+                               if candidate not in taken and not self.masks[candidate] & forbidden), -1)
+
+            if target >= 0:
+                item = self.items[row]
+                substitute = self.items[target]
+                quantity = line.get('quantity') or 1
+                grams = quantity * (line.get('weight') or item.get('weight') or 0)
+                new_quantity = max(1, round(grams / substitute['weight'])) if grams else quantity
+
+                replaced = {key: value for key, value in line.items()
+                            if key not in ('total_cost', 'total_weight', 'weight_per_person')}
+                replaced.update(substitute.copy())
+                replaced['quantity'] = new_quantity
+                replaced['total_weight'] = new_quantity * substitute.get('weight', 0)
+                replaced['total_cost'] = new_quantity * substitute.get('price', 0)
+                corrected.append(replaced)
+                changes.append((item.get('name', ''), substitute.get('name', '')))
+                taken.add(target)
+                if kind == 'vegetable':
+                    vegetable_budget -= 1
+                continue
+
+            # Мясное без замены - уменьшаем порции вдвое
+            if kind == 'non_meat' and row is not None and self.masks[row] & MEAT \
+                    and (line.get('quantity') or 0) > 1:
+                line['quantity'] = max(1, line['quantity'] // 2)
+                if 'total_cost' in line:
+                    line['total_cost'] = line['quantity'] * line.get('price', 0)
+                if 'total_weight' in line:
+                    line['total_weight'] = line['quantity'] * line.get('weight', 0)
+                changes.append((line.get('name', ''), f"{line.get('name', '')} ×{line['quantity']}"))
+            corrected.append(line)
+
+        return corrected, changes
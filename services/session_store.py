@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сессии диалогов по чатам (пользователям)
+У каждого чата своя текущая смета, память сессии и ограниченная история
+коррекций. Хранилище вытесняет сессии по TTL и LRU, держит оценку памяти
+под лимитом и может сохранять снимок на диск, чтобы диалоги переживали
+перезапуск бота.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field, is_dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Сессия без активности дольше TTL удаляется, секунды
+DEFAULT_SESSION_TTL = 6 * 3600
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_SESSIONS_MAX_MB = 64
+# Коррекций и смет в истории одной сессии
+MAX_CORRECTION_HISTORY = 20
+MAX_SESSION_ESTIMATES = 20
+# Снимок на диск не чаще, чем раз в столько секунд
+_SNAPSHOT_INTERVAL = 60.0
+
+
+def _json_default(value: Any) -> Any:
+    if is_dataclass(value):
+        return asdict(value)
+    if isinstance(value, (set, frozenset, tuple, deque)):
+        return list(value)
+    return str(value)
+
+
+@dataclass
+class ChatSession:
+    """Состояние диалога одного чата"""
+    chat_id: Any
+    started_at: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.time)
+    # Текущая смета Claude (для команд коррекции)
+    current_estimate: Optional[Dict[str, Any]] = None
+    # Последняя смета SuperAIAgent: параметры, позиции, версия меню
+    last_estimate: Optional[Dict[str, Any]] = None
+    memory: Dict[str, Any] = field(default_factory=dict)
+    estimates_created: Deque[str] = field(default_factory=lambda: deque(maxlen=MAX_SESSION_ESTIMATES))
+    correction_history: Deque[Any] = field(default_factory=lambda: deque(maxlen=MAX_CORRECTION_HISTORY))
+    # Оценка занимаемой памяти (длина JSON), обновляется SessionStore.update
+    size: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Поля сессии для JSON (сметы не копируются; прочее - через _json_default)"""
+        data = {name: getattr(self, name) for name in self.__dataclass_fields__ if name != 'size'}
+        data['estimates_created'] = list(self.estimates_created)
+        data['correction_history'] = list(self.correction_history)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ChatSession':
+        session = cls(data['chat_id'])
+        session.started_at = data.get('started_at', session.started_at)
+        session.last_active = data.get('last_active', session.last_active)
+        session.current_estimate = data.get('current_estimate')
+        session.last_estimate = data.get('last_estimate')
+        session.memory = data.get('memory') or {}
+        session.estimates_created.extend(data.get('estimates_created') or ())
+        session.correction_history.extend(data.get('correction_history') or ())
+        return session
+
+
+class SessionStore:
+    """Потокобезопасное хранилище сессий с TTL, LRU и лимитом памяти"""
+
+    def __init__(self, ttl: float = DEFAULT_SESSION_TTL, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 max_bytes: int = DEFAULT_SESSIONS_MAX_MB << 20, snapshot_path: Optional[Path] = None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.expired = 0
+        self.evicted = 0
+        # Сессии от давно не активных к недавним
+        self._sessions: 'OrderedDict[Hashable, ChatSession]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._last_snapshot = time.monotonic()
+
+        if self.snapshot_path:
+            self._load()
+
+    def get(self, chat_id: Hashable, create: bool = True) -> Optional[ChatSession]:
+        """Сессия чата (истекшая начинается заново); продлевает TTL"""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(chat_id)
+            if session is not None and now - session.last_active > self.ttl:
+                self._remove(chat_id)
+                self.expired += 1
+                session = None
+            if session is None:
+                if not create:
+                    return None
+                session = ChatSession(chat_id)
+                self._sessions[chat_id] = session
+            else:
+                self._sessions.move_to_end(chat_id)
+            session.last_active = now
+            return session
+
+    def update(self, session: ChatSession):
+        """Учет изменений сессии: пересчет размера и вытеснение сверх лимитов"""
+        with self._lock:
+            if self._sessions.get(session.chat_id) is not session:
+                return
+            # Сериализация под блокировкой, как в save(): to_dict не копирует память и сметы
+            size = len(json.dumps(session.to_dict(), ensure_ascii=False, default=_json_default))
+            self._bytes += size - session.size
+            session.size = size
+            self._enforce_limits(keep=session.chat_id)
+        if self.snapshot_path and time.monotonic() - self._last_snapshot >= _SNAPSHOT_INTERVAL:
+            self.save()
+
+    def discard(self, chat_id: Hashable):
+        with self._lock:
+            self._remove(chat_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _remove(self, chat_id: Hashable):
+        session = self._sessions.pop(chat_id, None)
+        if session is not None:
+            self._bytes -= session.size
+
+    def _enforce_limits(self, keep: Hashable = None):
+        """Истекшие сессии, затем самые давние сверх числа и памяти"""
+        now = time.time()
+        while self._sessions:
+            chat_id, session = next(iter(self._sessions.items()))
+            if now - session.last_active <= self.ttl:
+                break
+            self._remove(chat_id)
+            self.expired += 1
+
+        while len(self._sessions) > self.max_sessions or (self._bytes > self.max_bytes and len(self._sessions) > 1):
+            chat_id = next(iter(self._sessions))
+            if chat_id == keep:
+                self._sessions.move_to_end(chat_id)
+                chat_id = next(iter(self._sessions))
+            self._remove(chat_id)
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'memory_kb': round(self._bytes / 1024, 1),
+                'max_memory_kb': self.max_bytes >> 10,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
+
+    def save(self):
+        """Атомарная запись снимка активных сессий в JSON"""
+        if not self.snapshot_path:
+            return
+        # Сериализация под блокировкой: to_dict не копирует сметы сессий
+        with self._lock:
+            self._enforce_limits()
+            count = len(self._sessions)
+            text = json.dumps([session.to_dict() for session in self._sessions.values()],
+                              ensure_ascii=False, default=_json_default)
+            self._last_snapshot = time.monotonic()
+
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.snapshot_path.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_file, self.snapshot_path)
+            logger.info(f"💾 Сессии сохранены: {count}")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить сессии: {e}")
+
+    def _load(self):
+        if not self.snapshot_path.exists():
+            return
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            for data in sorted(payload, key=lambda data: data.get('last_active', 0)):
+                session = ChatSession.from_dict(data)
+                session.size = len(json.dumps(data, ensure_ascii=False))
+                self._sessions[session.chat_id] = session
+                self._bytes += session.size
+            self._enforce_limits()
+            logger.info(f"⚡ Сессии загружены: {len(self._sessions)}")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прочитать сессии {self.snapshot_path}: {e}")
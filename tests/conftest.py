@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Общие фикстуры тестов: каталог из menu_files без кэша на диске
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from menu_service_table_format import MenuService  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def menu_service():
+    """MenuService на меню репозитория (общий для тестов, только чтение)"""
+    service = MenuService(str(ROOT / "menu_files"), cache_dir=None, parse_workers=1)
+    assert service.menu_items, "меню из menu_files не загрузилось"
+    return service
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Цикл инструментов каталога на заглушке модели
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+from services.claude_menu_tools import MenuToolExecutor, run_tool_loop
+
+
+class StubModel:
+    """Заглушка модели: вызывает инструменты по сценарию, затем отвечает JSON
+    со сметой из позиций, найденных инструментами"""
+
+    def __init__(self, script: List[List[Tuple[str, Dict[str, Any]]]]):
+        self.script = script
+        self.requests: List[List[Dict[str, Any]]] = []
+
+    async def create_message(self, messages, model, max_tokens, temperature, timeout=None, **kwargs):
+        self.requests.append(list(messages))
+        step = len(self.requests) - 1
+        if step < len(self.script):
+            content = [
+                SimpleNamespace(type='tool_use', id=f"toolu_{step}_{i}", name=name, input=tool_input)
+                for i, (name, tool_input) in enumerate(self.script[step])
+            ]
+            return SimpleNamespace(content=content, stop_reason='tool_use')
+
+        found = [
+            item for block in tool_results(messages) if not block.get('is_error')
+            for item in json.loads(block['content']).get('items', [])
+        ]
+        estimate = {
+            'items': [{'article': item['article'], 'name': item['name'], 'quantity': 10, 'price': item['price']}
+                      for item in found[:3]]
+        }
+        text = json.dumps(estimate, ensure_ascii=False)
+        return SimpleNamespace(content=[SimpleNamespace(type='text', text=text)], stop_reason='end_turn')
+
+
+def tool_results(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        block for message in messages if message['role'] == 'user' and isinstance(message['content'], list)
+        for block in message['content'] if block.get('type') == 'tool_result'
+    ]
+
+
+def run_loop(model: StubModel, executor: MenuToolExecutor, **kwargs) -> str:
+    messages = [{'role': 'user', 'content': 'Фуршет 20 человек'}]
+    return asyncio.run(run_tool_loop(model, messages, executor, 'stub', 1000, 0.0, **kwargs))
+
+
+SCRIPT = [
+    [('list_categories', {}), ('search_menu', {'query': 'брускетта', 'limit': 3})],
+    [('search_menu', {'query': 'брускетта', 'limit': 3}),
+     ('find_by_price', {'max_price': 200, 'diet': 'вегетарианское меню', 'limit': 5})],
+]
+
+
+def test_repeated_call_is_served_from_cache(menu_service):
+    model = StubModel(SCRIPT)
+    executor = MenuToolExecutor(menu_service)
+
+    run_loop(model, executor)
+
+    assert len(model.requests) == 3
+    assert executor.calls == 3
+    assert executor.cache_hits == 1
+    first, repeated = [block['content'] for block in tool_results(model.requests[-1])
+                       if block['tool_use_id'] in ('toolu_0_1', 'toolu_1_0')]
+    assert first == repeated
+
+
+def test_returned_articles_exist_in_catalog(menu_service):
+    text = run_loop(StubModel(SCRIPT), MenuToolExecutor(menu_service))
+
+    lines = json.loads(text)['items']
+    assert lines
+    for line in lines:
+        item = menu_service.get_item_by_article(line['article'])
+        assert item is not None, line
+        assert item['price'] == line['price']
+
+
+def test_vegetarian_price_search_respects_diet_and_price(menu_service):
+    result, is_error = MenuToolExecutor(menu_service).run(
+        'find_by_price', {'max_price': 200, 'diet': 'вегетарианское меню', 'limit': 30}
+    )
+
+    assert not is_error
+    vegetarian = {item['article'] for item in menu_service.get_diet_items(['вегетарианское меню'])}
+    items = json.loads(result)['items']
+    assert items
+    assert all(item['article'] in vegetarian and item['price'] <= 200 for item in items)
+
+
+def test_loop_stops_after_max_rounds(menu_service):
+    endless = StubModel([[('list_categories', {})]] * 10)
+    executor = MenuToolExecutor(menu_service)
+
+    run_loop(endless, executor, max_rounds=3)
+
+    assert len(endless.requests) == 3
+    # Инструменты последнего раунда не выполняются: их результаты модель уже не увидит
+    assert executor.calls + executor.cache_hits == 2
+    last_results = endless.requests[-1][-1]['content']
+    assert last_results[-1]['type'] == 'text' and 'Лимит' in last_results[-1]['text']
+
+
+def test_unknown_tool_is_reported_as_error(menu_service):
+    executor = MenuToolExecutor(menu_service)
+
+    result, is_error = executor.run('unknown_tool', {})
+
+    assert is_error
+    assert 'unknown_tool' in json.loads(result)['error']
+    assert executor.calls == 0
+
+
+def test_unknown_tool_error_reaches_model(menu_service):
+    model = StubModel([[('unknown_tool', {}), ('search_menu', {'query': 'брускетта'})]])
+
+    text = run_loop(model, MenuToolExecutor(menu_service))
+
+    errors = [block for block in tool_results(model.requests[-1]) if block.get('is_error')]
+    assert [block['tool_use_id'] for block in errors] == ['toolu_0_0']
+    assert json.loads(text)['items']
+
+
+def test_invalid_tool_input_is_an_error(menu_service):
+    executor = MenuToolExecutor(menu_service)
+
+    assert executor.run('search_menu', {'query': ' '})[1]
+    assert executor.run('find_by_price', {'diet': 'лунное меню'})[1]
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AsyncClaudeTransport против локальной заглушки Messages API
+"""
+
+import asyncio
+import time
+
+import anthropic
+
+from services.claude_transport import AsyncClaudeTransport
+
+RESPONSE_BODY = (
+    b'{"id":"msg_stub","type":"message","role":"assistant","model":"stub",'
+    b'"content":[{"type":"text","text":"{\\"ok\\": true}"}],'
+    b'"stop_reason":"end_turn","stop_sequence":null,'
+    b'"usage":{"input_tokens":1,"output_tokens":1}}'
+)
+ERROR_BODY = b'{"type":"error","error":{"type":"api_error","message":"stub failure"}}'
+
+
+class StubServer:
+    """Заглушка Messages API: отвечает через delay секунд, первые failures
+    запросов - ошибкой 500; считает соединения и одновременные запросы"""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._server = None
+
+    async def __aenter__(self) -> str:
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        return f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+
+    async def __aexit__(self, *exc_info):
+        self._server.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                headers = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in headers.split(b'\r\n'):
+                    if line.lower().startswith(b'content-length:'):
+                        length = int(line.split(b':', 1)[1])
+                await reader.readexactly(length)
+
+                self.requests += 1
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                try:
+                    await asyncio.sleep(self.delay)
+                finally:
+                    self.in_flight -= 1
+
+                if self.requests <= self.failures:
+                    status, body, extra = b'500 Internal Server Error', ERROR_BODY, b'retry-after-ms: 10\r\n'
+                else:
+                    status, body, extra = b'200 OK', RESPONSE_BODY, b''
+                writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Type: application/json\r\n' + extra +
+                             b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def complete_all(server: StubServer, requests: int, **options):
+    """requests одновременных вызовов complete; результаты и статистика транспорта"""
+
+    async def scenario():
+        async with server as base_url:
+            transport = AsyncClaudeTransport('stub-key', base_url=base_url, **options)
+            try:
+                results = await asyncio.gather(*(
+                    transport.complete(f"запрос {i}", 'stub', 16, 0.0) for i in range(requests)
+                ), return_exceptions=True)
+            finally:
+                await transport.aclose()
+            return results, transport.get_stats()
+
+    return asyncio.run(scenario())
+
+
+def test_connections_are_reused_from_pool():
+    server = StubServer(delay=0.01)
+
+    results, stats = complete_all(server, 40, max_concurrency=4, max_connections=4)
+
+    assert results == ['{"ok": true}'] * 40
+    assert stats['calls'] == 40
+    # 40 запросов прошли по соединениям пула, а не по новому на каждый
+    assert server.connections <= 4
+
+
+def test_concurrency_is_capped_by_semaphore():
+    server = StubServer(delay=0.05)
+
+    results, stats = complete_all(server, 30, max_concurrency=5, max_connections=20)
+
+    assert all(result == '{"ok": true}' for result in results)
+    assert server.max_in_flight == 5
+    assert stats['max_in_flight'] == 5
+    assert stats['in_flight'] == 0
+
+
+def test_burst_runs_concurrently():
+    server = StubServer(delay=0.1)
+
+    started = time.perf_counter()
+    results, stats = complete_all(server, 50, max_concurrency=50, max_connections=50)
+    elapsed = time.perf_counter() - started
+
+    assert stats['calls'] == 50 and stats['errors'] == 0
+    # Последовательно - 5 с; одновременно - порядка одной задержки
+    assert elapsed < 50 * 0.1 / 5
+
+
+def test_timeout_is_counted_and_raised():
+    server = StubServer(delay=1.0)
+
+    results, stats = complete_all(server, 1, timeout=0.2, max_retries=0)
+
+    assert isinstance(results[0], anthropic.APITimeoutError)
+    assert stats['timeouts'] == 1
+    assert stats['calls'] == 0 and stats['errors'] == 0
+
+
+def test_server_error_is_retried_by_sdk():
+    server = StubServer(failures=1)
+
+    results, stats = complete_all(server, 1, max_retries=2)
+
+    assert results == ['{"ok": true}']
+    assert server.requests == 2
+    assert stats['calls'] == 1 and stats['errors'] == 0
+
+
+def test_error_after_retries_is_counted():
+    server = StubServer(failures=10)
+
+    results, stats = complete_all(server, 1, max_retries=1)
+
+    assert isinstance(results[0], anthropic.InternalServerError)
+    assert server.requests == 2
+    assert stats['errors'] == 1 and stats['calls'] == 0
+
+
+def test_timeout_is_retried_by_sdk():
+    server = StubServer(delay=0.5)
+
+    results, stats = complete_all(server, 1, timeout=0.1, max_retries=1)
+
+    assert isinstance(results[0], anthropic.APITimeoutError)
+    assert server.requests == 2
+    assert stats['timeouts'] == 1
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Команды коррекции сметы: распознавание, замены по графу и пересчет цен
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.claude_api_service import CommandParser
+from services.intelligent_manager_assistant import SuperAIAgent
+from services.menu_attributes import ItemAttribute, diet_restrictions
+from services.menu_substitutions import MEAT, SubstitutionGraph
+
+VEGETARIAN = ['вегетарианское меню']
+
+
+@pytest.mark.parametrize('message, command_type', [
+    ("подешевле", 'make_cheaper'),
+    ("Сделайте подешевле, пожалуйста!", 'make_cheaper'),
+    ("а можно подороже?", 'make_premium'),
+    ("премиум", 'make_premium'),
+    ("меньше мяса", 'reduce_meat'),
+    ("добавь овощи", 'increase_vegetables'),
+])
+def test_commands_are_recognized(message, command_type):
+    assert CommandParser.parse_command(message)[0] == command_type
+
+
+@pytest.mark.parametrize('message', [
+    "банкет на 30 человек, не дороже 1500 на человека",
+    "премиум фуршет на 50 гостей",
+    "не дороже",
+    "фуршет 20 человек подешевле",
+    "кофе-брейк дешевле 500 за персону",
+    "подешевле, на 15 марта",
+    "а что дороже всего в меню?",
+])
+def test_briefs_and_negations_are_not_commands(message):
+    assert CommandParser.parse_command(message)[0] == 'unknown'
+
+
+@pytest.fixture
+def agent(menu_service):
+    claude_service = SimpleNamespace(command_parser=CommandParser())
+    return SuperAIAgent(claude_service, menu_service, None)
+
+
+def route(agent, monkeypatch, message):
+    """Какой обработчик SuperAIAgent получает сообщение чата с прошлой сметой"""
+    session = agent.sessions.get(1)
+    session.last_estimate = {'params': {}, 'items': [], 'composed': None}
+    handled = []
+
+    async def apply_correction(command_type, user_info):
+        handled.append(('correction', command_type))
+        return ""
+
+    async def create_smart_estimate(params, user_info):
+        handled.append(('estimate', params['guest_count']))
+        return ""
+
+    monkeypatch.setattr(agent, '_apply_correction', apply_correction)
+    monkeypatch.setattr(agent, '_create_smart_estimate', create_smart_estimate)
+    asyncio.run(agent._process_super_request(message, {'id': 1}))
+    return handled
+
+
+def test_new_brief_after_estimate_creates_estimate(agent, monkeypatch):
+    handled = route(agent, monkeypatch, "банкет на 30 человек, не дороже 1500 на человека")
+
+    assert handled == [('estimate', 30)]
+
+
+def test_command_after_estimate_corrects_it(agent, monkeypatch):
+    handled = route(agent, monkeypatch, "подешевле")
+
+    assert handled == [('correction', 'make_cheaper')]
+
+
+def line_for(item, quantity=10, **overrides):
+    line = {
+        'id': item['id'], 'article': item.get('article'), 'name': item['name'],
+        'price': item['price'], 'weight': item['weight'], 'quantity': quantity,
+        'total_cost': quantity * item['price'], 'total_weight': quantity * item['weight'],
+    }
+    line.update(overrides)
+    return line
+
+
+def items_with_edge(menu_service, kind, mask=0):
+    graph = menu_service.snapshot.substitutions
+    return [item for row, item in enumerate(graph.items)
+            if graph.candidates(row, kind) and graph.masks[row] & mask == mask]
+
+
+def test_make_cheaper_keeps_grams_and_lowers_cost(menu_service):
+    item = items_with_edge(menu_service, 'cheaper')[0]
+    line = line_for(item)
+
+    corrected, changes = menu_service.apply_correction([line], 'make_cheaper')
+
+    substitute = corrected[0]
+    assert changes == [(item['name'], substitute['name'])]
+    assert substitute['price'] / substitute['weight'] < item['price'] / item['weight']
+    assert abs(substitute['total_weight'] - line['total_weight']) <= substitute['weight']
+    assert substitute['total_cost'] == substitute['quantity'] * substitute['price']
+    # Исходные строки не меняются
+    assert line == line_for(item)
+
+
+def test_reduce_meat_respects_diet(menu_service):
+    graph = menu_service.snapshot.substitutions
+    lines = [line_for(item) for item in items_with_edge(menu_service, 'non_meat', MEAT)]
+    forbidden = diet_restrictions(VEGETARIAN)
+
+    corrected, _ = menu_service.apply_correction(lines, 'reduce_meat', special_requests=VEGETARIAN)
+
+    for original, line in zip(lines, corrected):
+        if line['id'] != original['id']:
+            assert not graph.masks[graph.find_row(line)] & forbidden, line['name']
+
+
+def test_diet_skips_to_next_ranked_substitute(menu_service):
+    graph = menu_service.snapshot.substitutions
+    forbidden = diet_restrictions(VEGETARIAN)
+    # Мясная позиция, у которой лучшая замена без мяса - рыба, но есть вегетарианская
+    row, allowed = next(
+        (row, next(target for target in graph.candidates(row, 'non_meat') if not graph.masks[target] & forbidden))
+        for row in range(len(graph.items))
+        if graph.masks[row] & MEAT and graph.candidates(row, 'non_meat')
+        and graph.masks[graph.candidates(row, 'non_meat')[0]] & forbidden
+        and any(not graph.masks[target] & forbidden for target in graph.candidates(row, 'non_meat'))
+    )
+    item = graph.items[row]
+
+    corrected, changes = menu_service.apply_correction([line_for(item)], 'reduce_meat', special_requests=VEGETARIAN)
+
+    assert corrected[0]['id'] == graph.items[allowed]['id']
+    assert changes == [(item['name'], graph.items[allowed]['name'])]
+    assert graph.substitute(item['id'], 'non_meat', forbidden) is graph.items[allowed]
+
+
+def test_sets_of_unknown_content_are_not_meat_free_substitutes():
+    items = [
+        {'id': 1, 'name': "Канапе с говядиной", 'category': "Канапе", 'price': 150, 'weight': 30},
+        {'id': 2, 'name': "Канапе ассорти", 'category': "Канапе", 'price': 140, 'weight': 30},
+        {'id': 3, 'name': "Канапе с сыром", 'category': "Канапе", 'price': 120, 'weight': 30},
+    ]
+    masks = [int(ItemAttribute.MEAT), int(ItemAttribute.MIXED), int(ItemAttribute.DAIRY)]
+
+    graph = SubstitutionGraph(items, masks)
+
+    assert graph.candidates(0, 'non_meat') == [2]
+    assert graph.candidates(0, 'vegetable') == [2]
+
+
+def test_correction_finds_lines_by_article(menu_service):
+    item = items_with_edge(menu_service, 'cheaper')[0]
+    line = {'article': item['article'].lower(), 'name': "Название от Claude", 'quantity': 5,
+            'price': item['price'], 'weight': item['weight']}
+
+    corrected, changes = menu_service.apply_correction([line], 'make_cheaper')
+
+    assert changes and corrected[0]['id'] != item['id']
+
+
+def test_unknown_command_changes_nothing(menu_service):
+    lines = [line_for(items_with_edge(menu_service, 'cheaper')[0])]
+
+    corrected, changes = menu_service.apply_correction(lines, 'unknown')
+
+    assert corrected == lines and changes == []
+
+
+def test_estimate_from_other_menu_content_is_repriced(agent, monkeypatch):
+    menu_service = agent.menu_service
+    item = items_with_edge(menu_service, 'cheaper')[0]
+    # После перезапуска номер версии совпадает, а содержимое меню - другое
+    agent.sessions.get(1).last_estimate = {
+        'params': {}, 'items': [line_for(item, price=1)], 'composed': True,
+        'menu_version': menu_service.menu_version, 'menu_fingerprint': "прежнее меню"
+    }
+    repriced = []
+    monkeypatch.setattr(menu_service, 'reprice_lines', lambda lines: repriced.append(lines) or lines)
+    monkeypatch.setattr(agent, '_calculate', lambda *args: {})
+    monkeypatch.setattr(agent, '_finish_estimate_response', lambda *args: "")
+
+    asyncio.run(agent._apply_correction('make_cheaper', {'id': 1}))
+
+    assert repriced
+    assert agent.sessions.get(1).last_estimate['menu_fingerprint'] == menu_service.menu_fingerprint
+
+
+def test_reprice_lines_uses_current_prices(menu_service):
+    item = menu_service.menu_items[0]
+    stale = line_for(item, quantity=4, price=1, weight=1, total_cost=4, total_weight=4)
+    by_article = {'article': item['article'], 'name': item['name'], 'quantity': 2, 'price': 1}
+    missing = {'id': 'нет в каталоге', 'name': "Снятое блюдо", 'quantity': 3, 'price': 99, 'total_cost': 297}
+
+    repriced = menu_service.reprice_lines([stale, by_article, missing])
+
+    assert repriced[0]['price'] == item['price'] and repriced[0]['weight'] == item['weight']
+    assert repriced[0]['quantity'] == 4
+    assert repriced[0]['total_cost'] == 4 * item['price']
+    assert repriced[0]['total_weight'] == 4 * item['weight']
+    assert repriced[1]['price'] == item['price'] and 'total_cost' not in repriced[1]
+    assert repriced[2] == missing
+    assert stale['price'] == 1
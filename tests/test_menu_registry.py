@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MenuRegistry: загрузка каталогов филиалов, LRU-выгрузка, холодный филиал
+"""
+
+import asyncio
+import threading
+import time
+
+from services.menu_registry import MenuRegistry, _SNAPSHOT_BYTES_PER_ITEM
+
+
+class FakeMenuService:
+    """Каталог филиала: items позиций, загрузка ждет события филиала"""
+
+    def __init__(self, menu_files_dir, item_pool=None, versions=None, items=10, gates=None):
+        gate = (gates or {}).get(menu_files_dir)
+        if gate is not None:
+            gate.wait(5)
+        self.menu_files_dir = menu_files_dir
+        self.menu_items = [{'id': i} for i in range(items)]
+        self.stopped = False
+
+    def start_watcher(self, interval):
+        pass
+
+    def stop_watcher(self):
+        self.stopped = True
+
+
+def make_registry(**kwargs):
+    branches = {'центр': 'center', 'север': 'north', 'юг': 'south'}
+    return MenuRegistry(branches, FakeMenuService, **kwargs)
+
+
+def test_branch_is_loaded_once_and_cached():
+    registry = make_registry()
+
+    service = registry.get('Центр')
+
+    assert registry.get('центр') is service
+    assert registry.loads == 1
+
+
+def test_least_recently_used_branch_is_evicted():
+    registry = make_registry(max_bytes=2 * 10 * _SNAPSHOT_BYTES_PER_ITEM)
+    center = registry.get('центр')
+    registry.get('север')
+    registry.get('центр')
+
+    registry.get('юг')
+
+    assert registry.loaded_branches() == ['центр', 'юг']
+    assert registry.evictions == 1
+    assert not center.stopped
+
+
+def test_cold_branch_does_not_block_loaded_branches():
+    gates = {'north': threading.Event()}
+    registry = make_registry(gates=gates)
+    registry.get('центр')
+    loader = threading.Thread(target=registry.get, args=('север',))
+    loader.start()
+    time.sleep(0.05)
+
+    started = time.perf_counter()
+    registry.get('центр')
+    registry.get('юг')
+    elapsed = time.perf_counter() - started
+
+    gates['north'].set()
+    loader.join()
+    assert elapsed < 1
+    assert registry.loaded_branches() == ['центр', 'юг', 'север']
+
+
+def test_concurrent_requests_load_branch_once():
+    gates = {'north': threading.Event()}
+    registry = make_registry(gates=gates)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get('север'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    gates['north'].set()
+    for thread in threads:
+        thread.join()
+
+    assert registry.loads == 1
+    assert len({id(service) for service in results}) == 1
+
+
+def test_preload_keeps_event_loop_running():
+    gates = {'north': threading.Event()}
+    registry = make_registry(gates=gates)
+
+    async def scenario():
+        ticks = 0
+        preload = asyncio.create_task(registry.preload('север'))
+        while ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        gates['north'].set()
+        return ticks, await preload
+
+    ticks, service = asyncio.run(scenario())
+
+    assert ticks == 5
+    assert service is registry.get('север')
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Похожие блюда: соседи по TF-IDF и консультация "что похожее на ..."
+"""
+
+import asyncio
+
+from services.intelligent_manager_assistant import SuperAIAgent
+from services.menu_similarity import MenuSimilarityIndex
+
+
+def test_neighbors_exclude_the_item_itself():
+    items = [
+        {'id': 1, 'name': "Брускетта с лососем", 'description': "лосось сливочный сыр"},
+        # Та же позиция из другого файла меню
+        {'id': 1, 'name': "Брускетта с лососем", 'description': "лосось сливочный сыр"},
+        {'id': 2, 'name': "Брускетта с ростбифом", 'description': "ростбиф руккола"},
+        {'id': 3, 'name': "Тарталетка с лососем", 'description': "лосось икра"},
+    ]
+
+    similar_ids = [item['id'] for item, _ in MenuSimilarityIndex(items).similar(1, 5)]
+
+    assert sorted(similar_ids) == [2, 3]
+
+
+def test_similar_items_are_ranked_by_similarity(menu_service):
+    dish = menu_service.search_items("брускетта", 1)[0]
+
+    similar = menu_service.get_similar_items(dish['id'], 5)
+
+    assert similar and dish['id'] not in {item['id'] for item in similar}
+    scores = [item['similarity'] for item in similar]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_consultation_does_not_offer_the_dish_as_its_own_alternative(menu_service):
+    agent = SuperAIAgent(None, menu_service, None)
+    dish = menu_service.search_items("брускетта", 1)[0]
+
+    title, items, source = agent._consultation_items({}, "что похожее на брускетту")
+    response = asyncio.run(agent._provide_menu_consultation({}, "что похожее на брускетту"))
+
+    assert source['id'] == dish['id'] and dish['name'] in title
+    assert items and dish['id'] not in {item['id'] for item in items}
+    body = response.split(title, 1)[1]
+    assert f"**{dish['name']}**" not in body and f"{dish['name']} (" not in body
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Снимки каталога: подмена при перезагрузке, закрепление за запросом, стабильные ID
+"""
+
+import shutil
+
+import pytest
+
+from menu_service_table_format import MenuService
+from services.menu_index import resolve_id_collisions
+from services.menu_item import MenuItem
+
+
+@pytest.fixture
+def menu_dir(tmp_path, menu_service):
+    target = tmp_path / "menu_files"
+    shutil.copytree(menu_service.menu_files_dir, target)
+    return target
+
+
+def reprice_first_line(menu_dir, service):
+    """Меняет цену первой позиции в ее файле, возвращает позицию до правки"""
+    item = service.menu_items[0]
+    for path in menu_dir.glob("*.txt"):
+        text = path.read_text(encoding='utf-8')
+        if item['name'] in text:
+            line = next(line for line in text.splitlines() if item['name'] in line)
+            path.write_text(text.replace(line, line.replace(str(int(item['price'])), str(int(item['price']) + 7), 1)),
+                            encoding='utf-8')
+            return item
+    pytest.fail("позиция не найдена в файлах меню")
+
+
+def test_reload_swaps_snapshot_and_pinned_request_keeps_old(menu_dir):
+    service = MenuService(str(menu_dir), cache_dir=None, parse_workers=1)
+    version, fingerprint = service.menu_version, service.menu_fingerprint
+
+    with service.pin() as pinned:
+        item = reprice_first_line(menu_dir, service)
+        service.reload_menu()
+        # Запрос, начатый до перезагрузки, дочитывает прежний снимок
+        assert service.snapshot is pinned
+        assert service.get_item_by_article(item['article'])['price'] == item['price']
+
+    assert service.menu_version > version
+    assert service.menu_fingerprint != fingerprint
+    assert service.get_item_by_article(item['article'])['price'] == item['price'] + 7
+    # ID позиции не зависит от версии меню
+    assert service.get_item_by_article(item['article'])['id'] == item['id']
+
+
+def test_same_files_give_same_fingerprint_and_ids(menu_service):
+    other = MenuService(str(menu_service.menu_files_dir), cache_dir=None, parse_workers=1)
+
+    assert other.menu_fingerprint == menu_service.menu_fingerprint
+    assert [item['id'] for item in other.menu_items] == [item['id'] for item in menu_service.menu_items]
+
+
+def test_id_collision_is_resolved_with_a_copy():
+    first = MenuItem.from_dict({'id': 1, 'article': 'A1', 'name': "Канапе", 'price': 100})
+    second = MenuItem.from_dict({'id': 1, 'article': 'A2', 'name': "Тарталетка", 'price': 120})
+
+    items, fixed = resolve_id_collisions([first, second])
+
+    assert fixed == 1
+    assert len({item['id'] for item in items}) == 2
+    assert items[0] is first
+    assert items[1] is not second and items[1]['name'] == second['name']
+    # Общая позиция из пула не меняется
+    assert second['id'] == 1
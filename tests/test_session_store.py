@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SessionStore: вытеснение по TTL, LRU и памяти, снимок на диск
+"""
+
+import threading
+import time
+
+from services.session_store import SessionStore
+
+
+def fill(store, *chat_ids):
+    for chat_id in chat_ids:
+        store.update(store.get(chat_id))
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(max_sessions=3)
+    fill(store, 1, 2, 3)
+    store.get(1)
+
+    fill(store, 4)
+
+    assert store.get(2, create=False) is None
+    assert all(store.get(chat_id, create=False) for chat_id in (1, 3, 4))
+    assert store.stats()['evicted'] == 1
+
+
+def test_expired_session_starts_over():
+    store = SessionStore(ttl=60)
+    session = store.get(1)
+    session.memory['special_requests'] = ['вегетарианское меню']
+    store.update(session)
+    session.last_active = time.time() - 61
+
+    assert store.get(1, create=False) is None
+    assert store.get(1).memory == {}
+    assert store.stats()['expired'] == 1
+
+
+def test_expired_sessions_are_dropped_on_update():
+    store = SessionStore(ttl=60)
+    first = store.get(1)
+    fill(store, 1, 2)
+    first.last_active = time.time() - 61
+
+    fill(store, 3)
+
+    assert len(store) == 2
+    assert store.stats()['expired'] == 1
+
+
+def test_memory_limit_keeps_the_updated_session():
+    store = SessionStore(max_bytes=2000)
+    fill(store, 1, 2)
+    session = store.get(1)
+    session.last_estimate = {'items': [{'name': "Канапе с лососем"}] * 100}
+
+    store.update(session)
+
+    assert store.get(1, create=False) is session
+    assert store.get(2, create=False) is None
+    assert store.stats()['evicted'] == 1
+
+
+def test_memory_accounting_follows_updates():
+    store = SessionStore()
+    session = store.get(1)
+    session.memory['note'] = "x" * 5000
+    store.update(session)
+    grown = store.stats()['memory_kb']
+
+    session.memory.clear()
+    store.update(session)
+    store.discard(1)
+
+    assert grown >= 5
+    assert store.stats()['memory_kb'] == 0
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "sessions.json"
+    store = SessionStore(snapshot_path=path)
+    session = store.get(42)
+    session.last_estimate = {'params': {'guest_count': 30}, 'items': []}
+    session.estimates_created.append('est-1')
+    store.update(session)
+    store.save()
+
+    restored = SessionStore(snapshot_path=path).get(42, create=False)
+
+    assert restored.last_estimate == session.last_estimate
+    assert list(restored.estimates_created) == ['est-1']
+    assert restored.size > 0
+
+
+def test_concurrent_updates_and_saves_keep_accounting(tmp_path):
+    store = SessionStore(snapshot_path=tmp_path / "sessions.json")
+    session = store.get(1)
+    session.memory.update({f"note-{step}": step for step in range(500)})
+    errors = []
+
+    def worker(number):
+        try:
+            for step in range(200):
+                store.update(session)
+                if step % 50 == number:
+                    store.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert store.stats()['memory_kb'] == round(session.size / 1024, 1)
+    assert SessionStore(snapshot_path=tmp_path / "sessions.json").get(1, create=False).memory == session.memory